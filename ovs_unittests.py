@@ -53,14 +53,37 @@
 # Global imports
 #
 import argparse
+import copy
+import glob
+import gzip
+import hashlib
+import io
+import json
+import mmap
 import os
 import platform
 import re
+import shlex
+import shutil
+import sqlite3
+import statistics
+import struct
 import subprocess
 import sys
-
-from operator import itemgetter
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+from collections import deque, namedtuple
+from contextlib import closing, contextmanager
+from operator import attrgetter
 from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+from xml.sax.saxutils import quoteattr
 
 HOST_ARCH = platform.machine()
 
@@ -68,12 +91,451 @@ HOST_ARCH = platform.machine()
 # Global defines
 #
 DEFAULT_VAGRANT_TARGET = 'fedora'
+VM_OVS_BUILD = '/root/ovs_build'
+VM_SCRIPTS_DIR = './vm_scripts'
+HISTORY_DB = './results/history.db'
+SUITE_CACHE_DIR = './results/cache'
+SUITE_CACHE_VERSION = '2'
+VM_SOURCE_DIR = '/root/src'
+SYNC_MANIFEST = '.sync_manifest.json'
+MATRIX_CONFIGS = {
+    "gcc": ("gcc", []),
+    "clang": ("clang", []),
+    "asan": ("clang", ["asan"]),
+    "ubsan": ("clang", ["ubsan"]),
+    "asan-ubsan": ("clang", ["asan", "ubsan"]),
+}
+CI_RESULTS_DIR = './results/ci'
+CI_REPORT_LINES = 50
+HISTORY_LOCK = threading.Lock()
+HISTORY_RUNS = 5
+RESOURCE_USAGE = {}
+RESOURCE_LOCK = threading.Lock()
+RESOURCE_COUNTERS = ("mem_total", "mem_available", "huge_total", "huge_free",
+                     "disk_read", "disk_write", "disk_busy", "sshfs_read",
+                     "sshfs_write")
+
+#
+# A test is quarantined when it passed on a retry at least QUARANTINE_FLAKES
+# times in its last QUARANTINE_RETRIES retried runs.
+#
+QUARANTINE_FLAKES = 2
+QUARANTINE_RETRIES = 10
+QUARANTINE_QUERY = '''
+    SELECT suite, distro, name FROM (
+        SELECT suite, distro, name, passed, ROW_NUMBER() OVER (
+            PARTITION BY suite, distro, name ORDER BY started DESC) AS n
+        FROM retries WHERE arch = ?)
+    WHERE n <= ? GROUP BY suite, distro, name HAVING SUM(passed) >= ?'''
+
+#
+# Expected wall time of the test suites, in seconds, used for scheduling when
+# there is no test history yet.
+#
+DEFAULT_SUITE_DURATIONS = {
+    'afxdp': 900,
+    'check': 1200,
+    'dpdk': 600,
+    'kernel': 2400,
+    'offloads': 300,
+    'ovsdb': 300,
+    'tso': 300,
+    'userspace': 1800,
+}
+
+#
+# Autotest log parsing
+#
+TEST_OK = "ok"
+TEST_SKIPPED = "skipped"
+TEST_FAILED = "failed"
+
+PASS_REGEX = re.compile(r'^(\d+)\. (.*) \((.+:\d+)\): ok')
+SKIP_REGEX = re.compile(r'^(\d+)\. (.*) \((.+:\d+)\): skipped .+$')
+FAIL_REGEX = re.compile(r'^(\d+)\. (.*) \((.+:\d+)\): FAILED .+$')
+ERROR_REGEX = re.compile(r'^ *(\d+): (.+:\d+) (.+)$')
+
+SKIP_LIST_ARCH_REGEX = re.compile(r'^\[ARCH:\s*(\S+)\]$')
+SKIP_LIST_CACHE = {}
+
+TIMES_REGEX = re.compile(r'\((\d+)m([\d.]+)s (\d+)m([\d.]+)s\)$')
+WALL_TIME_REGEX = re.compile(r'^ *(\d+): ([\d.]+)$')
+SUITE_DURATION_REGEX = re.compile(
+    r'^[\w-]+: test suite duration: (\d+)h (\d+)m (\d+)s$')
+
+TestResult = namedtuple('TestResult', ['number', 'name', 'location',
+                                       'status', 'cpu_time'],
+                        defaults=[None])
+
+#
+# Provisioners that can also be run over SSH, and their script. The scripts of
+# the "Test: " provisioners are prefixed with VM_TEST_SCRIPT_LIB, like the
+# Vagrantfile does.
+#
+VM_TEST_SCRIPT_LIB = "test_suite_lib.sh"
+VM_SCRIPTS = {
+    "Build dpdk": "build_dpdk.sh",
+    "Build Open vSwitch": "build_ovs.sh",
+    "Get test directory": "get_full_test_dir.sh",
+    "Test: check": "test_check.sh",
+    "Test: check-afxdp": "test_check_afxdp.sh",
+    "Test: check-dpdk": "test_check_dpdk.sh",
+    "Test: check-kernel": "test_check_kernel.sh",
+    "Test: check-offloads": "test_check_offloads.sh",
+    "Test: check-ovsdb-cluster": "test_check_ovsdb_cluster.sh",
+    "Test: check-system-tso": "test_check_system_tso.sh",
+    "Test: check-system-userspace": "test_check_system_userspace.sh",
+}
+
+SSH_OPTIONS = ['-o', 'ControlMaster=auto',
+               '-o', 'ControlPath=/tmp/ovs_dp_test-ssh-%C',
+               '-o', 'ControlPersist=600',
+               '-o', 'LogLevel=ERROR']
+SSH_CONFIGS = {}
+SSH_CONFIGS_LOCK = threading.Lock()
+VM_KERNELS = {}
+OUTPUT_TAIL_LINES = 50
+OUTPUT_REFRESH_RATE = 10
+OUTPUT_REFRESH_LINES = 40
+FAILED_OUTPUT = {}
+FAILED_OUTPUT_LOCK = threading.Lock()
+
+PROVISIONER_REGEX = re.compile(r'Running provisioner: (.+?) \(\w+\)\.\.\.$')
+ARCHIVE_TEST_REGEX = re.compile(r'(?:^|/)([^/]+)\.dir/(\d+)/')
+TEST_LIST_REGEX = re.compile(r'^ *(\d+): (\S+:\d+) +(.*?) *$')
+
+#
+# Test suites, with their provisioner, skip list, log file, and the maximum
+# number of tests autotest may run in parallel, 0 meaning one per VM CPU. The
+# system test suites share the datapath and network namespace names, so they
+# run serially. The autotest testsuite script is named after the log file.
+#
+TestSuite = namedtuple('TestSuite',
+                       ['provisioner', 'skip_list', 'log', 'max_jobs'])
+
+TEST_SUITES = {
+    'afxdp': TestSuite("Test: check-afxdp",
+                       "skip_lists/check_afxdp.skip_list",
+                       "system-afxdp-testsuite.log", 1),
+    'check': TestSuite("Test: check",
+                       "skip_lists/check.skip_list",
+                       "testsuite.log", 0),
+    'dpdk': TestSuite("Test: check-dpdk",
+                      "skip_lists/check_dpdk.skip_list",
+                      "system-dpdk-testsuite.log", 1),
+    'kernel': TestSuite("Test: check-kernel",
+                        "skip_lists/check_kernel.skip_list",
+                        "system-kmod-testsuite.log", 1),
+    'offloads': TestSuite("Test: check-offloads",
+                          "skip_lists/check_offloads.skip_list",
+                          "system-offloads-testsuite.log", 1),
+    'ovsdb': TestSuite("Test: check-ovsdb-cluster",
+                       "skip_lists/check_ovsdb_cluster.skip_list",
+                       "ovsdb-cluster-testsuite.log", 4),
+    'tso': TestSuite("Test: check-system-tso",
+                     "skip_lists/check_system_tso.skip_list",
+                     "system-tso-testsuite.log", 1),
+    'userspace': TestSuite("Test: check-system-userspace",
+                           "skip_lists/check_system_userspace.skip_list",
+                           "system-userspace-testsuite.log", 1),
+}
+
+JOBS_REGEX = re.compile(r'(^|\s)(-j|--jobs)')
+
+#
+# Change-impact test selection, see select_changed_tests(). Changes to the core
+# datapath code, or to the build and test infrastructure, run all tests. For
+# other files, the first matching IMPACT_RULES entry selects, for each test
+# suite, the tests in the .at files starting with the given prefix, or all
+# tests for an empty prefix. Files without a rule select the tests in the
+# "check" suite's .at file with the same name, or the full "check" suite if
+# there is none. Tests that started failing before when the same files
+# changed, in the last IMPACT_HISTORY_COMMITS tested commits, are added.
+#
+IMPACT_FULL_RUN_REGEX = re.compile(
+    r'^(datapath/|include/|build-aux/|m4/|configure\.ac$|Makefile\.am$|'
+    r'lib/(dp-packet|dpif|flow|netdev\.|netlink|odp-|packets)|'
+    r'ofproto/ofproto-dpif|tests/(\w+-)*(macros|testsuite)\.at$|'
+    r'tests/automake\.mk$)')
+
+IMPACT_RULES = (
+    (re.compile(r'^(Documentation/|debian/|rhel/|\.ci/|\.github/|'
+                r'[A-Z][\w.-]*$)|\.(rst|md|txt)$'), {}),
+    (re.compile(r'^(ovsdb/|lib/ovsdb|python/ovs/db/)'),
+     {"check": "ovsdb", "ovsdb": ""}),
+    (re.compile(r'^lib/(netdev-dpdk|dpdk)'), {"dpdk": ""}),
+    (re.compile(r'^lib/netdev-afxdp'), {"afxdp": ""}),
+    (re.compile(r'^lib/(netdev-offload|tc\.)'),
+     {"kernel": "", "offloads": ""}),
+    (re.compile(r'^lib/(conntrack|ipf)'), {"tso": "", "userspace": ""}),
+    (re.compile(r'^lib/netdev-(linux|vport)'),
+     {"kernel": "", "offloads": "", "userspace": ""}),
+    (re.compile(r'^ofproto/'), {"check": "ofproto"}),
+)
+
+IMPACT_HISTORY_COMMITS = 50
+
+HUNK_REGEX = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+AT_SETUP_REGEX = re.compile(r'^\s*AT_SETUP\(\[(.*)\]\)')
+
+
+#
+# PhaseTracer
+#
+class PhaseTracer:
+    '''Times the phases of a run, for a summary table and a Chrome trace.
+
+    Phases are timed with the phase() context manager, and may nest. Each
+    thread, i.e. each VM of a pool, gets its own track in the trace. Nothing
+    is recorded unless enabled.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.start = time.perf_counter()
+        self.events = []
+
+    def add(self, name, category, start, end, track=None, **args):
+        '''Record a phase that ran from start to end, on the track of the
+        current thread, or on the given one.
+        '''
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.events.append((name, category,
+                                track or threading.current_thread().name,
+                                start, end, args))
+
+    @contextmanager
+    def phase(self, name, category, **args):
+        '''Context manager recording the time spent in its block'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter(), **args)
+
+    def write_trace(self, file):
+        '''Write the phases as a Chrome/Perfetto trace JSON file'''
+        threads = {}
+        trace = []
+
+        with self.lock:
+            events = list(self.events)
+
+        for name, category, thread, start, end, args in events:
+            trace.append({"name": name, "cat": category, "ph": "X",
+                          "pid": 1,
+                          "tid": threads.setdefault(thread, len(threads) + 1),
+                          "ts": round((start - self.start) * 1000000),
+                          "dur": round((end - start) * 1000000),
+                          "args": args})
+
+        for thread, tid in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": 1,
+                          "tid": tid, "args": {"name": thread}})
+
+        with open(file, 'w', encoding="utf8") as out_file:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"},
+                      out_file)
+
+    def summary(self):
+        '''Return a table with the total time spent in each phase'''
+        phases = {}
+
+        with self.lock:
+            for name, category, _, start, end, _ in self.events:
+                phases.setdefault((name, category), []).append(end - start)
+
+        wall_time = time.perf_counter() - self.start
+        table = Table("Phase", "Category", "Count", "Total (s)", "Avg (s)",
+                      "Max (s)", "% of run",
+                      title=f"Run phases, wall time {wall_time:.0f}s")
+
+        for (name, category), durations in sorted(
+                phases.items(), key=lambda x: -sum(x[1])):
+            table.add_row(name, category, str(len(durations)),
+                          f"{sum(durations):.1f}",
+                          f"{statistics.mean(durations):.1f}",
+                          f"{max(durations):.1f}",
+                          f"{sum(durations) / wall_time * 100:.0f}%")
+
+        return table
+
+
+TRACER = PhaseTracer()
+
+
+#
+# ProvisionerTimer
+#
+class ProvisionerTimer:
+    '''Times the individual provisioners of a vagrant command.
+
+    A vagrant command can run multiple provisioners, their start is found in
+    its output, which is passed line by line to feed(). This can be done from
+    another thread, the provisioners are still recorded on the track of the
+    thread that created the timer.
+    '''
+
+    def __init__(self, target):
+        self.target = target
+        self.track = threading.current_thread().name
+        self.name = None
+        self.start = None
+
+    def feed(self, line):
+        '''Check a line of vagrant output for the next provisioner'''
+        match = PROVISIONER_REGEX.search(line.rstrip())
+        if match is None:
+            return
+
+        self.done()
+        self.name = match.group(1)
+        self.start = time.perf_counter()
+
+    def done(self):
+        '''Record the time of the running provisioner, if any'''
+        if self.name is not None:
+            TRACER.add(self.name, "provision", self.start,
+                       time.perf_counter(), track=self.track, vm=self.target)
+            self.name = None
+
+
+#
+# OutputPump
+#
+class OutputPump(threading.Thread):
+    '''Read the output of a VM command in the background.
+
+    Every line is written, as is, to the log file of the phase in
+    results/<vm>/logs, if it can be created, and passed to feed, if given.
+    The last OUTPUT_TAIL_LINES lines are kept in a ring buffer, and for the
+    console at most OUTPUT_REFRESH_LINES lines are queued. If the command
+    fails, its last lines are available through failed_output().
+    '''
+
+    def __init__(self, process, target, phase, feed=None):
+        super().__init__(daemon=True)
+
+        self.process = process
+        self.target = target
+        self.phase = phase
+        self.feed = feed
+        self.log_file = f"./results/{target}/logs/" + \
+            re.sub(r'[^\w.]+', '-', phase.lower()).strip('-') + ".log"
+        self.tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.pending = deque(maxlen=OUTPUT_REFRESH_LINES)
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+        with FAILED_OUTPUT_LOCK:
+            FAILED_OUTPUT.pop(target, None)
+
+    def run(self):
+        try:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            out_file = open(self.log_file, 'w', encoding="utf8")
+        except OSError:
+            self.log_file = os.devnull
+            out_file = open(os.devnull, 'w', encoding="utf8")
+
+        try:
+            with out_file:
+                for line in self.process.stdout:
+                    out_file.write(line)
+                    if self.feed is not None:
+                        self.feed(line)
+
+                    line = line.rstrip()
+                    with self.lock:
+                        self.tail.append(line)
+                        if len(self.pending) == self.pending.maxlen:
+                            self.dropped += 1
+                        self.pending.append(line)
+        finally:
+            #
+            # Keep reading the output if this failed, as the command blocks
+            # once the pipe is full, and the run would hang.
+            #
+            for _ in self.process.stdout:
+                pass
+
+    def take(self):
+        '''Return the number of dropped lines, and the queued lines'''
+        with self.lock:
+            dropped, lines = self.dropped, list(self.pending)
+            self.dropped = 0
+            self.pending.clear()
+
+        return dropped, lines
+
+    def show(self, console=None, status_msg=None, quiet=False):
+        '''Read the output until the command closes it.
+
+        With a console, a status is shown, and unless quiet is set, the new
+        lines are printed up to OUTPUT_REFRESH_RATE times per second. When
+        more lines came in, only the last ones are printed.
+        '''
+        self.start()
+
+        if console is None:
+            self.join()
+            return
+
+        with console.status(status_msg) as status:
+            while self.is_alive():
+                self.join(1 / OUTPUT_REFRESH_RATE)
+
+                dropped, lines = self.take()
+                if quiet or len(lines) == 0:
+                    continue
+
+                if dropped > 0:
+                    lines.insert(0, f"... {dropped} lines, see "
+                                 f"{self.log_file}")
+                status.console.print("\n".join("  " + x for x in lines),
+                                     highlight=False, markup=False)
+
+    def done(self, return_code):
+        '''Keep the last lines of the command for failed_output() if it
+        failed, and return True if it did not.
+        '''
+        self.join()
+
+        if return_code == 0:
+            return True
+
+        with FAILED_OUTPUT_LOCK:
+            FAILED_OUTPUT[self.target] = (self.phase, self.log_file,
+                                          list(self.tail))
+        return False
+
+
+#
+# failed_output()
+#
+def failed_output(target):
+    '''Return the last lines of the VM's last failed command, on new lines
+    to add to an error message, or an empty string.
+    '''
+    with FAILED_OUTPUT_LOCK:
+        phase, log_file, lines = FAILED_OUTPUT.pop(target, (None, None, []))
+
+    if phase is None:
+        return ""
+
+    return f"\n[bold cyan]Last {len(lines)} lines of \"{escape(phase)}\" on " \
+        f"{target}, see {log_file}:[/]\n" + \
+        "\n".join("  " + escape(x) for x in lines)
 
 
 #
 # vagrant_state()
 #
-def vagrant_state(target=None, vm_type=None):
+def vagrant_state(target=None, vm_type=None, box=None):
     '''Get the state of a vagrant instance (running, shutoff, not_created)'''
 
     if target is None:
@@ -84,6 +546,9 @@ def vagrant_state(target=None, vm_type=None):
     if vm_type:
         env |= {"VM_TYPE": vm_type}
 
+    if box:
+        env |= {"VM_BOX": box}
+
     try:
         output = subprocess.check_output(['vagrant',
                                           '--machine-readable', 'status'],
@@ -102,7 +567,7 @@ def vagrant_state(target=None, vm_type=None):
 #
 # vagrant_destroy()
 #
-def vagrant_destroy(target=None, vm_type=None):
+def vagrant_destroy(target=None, vm_type=None, box=None):
     '''Forcefully destroy a vagrant VM'''
 
     if target is None:
@@ -113,15 +578,22 @@ def vagrant_destroy(target=None, vm_type=None):
     if vm_type:
         env |= {"VM_TYPE": vm_type}
 
+    if box:
+        env |= {"VM_BOX": box}
+
+    ssh_config_invalidate(target)
+
     try:
-        subprocess.check_output(['vagrant',
-                                 'destroy', '--force',
-                                 '--machine-readable', target],
-                                encoding='utf8', env=env)
+        with TRACER.phase("vagrant destroy", "vm", vm=target):
+            subprocess.check_output(['vagrant',
+                                     'destroy', '--force',
+                                     '--machine-readable', target],
+                                    encoding='utf8', env=env)
     except subprocess.CalledProcessError:
         pass
 
-    if vagrant_state(target=target, vm_type=vm_type) != 'not_created':
+    if vagrant_state(target=target, vm_type=vm_type,
+                     box=box) != 'not_created':
         return False
 
     return True
@@ -131,7 +603,7 @@ def vagrant_destroy(target=None, vm_type=None):
 # vagrant_up()
 #
 def vagrant_up(console=None, target=None, vm_type=None, provision=None,
-               quiet=False, cpus=4):
+               quiet=False, cpus=4, box=None):
     '''Bring a vagrant image up'''
 
     if target is None:
@@ -141,6 +613,10 @@ def vagrant_up(console=None, target=None, vm_type=None, provision=None,
     if vm_type:
         env |= {"VM_TYPE": vm_type}
 
+    if box:
+        env |= {"VM_BOX": box}
+
+    ssh_config_invalidate(target)
     arguments = ['vagrant', 'up', '--no-color']
 
     if provision is None:
@@ -148,31 +624,125 @@ def vagrant_up(console=None, target=None, vm_type=None, provision=None,
 
     arguments += [target]
 
-    with subprocess.Popen(arguments, stdout=subprocess.PIPE,
-                          stderr=subprocess.STDOUT,
-                          encoding='utf8', env=env) as process:
-
-        if console:
-            with console.status(
-                    f'[bold green]Bringing up VM "{target}"...') as status:
-                while process.stdout.readable():
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-
-                    if not quiet:
-                        status.console.print("  " + line.strip(),
-                                             highlight=False)
-        else:
-            while process.stdout.readable():
-                line = process.stdout.readline()
-                if not line:
-                    break
+    with TRACER.phase("vagrant up", "vm", vm=target), \
+            subprocess.Popen(arguments, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT,
+                             encoding='utf8', errors="ignore",
+                             env=env) as process:
 
+        pump = OutputPump(process, target, "vagrant up")
+        pump.show(console, f'[bold green]Bringing up VM "{target}"...',
+                  quiet=quiet)
         process.wait()
+        pump.done(process.returncode)
+
+    if vagrant_state(target=target, vm_type=vm_type,
+                     box=box) != 'not_created':
+        return False
+
+    return True
+
+
+#
+# vagrant_halt()
+#
+def vagrant_halt(target=None, vm_type=None, box=None):
+    '''Gracefully shut down a vagrant VM'''
+
+    if target is None:
+        raise ValueError("Vagrant target not set!")
+
+    env = os.environ.copy() | {"VM_NAME": target}
+
+    if vm_type:
+        env |= {"VM_TYPE": vm_type}
+
+    if box:
+        env |= {"VM_BOX": box}
+
+    ssh_config_invalidate(target)
+
+    try:
+        with TRACER.phase("vagrant halt", "vm", vm=target):
+            subprocess.check_output(['vagrant', 'halt',
+                                     '--machine-readable', target],
+                                    encoding='utf8', env=env)
+    except subprocess.CalledProcessError:
+        return False
+
+    return True
+
+
+#
+# vagrant_box_list()
+#
+def vagrant_box_list():
+    '''Return the set of installed vagrant box names'''
+
+    try:
+        output = subprocess.check_output(['vagrant', 'box', 'list',
+                                          '--machine-readable'],
+                                         encoding='utf8').split("\n")
+    except subprocess.CalledProcessError:
+        output = ""
+
+    boxes = set()
+    for line in output:
+        items = line.split(",")
+        if len(items) >= 4 and items[2] == 'box-name':
+            boxes.add(items[3])
+
+    return boxes
+
+
+#
+# vagrant_box_remove()
+#
+def vagrant_box_remove(box):
+    '''Remove an installed vagrant box'''
+
+    try:
+        subprocess.check_output(['vagrant', 'box', 'remove', '--force',
+                                 '--all', box], encoding='utf8',
+                                stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError:
+        return False
+
+    return True
+
+
+#
+# vagrant_package()
+#
+def vagrant_package(target=None, vm_type=None, box=None):
+    '''Package a halted vagrant VM, and install it as a new box'''
+
+    if target is None or box is None:
+        raise ValueError("Vagrant target or box not set!")
+
+    env = os.environ.copy() | {"VM_NAME": target}
+
+    if vm_type:
+        env |= {"VM_TYPE": vm_type}
 
-    if vagrant_state(target=target, vm_type=vm_type) != 'not_created':
+    box_file = f"./results/{target}/{box}.box"
+
+    try:
+        with TRACER.phase("vagrant package", "vm", vm=target):
+            subprocess.check_output(['vagrant', 'package', '--output',
+                                     box_file, target], encoding='utf8',
+                                    env=env, stderr=subprocess.STDOUT)
+            subprocess.check_output(['vagrant', 'box', 'add', '--force',
+                                     '--name', box, box_file],
+                                    encoding='utf8',
+                                    stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError:
         return False
+    finally:
+        try:
+            os.remove(box_file)
+        except FileNotFoundError:
+            pass
 
     return True
 
@@ -181,7 +751,8 @@ def vagrant_up(console=None, target=None, vm_type=None, provision=None,
 # vagrant_provision()
 #
 def vagrant_provision(console=None, target=None, vm_type=None,
-                      provision_with=None, quiet=False, cpus=4, env=None):
+                      provision_with=None, quiet=False, cpus=4, env=None,
+                      box=None):
     '''Provision a running vagrant image'''
 
     if target is None:
@@ -189,6 +760,7 @@ def vagrant_provision(console=None, target=None, vm_type=None,
 
     cpus = str(cpus)
     arguments = ['vagrant', 'provision', '--no-color']
+    provision = None
 
     if provision_with is not None and len(provision_with) > 0:
         provision = ""
@@ -200,6 +772,9 @@ def vagrant_provision(console=None, target=None, vm_type=None,
 
         arguments += ['--provision-with'] + [provision]
 
+    if provision_with is None or "Reboot new kernel" in provision_with:
+        ssh_config_invalidate(target)
+
     arguments += [target]
 
     if env is None:
@@ -210,402 +785,3673 @@ def vagrant_provision(console=None, target=None, vm_type=None,
     if vm_type:
         env |= {"VM_TYPE": vm_type}
 
-    with subprocess.Popen(arguments, stdout=subprocess.PIPE,
-                          stderr=subprocess.STDOUT, env=env,
-                          encoding='utf8', errors="ignore") as process:
+    if box:
+        env |= {"VM_BOX": box}
 
-        if console:
-            if provision is not None:
-                status_msg = f'[bold green]Provisioning VM "{target}" ' \
-                             f'with "{provision}"...'
-            else:
-                status_msg = f'[bold green]Provisioning VM "{target}"...'
+    timer = ProvisionerTimer(target)
 
-            with console.status(status_msg) as status:
-                while process.stdout.readable():
-                    line = process.stdout.readline()
-                    if not line:
-                        break
+    with TRACER.phase("vagrant provision", "vm", vm=target,
+                      provision_with=provision_with), \
+            subprocess.Popen(arguments, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, env=env,
+                             encoding='utf8', errors="ignore") as process:
 
-                    if not quiet:
-                        status.console.print("  " + line.strip(),
-                                             highlight=False)
+        if provision is not None:
+            status_msg = f'[bold green]Provisioning VM "{target}" ' \
+                         f'with "{provision}"...'
         else:
-            while process.stdout.readable():
-                line = process.stdout.readline()
-                if not line:
-                    break
+            status_msg = f'[bold green]Provisioning VM "{target}"...'
 
+        pump = OutputPump(process, target, provision or "provision",
+                          feed=timer.feed)
+        pump.show(console, status_msg, quiet=quiet)
         process.wait()
-        return_code = process.returncode
+        timer.done()
 
-    if return_code != 0:
-        return False
+    return pump.done(process.returncode)
 
-    return True
+
+#
+# ssh_config_invalidate()
+#
+def ssh_config_invalidate(target):
+    '''Forget the SSH configuration, and the kernel, of a VM, i.e. when it
+    is restarted.
+    '''
+    with SSH_CONFIGS_LOCK:
+        SSH_CONFIGS.pop(target, None)
+        VM_KERNELS.pop(target, None)
 
 
 #
-# cleanup_result_file()
+# vagrant_ssh_config()
 #
-def cleanup_result_file(file, target=None):
-    '''Delete file if it exists'''
+def vagrant_ssh_config(target=None, vm_type=None, box=None):
+    '''Return a file with the SSH configuration of a running VM.
 
+    The configuration is only requested from vagrant the first time, or after
+    the VM was restarted. Returns None on failure.
+    '''
     if target is None:
         raise ValueError("Vagrant target not set!")
 
+    with SSH_CONFIGS_LOCK:
+        if target in SSH_CONFIGS:
+            return SSH_CONFIGS[target]
+
+    env = os.environ.copy() | {"VM_NAME": target}
+
+    if vm_type:
+        env |= {"VM_TYPE": vm_type}
+
+    if box:
+        env |= {"VM_BOX": box}
+
     try:
-        os.remove(f"./results/{target}/{file}")
-    except FileNotFoundError:
-        pass
+        output = subprocess.check_output(['vagrant', 'ssh-config', target],
+                                         encoding='utf8', env=env,
+                                         stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        return None
+
+    config = f"./results/{target}/ssh_config"
+    os.makedirs(os.path.dirname(config), exist_ok=True)
+    with open(config, 'w', encoding="utf8") as out_file:
+        out_file.write(output)
+
+    with SSH_CONFIGS_LOCK:
+        SSH_CONFIGS[target] = config
+
+    return config
 
 
 #
-# process_results()
+# vm_command()
 #
-def process_results(file, target=None, skiplist=None):
-    '''Process the result file.
+def vm_command(target=None, vm_type=None, box=None, command=None,
+               ssh=False):
+    '''Return the arguments to run a command in the VM.
 
-    Check for errors and invalid skipped tests.
+    With ssh set, the command runs over the persistent SSH connection, else
+    through "vagrant ssh". Returns the arguments and environment to use.
     '''
-    file = (f"./results/{target}/{file}")
-
     if target is None:
         raise ValueError("Vagrant target not set!")
 
-    passed_list = []
-    skipped_list = []
-    all_test_names = set()
-    error_list = []
-    parsing_skipped = False
-    parsing_errors = False
+    env = os.environ.copy() | {"VM_NAME": target}
 
-    #
-    # Read log in memory
-    #
-    try:
-        with open(file, 'r', encoding="utf8") as in_file:
-            lines = in_file.readlines()
-    except (FileNotFoundError, PermissionError):
-        return None, None
+    if vm_type:
+        env |= {"VM_TYPE": vm_type}
 
-    for line in lines:
-        line = line.rstrip('\r\n')
+    if box:
+        env |= {"VM_BOX": box}
 
-        if line == "## Running the tests. ##":
-            parsing_skipped = True
-            parsing_errors = False
+    if ssh:
+        config = vagrant_ssh_config(target=target, vm_type=vm_type, box=box)
+        if config is not None:
+            return ['ssh', '-F', config] + SSH_OPTIONS + \
+                [target, command], env
 
-        elif line == "## Summary of the failures. ##":
-            parsing_errors = True
-            parsing_skipped = False
+    return ['vagrant', 'ssh', target, '-c', command], env
 
-        elif line in ("## Test results. ##", "Skipped tests:",
-                      "## Detailed failed tests. ##"):
-            parsing_skipped = False
-            parsing_errors = False
-
-        elif parsing_skipped:
-            skip_regex = r'^(\d+)\. (.*) \((.+:\d+)\): skipped .+$'
-            match = re.search(skip_regex, line)
-            if match is not None and len(match.groups()) == 3:
-                all_test_names.add(match.groups()[1])
-                skipped_list.append([match.groups()[0],
-                                     match.groups()[1],
-                                     match.groups()[2]])
-
-            pass_regex = r'^(\d+)\. (.*) \((.+:\d+)\): ok'
-            match = re.search(pass_regex, line)
-            if match is not None and len(match.groups()) == 3:
-                all_test_names.add(match.groups()[1])
-                passed_list.append([match.groups()[0],
-                                    match.groups()[1],
-                                    match.groups()[2]])
-
-        elif parsing_errors:
-            error_regex = r'^ *(\d+): (.+:\d+) (.+)$'
-            match = re.search(error_regex, line)
-            if match is not None and len(match.groups()) == 3:
-                all_test_names.add(match.groups()[2])
-                error_list.append([match.groups()[0],
-                                   match.groups()[2],
-                                   match.groups()[1]])
 
-    #
-    # Remove valid skipped_list items, and detect stale and missing entries.
-    #
-    stale_list = []
-    missing_list = []
-    if skiplist is not None:
-        try:
-            with open(skiplist, 'r', encoding="utf8") as in_file:
-                lines = in_file.readlines()
-        except (FileNotFoundError, PermissionError):
-            return None, None
+#
+# vm_kernel()
+#
+def vm_kernel(options):
+    '''Return the kernel release and version of the options' VM, or None.
 
-        passed_names = {x[1] for x in passed_list}
-        current_arch = None
-        for line in lines:
-            line = line.rstrip('\r\n')
-            if line.startswith('#') or line == '':
-                continue
+    The kernel is only requested from the VM the first time, or after the VM
+    was restarted.
+    '''
+    target = options.vagrant_vm_name
 
-            arch_match = re.match(r'^\[ARCH:\s*(\S+)\]$', line)
-            if arch_match:
-                current_arch = arch_match.group(1)
-                continue
+    with SSH_CONFIGS_LOCK:
+        if target in VM_KERNELS:
+            return VM_KERNELS[target]
 
-            if current_arch is not None and current_arch != HOST_ARCH:
-                continue
+    arguments, env = vm_command(target=target,
+                                vm_type="ubuntu" if options.ubuntu else None,
+                                box=options.vm_box, command="uname -rv",
+                                ssh=options.ssh)
+    try:
+        kernel = subprocess.check_output(arguments, env=env, encoding='utf8',
+                                         stdin=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
 
-            skipped_list[:] = (x for x in skipped_list if x[1] != line)
-            if line in passed_names:
-                stale_list.append(line)
-            elif line not in all_test_names:
-                missing_list.append(line)
+    if not kernel:
+        return None
 
-    #
-    # Return the four lists
-    #
-    return error_list, skipped_list, stale_list, missing_list
+    with SSH_CONFIGS_LOCK:
+        VM_KERNELS[target] = kernel
+
+    return kernel
 
 
 #
-# run_single_test()
+# vm_script()
 #
-def run_single_test(console, options, provision_list, skiplist_file, test_log):
-    '''Run a single test case based on input parameters'''
-    current_run = 0
-    skipped_list = []
-    stale_list = []
-    missing_list = []
-    first_run_errors = []
-    vm_type = "ubuntu" if options.ubuntu else None
-    testsuiteflags = options.testsuiteflags if options.testsuiteflags else ""
+def vm_script(name):
+    '''Return the script of a provisioner in VM_SCRIPTS, as run in the VM'''
 
-    #
-    # Run test number of iteration until successful.
-    #
-    while current_run <= options.retry:
-        current_run += 1
+    files = [VM_SCRIPTS[name]]
+    if name.startswith("Test: "):
+        files.insert(0, VM_TEST_SCRIPT_LIB)
 
-        if not options.dry_run:
-            cleanup_result_file(test_log, target=options.vagrant_vm_name)
+    script = ""
+    for file in files:
+        with open(os.path.join(VM_SCRIPTS_DIR, file), 'r',
+                  encoding="utf8") as in_file:
+            script += in_file.read()
 
-            if not vagrant_provision(target=options.vagrant_vm_name,
-                                     vm_type=vm_type,
-                                     console=console, quiet=options.quiet,
-                                     provision_with=provision_list,
-                                     cpus=options.vagrant_vm_cpus,
-                                     env={"TESTSUITEFLAGS": testsuiteflags}):
-                return "[bold red]ERROR[/]: Failed make check!"
+    return script
 
-        (error_list, tmp_skipped_list,
-         tmp_stale_list, tmp_missing_list) = process_results(
-            test_log, target=options.vagrant_vm_name, skiplist=skiplist_file)
 
-        if error_list is None and tmp_skipped_list is None:
-            return (f"[bold red]  ERROR: Can't open file \"{test_log}\" "
-                    f"and/or \"{skiplist_file}\" for reading![/]")
+#
+# vm_script_command()
+#
+def vm_script_command(env):
+    '''Return the SSH command to run a script, given on stdin, as root.
 
-        #
-        # Store first run errors, so we can report a WARNING.
-        #
-        if current_run == 1:
-            first_run_errors = error_list
+    The script is read from stdin first, so the commands it runs do not
+    consume the rest of it.
+    '''
+    variables = " ".join(f"{name}={shlex.quote(value)}"
+                         for name, value in env.items())
 
-        #
-        # We only need to keep the first skipped_list failures.
-        #
-        if len(skipped_list) == 0:
-            skipped_list = tmp_skipped_list
+    return f"script=$(cat); sudo -H env {variables} " \
+        "bash -l -c \"$script\" vm_script < /dev/null"
 
-        #
-        # Accumulate stale skips across all runs.
-        # Only capture missing skips on the first run, as reruns only contain
-        # a subset of tests (the failed ones), making absences meaningless.
-        #
-        stale_list = list(set(stale_list) | set(tmp_stale_list))
-        if current_run == 1:
-            missing_list = tmp_missing_list
 
-        #
-        # Break if all tests are successful.
-        #
-        if len(error_list) == 0:
-            break
+#
+# ssh_provision()
+#
+def ssh_provision(console=None, target=None, vm_type=None,
+                  provision_with=None, quiet=False, env=None, box=None):
+    '''Run the provisioner scripts over the persistent SSH connection.
 
-        #
-        # Re-run only the failed test cases
-        #
-        testsuiteflags = ' '.join([x[0] for x in error_list])
+    This does the same as vagrant_provision(), the scripts run as root with
+    the given environment variables, and RESULT_DIR set, but avoids starting
+    vagrant for each call.
+    '''
+    if target is None:
+        raise ValueError("Vagrant target not set!")
 
-    #
-    # Build error string
-    #
+    config = vagrant_ssh_config(target=target, vm_type=vm_type, box=box)
+    if config is None:
+        return False
 
-    if len(error_list) < len(first_run_errors):
-        failure_no = len(first_run_errors) - len(error_list)
-        failures = "[bold orange_red1]  - [WARNING] " \
+    command = vm_script_command({"RESULT_DIR": target} | (env or {}))
+
+    for name in provision_with:
+        with TRACER.phase(name, "provision", vm=target), \
+                subprocess.Popen(['ssh', '-F', config] + SSH_OPTIONS +
+                                 [target, command], stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT,
+                                 encoding='utf8', errors="ignore") as process:
+
+            #
+            # The VM reads the whole script before running it, so it is
+            # written before its output is read.
+            #
+            try:
+                process.stdin.write(vm_script(name))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+            pump = OutputPump(process, target, name)
+            pump.show(console, f'[bold green]Running "{name}" on VM '
+                      f'"{target}"...', quiet=quiet)
+            process.wait()
+
+        if not pump.done(process.returncode):
+            return False
+
+    return True
+
+
+#
+# run_provisioners()
+#
+def run_provisioners(console, options, provision_with, env=None,
+                     quiet=None):
+    '''Run provisioners on the options' VM, over SSH if requested'''
+
+    vm_type = "ubuntu" if options.ubuntu else None
+    quiet = options.quiet if quiet is None else quiet
+    env = {"OVS_BUILD": options.ovs_build} | (env or {})
+    sampler = None
+
+    if options.sample:
+        sampler = ResourceSampler(options, ", ".join(provision_with))
+        sampler.start()
+
+    try:
+        if options.ssh and \
+                all(name in VM_SCRIPTS for name in provision_with):
+            return ssh_provision(target=options.vagrant_vm_name,
+                                 vm_type=vm_type, box=options.vm_box,
+                                 console=vm_console(console, options),
+                                 quiet=quiet, provision_with=provision_with,
+                                 env=env)
+
+        return vagrant_provision(target=options.vagrant_vm_name,
+                                 vm_type=vm_type, box=options.vm_box,
+                                 console=vm_console(console, options),
+                                 quiet=quiet, cpus=options.vagrant_vm_cpus,
+                                 provision_with=provision_with, env=env)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+
+
+#
+# run_suite_provisioners()
+#
+def run_suite_provisioners(console, options, provision_with, test_log,
+                           testsuiteflags):
+    '''Run the provisioners of a test suite with the given TESTSUITEFLAGS.
+
+    The test scripts exit with the status of make, so they also fail if tests
+    failed. Returns True if the test suite ran, i.e. it wrote its log to the
+    results directory, even if tests failed.
+    '''
+    if run_provisioners(console, options, provision_with,
+                        env={"TESTSUITEFLAGS": testsuiteflags}):
+        return True
+
+    if not os.path.exists(f"./results/{options.vagrant_vm_name}/{test_log}"):
+        return False
+
+    #
+    # The failed tests are reported from the log, not as a failed command.
+    #
+    failed_output(options.vagrant_vm_name)
+    return True
+
+
+#
+# LiveLogMonitor
+#
+class LiveLogMonitor(threading.Thread):
+    '''Follow a test log inside the VM while the test suite is running.
+
+    Each new line is fed to a TestLogParser, and FAILED and SKIPPED tests are
+    reported as they happen. If fail_fast is set, the test suite is stopped
+    once that number of failures is reached.
+    '''
+
+    def __init__(self, console, target=None, vm_type=None, test_log=None,
+                 fail_fast=0, ssh=False, recorder=None,
+                 build_dir=VM_OVS_BUILD):
+        super().__init__(daemon=True)
+
+        if target is None:
+            raise ValueError("Vagrant target not set!")
+
+        self.console = console
+        self.target = target
+        self.vm_type = vm_type
+        self.ssh = ssh
+        self.test_log = f"{build_dir}/tests/{test_log}"
+        self.fail_fast = fail_fast
+        self.recorder = recorder
+        self.failures = 0
+        self.stopped_suite = False
+        self.stopping = threading.Event()
+        self.process = None
+
+    def run(self):
+        #
+        # Only start following the log once it's written by the new run, so
+        # we do not report results of a previous run. Each monitor uses its
+        # own start marker, as several can follow logs on the same VM.
+        #
+        command = "sudo sh -c 'start=$(mktemp); trap \"rm -f $start\" " \
+            f"EXIT; until [ {self.test_log} -nt $start ]; do sleep 1; " \
+            "done; rm -f $start; " \
+            f"exec tail -n +1 -F {self.test_log} 2>/dev/null'"
+
+        #
+        # Failed tests are listed again in the summary of the failures, so
+        # only their first result is reported.
+        #
+        parser = TestLogParser()
+        seen = set()
+        arguments, env = vm_command(target=self.target, vm_type=self.vm_type,
+                                    command=command, ssh=self.ssh)
+
+        with subprocess.Popen(arguments, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, env=env,
+                              encoding='utf8', errors="ignore") as process:
+            self.process = process
+            if self.stopping.is_set():
+                process.terminate()
+
+            for line in process.stdout:
+                result = parser.feed(line)
+                if result is None or result.number in seen:
+                    continue
+
+                seen.add(result.number)
+                if self.recorder is not None:
+                    self.recorder.record(result)
+
+                if result.status == TEST_OK:
+                    continue
+
+                if result.status == TEST_FAILED:
+                    self.failures += 1
+                    self.console.log(
+                        "[bold red]  - [FAILED ] "
+                        f"{int(result.number):-4}. {result.name} "
+                        f"({result.location})[/]")
+                else:
+                    self.console.log(
+                        "[bold dark_orange3]  - [SKIPPED] "
+                        f"{int(result.number):-4}. {result.name} "
+                        f"({result.location})[/]")
+
+                if self.fail_fast and self.failures >= self.fail_fast \
+                   and not self.stopped_suite:
+                    self.stop_suite()
+
+    def stop_suite(self):
+        '''Stop the running test suite inside the VM'''
+        self.console.log(f"[bold red]Stopping test suite after "
+                         f"{self.failures} failures[/]")
+        self.stopped_suite = True
+
+        arguments, env = vm_command(
+            target=self.target, vm_type=self.vm_type, ssh=self.ssh,
+            command="sudo pkill -TERM -f 'tests/[a-z-]*testsuite'")
+        subprocess.run(arguments, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, env=env, check=False)
+
+    def stop(self):
+        '''Stop following the log, and wait for the thread to finish'''
+        self.stopping.set()
+        if self.process is not None:
+            self.process.terminate()
+
+        self.join()
+
+
+#
+# ResourceSampler
+#
+class ResourceSampler(threading.Thread):
+    '''Sample the resource usage inside the VM while a phase is running.
+
+    The vm_scripts/resource_sampler.sh script writes the raw CPU, memory,
+    hugepage, disk, and sshfs counters at a fixed interval. The samples are
+    stored in the VM's results directory, and the usage over each interval
+    is added to RESOURCE_USAGE for the phase, see report_resources().
+    '''
+
+    def __init__(self, options, phase):
+        super().__init__(daemon=True)
+        self.options = options
+        self.phase = phase
+        self.samples = []
+        self.process = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        arguments, env = vm_command(
+            target=self.options.vagrant_vm_name,
+            vm_type="ubuntu" if self.options.ubuntu else None,
+            box=self.options.vm_box, ssh=self.options.ssh,
+            command=vm_script_command({"INTERVAL": str(self.options.sample)}))
+
+        with open(os.path.join(VM_SCRIPTS_DIR, "resource_sampler.sh"),
+                  'rb') as script, \
+                subprocess.Popen(arguments, stdin=script,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL, env=env,
+                                 encoding='utf8', errors="ignore") as process:
+            self.process = process
+            if self.stopping.is_set():
+                process.terminate()
+
+            for line in process.stdout:
+                try:
+                    sample = dict(x.split("=", 1) for x in line.split())
+                    self.samples.append(
+                        {"time": float(sample["time"]),
+                         "cpus": int(sample["cpus"]),
+                         "cpu": [int(x) for x in sample["cpu"].split(",")],
+                         "load": float(sample["load"])} |
+                        {x: int(sample[x]) for x in RESOURCE_COUNTERS})
+                except (KeyError, ValueError):
+                    continue
+
+    def stop(self):
+        '''Stop sampling, and store the samples and the usage'''
+
+        self.stopping.set()
+        if self.process is not None:
+            self.process.terminate()
+
+        self.join()
+
+        os.makedirs(f"./results/{self.options.vagrant_vm_name}/",
+                    exist_ok=True)
+        with open(f"./results/{self.options.vagrant_vm_name}/"
+                  "resource_samples.jsonl", 'a', encoding="utf8") \
+                as out_file:
+            for sample in self.samples:
+                out_file.write(json.dumps({"phase": self.phase} | sample) +
+                               "\n")
+
+        intervals = [resource_interval(self.samples[i - 1], self.samples[i])
+                     for i in range(1, len(self.samples))]
+
+        with RESOURCE_LOCK:
+            RESOURCE_USAGE.setdefault(self.phase, []).extend(
+                x for x in intervals if x is not None)
+
+
+#
+# resource_interval()
+#
+def resource_interval(first, second):
+    '''Return the resource usage between two samples, or None'''
+
+    seconds = second["time"] - first["time"]
+    cpu = [y - x for x, y in zip(first["cpu"], second["cpu"])]
+    if seconds <= 0 or sum(cpu) <= 0:
+        return None
+
+    # The cpu fields are: user nice system idle iowait irq softirq steal.
+    return {
+        "seconds": seconds,
+        "cpus": second["cpus"],
+        "cpu": 100 - (cpu[3] + cpu[4]) / sum(cpu) * 100,
+        "iowait": cpu[4] / sum(cpu) * 100,
+        "steal": cpu[7] / sum(cpu) * 100,
+        "load": second["load"],
+        "mem_total": second["mem_total"] // 1024,
+        "mem_used": (second["mem_total"] - second["mem_available"]) // 1024,
+        "huge_total": second["huge_total"],
+        "huge_used": second["huge_total"] - second["huge_free"],
+        "disk": (second["disk_read"] - first["disk_read"] +
+                 second["disk_write"] - first["disk_write"]) * 512,
+        "disk_busy": min(100, (second["disk_busy"] - first["disk_busy"]) /
+                         10 / seconds),
+        "sshfs": (second["sshfs_read"] - first["sshfs_read"] +
+                  second["sshfs_write"] - first["sshfs_write"])}
+
+
+#
+# report_resources()
+#
+def report_resources(console):
+    '''Report the resource usage per phase, with sizing recommendations'''
+
+    with RESOURCE_LOCK:
+        usage = {x: list(y) for x, y in RESOURCE_USAGE.items() if y}
+
+    if len(usage) == 0:
+        console.log("[bold dark_orange3]No resource samples taken[/]")
+        return
+
+    table = Table("Phase", "Time (s)", "CPU avg", "CPU max", "I/O wait",
+                  "Steal", "Load max", "Mem max (MB)", "Hugepages max",
+                  "Disk MB/s", "Disk busy", "sshfs MB/s",
+                  title="Resource usage inside the VMs")
+    recommendations = []
+
+    for phase, intervals in sorted(usage.items()):
+        seconds = sum(x["seconds"] for x in intervals)
+        average = {x: sum(y[x] * y["seconds"] for y in intervals) / seconds
+                   for x in ("cpu", "iowait", "steal", "disk_busy")}
+        maximum = {x: max(y[x] for y in intervals)
+                   for x in ("cpus", "cpu", "load", "mem_total", "mem_used",
+                             "huge_total", "huge_used")}
+        disk = sum(x["disk"] for x in intervals) / seconds / 1048576
+        sshfs = sum(x["sshfs"] for x in intervals) / seconds / 1048576
+
+        table.add_row(phase, f"{seconds:.0f}", f"{average['cpu']:.0f}%",
+                      f"{maximum['cpu']:.0f}%", f"{average['iowait']:.0f}%",
+                      f"{average['steal']:.0f}%", f"{maximum['load']:.1f}",
+                      f"{maximum['mem_used']}/{maximum['mem_total']}",
+                      f"{maximum['huge_used']}/{maximum['huge_total']}",
+                      f"{disk:.1f}", f"{average['disk_busy']:.0f}%",
+                      f"{sshfs:.1f}")
+
+        if average["cpu"] > 85:
+            recommendations.append(
+                f"{phase}: CPU bound, more VM CPUs (--vagrant-vm-cpus) "
+                "should help")
+        elif average["cpu"] < 30 and maximum["cpus"] > 1:
+            recommendations.append(
+                f"{phase}: CPUs mostly idle, fewer CPUs per VM and more "
+                "VMs (--parallel) would use the host better")
+
+        if maximum["mem_used"] > maximum["mem_total"] * 0.9:
+            recommendations.append(
+                f"{phase}: less than 10% memory available, increase "
+                "libvirt.memory in the Vagrantfile")
+
+        if 0 < maximum["huge_total"] <= maximum["huge_used"]:
+            recommendations.append(
+                f"{phase}: all hugepages were in use, reserve more in the "
+                "Vagrantfile")
+
+        if average["iowait"] > 20 or average["disk_busy"] > 80:
+            recommendations.append(
+                f"{phase}: disk I/O bound, consider a faster storage pool "
+                "for the VMs")
+
+        if sshfs > 1 and sshfs > disk:
+            recommendations.append(
+                f"{phase}: more sshfs than disk traffic, the sshfs mounted "
+                "source tree is a likely bottleneck")
+
+    console.print(table)
+    for recommendation in recommendations:
+        console.log(f"[bold yellow]  - [SIZING ] {recommendation}[/]")
+
+
+#
+# vm_console()
+#
+def vm_console(console, options):
+    '''Return the console to use for VM command output.
+
+    When running on a pool of VMs, the output of the individual VM commands
+    is not shown, as only a single rich status can be active at any time.
+    '''
+    if options.parallel > 0:
+        return None
+
+    return console
+
+
+#
+# cleanup_result_file()
+#
+def cleanup_result_file(file, target=None):
+    '''Delete file if it exists'''
+
+    if target is None:
+        raise ValueError("Vagrant target not set!")
+
+    try:
+        os.remove(f"./results/{target}/{file}")
+    except FileNotFoundError:
+        pass
+
+
+#
+# TestLogParser
+#
+class TestLogParser:
+    '''Incremental parser for autotest testsuite logs.
+
+    Lines are fed one at a time through feed(), which returns a TestResult
+    record for each test line found, or None. This allows the same parser to
+    be used on a complete log file, and on a log that is still being written.
+    The wall time of each test, which the test scripts append to the logs
+    they copy from the VM, is kept in wall_times by test number.
+    '''
+
+    def __init__(self):
+        self.parsing_results = False
+        self.parsing_errors = False
+        self.parsing_times = False
+        self.suite_duration = None
+        self.wall_times = {}
+
+    def feed(self, line):
+        '''Parse a single log line, and return a TestResult or None'''
+        line = line.rstrip('\r\n')
+
+        if " test suite duration: " in line:
+            #
+            # Merged shard logs contain multiple durations, as the shards
+            # ran in parallel, the longest one is the suite duration.
+            #
+            match = SUITE_DURATION_REGEX.match(line)
+            if match is not None:
+                hours, minutes, seconds = (int(x) for x in match.groups())
+                duration = hours * 3600 + minutes * 60 + seconds
+                self.suite_duration = max(duration,
+                                          self.suite_duration or 0)
+
+        elif line == "## Running the tests. ##":
+            self.parsing_results = True
+            self.parsing_errors = False
+            self.parsing_times = False
+
+        elif line == "## Summary of the failures. ##":
+            self.parsing_errors = True
+            self.parsing_results = False
+
+        elif line == "## Test wall times. ##":
+            self.parsing_times = True
+            self.parsing_results = False
+            self.parsing_errors = False
+
+        elif line in ("## Test results. ##", "Skipped tests:",
+                      "## Detailed failed tests. ##"):
+            self.parsing_results = False
+            self.parsing_errors = False
+
+        elif self.parsing_times:
+            match = WALL_TIME_REGEX.match(line)
+            if match is not None:
+                self.wall_times[str(int(match.group(1)))] = \
+                    float(match.group(2))
+
+        elif self.parsing_results:
+            if "): skipped " in line:
+                match = SKIP_REGEX.match(line)
+                if match is not None:
+                    return TestResult(*match.groups(), TEST_SKIPPED,
+                                      test_cpu_time(line))
+
+            if "): ok" in line:
+                match = PASS_REGEX.match(line)
+                if match is not None:
+                    return TestResult(*match.groups(), TEST_OK,
+                                      test_cpu_time(line))
+
+            if "): FAILED " in line:
+                match = FAIL_REGEX.match(line)
+                if match is not None:
+                    return TestResult(*match.groups(), TEST_FAILED)
+
+        elif self.parsing_errors:
+            match = ERROR_REGEX.match(line)
+            if match is not None:
+                number, location, name = match.groups()
+                return TestResult(number, name, location, TEST_FAILED)
+
+        return None
+
+
+#
+# test_cpu_time()
+#
+def test_cpu_time(line):
+    '''Return the CPU time of a test from its autotest result line.
+
+    Autotest appends the user and system time of the test to the result
+    line of passed and skipped tests, i.e. "(0m0.120s 0m0.050s)". Returns
+    the sum in seconds, or None if not available. This is not the wall time,
+    tests waiting for the system use far less CPU time.
+    '''
+    match = TIMES_REGEX.search(line)
+    if match is None:
+        return None
+
+    user_min, user_sec, sys_min, sys_sec = match.groups()
+    return int(user_min) * 60 + float(user_sec) + \
+        int(sys_min) * 60 + float(sys_sec)
+
+
+#
+# parse_test_log()
+#
+def parse_test_log(file):
+    '''Generator yielding a TestResult for each test in an autotest log.
+
+    The file is read in a single pass, line by line, so memory usage does not
+    depend on the size of the log.
+    '''
+    parser = TestLogParser()
+
+    with open(file, 'r', encoding="utf8", errors="ignore") as in_file:
+        for line in in_file:
+            result = parser.feed(line)
+            if result is not None:
+                yield result
+
+
+#
+# load_skip_list()
+#
+def load_skip_list(file, arch=HOST_ARCH):
+    '''Return the test names in a skip list that apply to arch.
+
+    The names are returned as a dict, keeping the skip list order, for fast
+    lookups. Parsed skip lists are cached on path and modification time, so
+    retries do not re-read the file, while edits are still picked up.
+    '''
+    mtime = os.stat(file).st_mtime_ns
+    key = (os.path.realpath(file), arch)
+
+    cached = SKIP_LIST_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    skip_names = {}
+    current_arch = None
+    with open(file, 'r', encoding="utf8") as in_file:
+        for line in in_file:
+            line = line.rstrip('\r\n')
+            if line.startswith('#') or line == '':
+                continue
+
+            arch_match = SKIP_LIST_ARCH_REGEX.match(line)
+            if arch_match:
+                current_arch = arch_match.group(1)
+                continue
+
+            if current_arch is not None and current_arch != arch:
+                continue
+
+            skip_names[line] = None
+
+    SKIP_LIST_CACHE[key] = (mtime, skip_names)
+    return skip_names
+
+
+#
+# process_results()
+#
+def process_results(file, target=None, skiplist=None, recorder=None):
+    '''Process the result file.
+
+    Check for errors and invalid skipped tests. If a SuiteRecorder is given,
+    each test is recorded while the log is parsed.
+    '''
+    if target is None:
+        raise ValueError("Vagrant target not set!")
+
+    file = (f"./results/{target}/{file}")
+
+    passed_names = set()
+    skipped_list = []
+    all_test_names = set()
+    errors = {}
+
+    try:
+        for result in parse_test_log(file):
+            all_test_names.add(result.name)
+
+            if recorder is not None:
+                recorder.record(result)
+
+            if result.status == TEST_OK:
+                passed_names.add(result.name)
+            elif result.status == TEST_SKIPPED:
+                skipped_list.append(result)
+            else:
+                errors.setdefault(result.number, result)
+    except (FileNotFoundError, PermissionError):
+        return None, None, None, None
+
+    #
+    # Failures are reported both while running, and in the summary.
+    #
+    error_list = list(errors.values())
+
+    #
+    # Remove valid skipped_list items, and detect stale and missing entries.
+    #
+    stale_list = []
+    missing_list = []
+    if skiplist is not None:
+        try:
+            skip_names = load_skip_list(skiplist)
+        except (FileNotFoundError, PermissionError):
+            return None, None, None, None
+
+        skipped_list = [x for x in skipped_list if x.name not in skip_names]
+        stale_list = [x for x in skip_names if x in passed_names]
+        missing_list = [x for x in skip_names if x not in all_test_names]
+
+    #
+    # Return the four lists
+    #
+    return error_list, skipped_list, stale_list, missing_list
+
+
+#
+# ResultEmitter
+#
+class ResultEmitter:
+    '''Writes machine readable test results, as JUnit XML and JSON Lines.
+
+    JSON Lines records are written as soon as a test is recorded. JUnit
+    requires the totals of a test suite up front, so each test suite run is
+    written once done, from a temporary file holding its test cases.
+    '''
+
+    def __init__(self, junit=None, jsonl=None):
+        self.lock = threading.Lock()
+        self.junit = None
+        self.jsonl = None
+
+        if junit is not None:
+            self.junit = open(junit, 'w', encoding="utf8")
+            self.junit.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                             '<testsuites>\n')
+            self.junit.flush()
+
+        if jsonl is not None:
+            self.jsonl = open(jsonl, 'w', encoding="utf8")
+
+    def suite(self, suite, attempt, target, skiplist=None, config=None):
+        '''Return a SuiteRecorder for a run of a test suite'''
+        return SuiteRecorder(self, suite, attempt, target, skiplist, config)
+
+    def write_json(self, record):
+        '''Write a JSON Lines record'''
+        if self.jsonl is None:
+            return
+
+        with self.lock:
+            self.jsonl.write(json.dumps(record) + "\n")
+            self.jsonl.flush()
+
+    def write_junit(self, header, cases, footer):
+        '''Write a JUnit test suite, with its test cases from a file'''
+        with self.lock:
+            self.junit.write(header)
+            shutil.copyfileobj(cases, self.junit)
+            self.junit.write(footer)
+            self.junit.flush()
+
+    def close(self):
+        '''Finish and close the output files'''
+        with self.lock:
+            if self.junit is not None:
+                self.junit.write('</testsuites>\n')
+                self.junit.close()
+
+            if self.jsonl is not None:
+                self.jsonl.close()
+
+
+#
+# SuiteRecorder
+#
+class SuiteRecorder:
+    '''Records the tests of a single test suite run for a ResultEmitter.
+
+    Each test is recorded once, even if it's seen multiple times, i.e. by the
+    live log monitor, and when processing the results. The skip list verdict
+    of a test is "valid" for a skipped test in the skip list, "unexpected"
+    for a skipped test not in it, and "stale" for a passed test in it.
+    The tests of a --matrix configuration are recorded with its name.
+    '''
+
+    def __init__(self, emitter, suite, attempt, target, skiplist=None,
+                 config=None):
+        self.emitter = emitter
+        self.suite = suite
+        self.config = config
+        self.attempt = attempt
+        self.target = target
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.numbers = set()
+        self.tests = 0
+        self.failures = 0
+        self.skipped = 0
+        self.cpu_time = 0.0
+        self.missing = []
+        self.cases = None
+        self.skip_names = {}
+
+        if skiplist is not None:
+            try:
+                self.skip_names = load_skip_list(skiplist)
+            except (FileNotFoundError, PermissionError):
+                pass
+
+        if emitter.junit is not None:
+            self.cases = tempfile.TemporaryFile('w+', encoding="utf8")
+
+    def record(self, result):
+        '''Record a TestResult, if not already done'''
+        with self.lock:
+            if result.number in self.numbers:
+                return
+
+            self.numbers.add(result.number)
+            self.tests += 1
+            self.cpu_time += result.cpu_time or 0
+
+        verdict = None
+        if result.name in self.skip_names:
+            verdict = "valid" if result.status == TEST_SKIPPED else \
+                "stale" if result.status == TEST_OK else None
+        elif result.status == TEST_SKIPPED:
+            verdict = "unexpected"
+
+        self.emitter.write_json(self.keyed({
+            "suite": self.suite, "attempt": self.attempt, "vm": self.target,
+            "number": int(result.number), "name": result.name,
+            "location": result.location, "status": result.status,
+            "cpu_time": None if result.cpu_time is None else
+            round(result.cpu_time, 3), "skip_list": verdict}))
+
+        if self.cases is None:
+            return
+
+        file, _, line = result.location.rpartition(":")
+        classname = f"ovs.{self.suite}" if self.config is None else \
+            f"ovs.{self.config}.{self.suite}"
+        case = f'    <testcase classname={quoteattr(classname)} ' \
+            f'name={quoteattr(f"{int(result.number)}. {result.name}")} ' \
+            f'file={quoteattr(file)} line={quoteattr(line)} ' \
+            f'time="{result.cpu_time or 0:.3f}"'
+
+        if result.status == TEST_FAILED:
+            case += '>\n      <failure message="FAILED" />\n' \
+                '    </testcase>\n'
+        elif result.status == TEST_SKIPPED:
+            case += '>\n      <skipped message=' + \
+                quoteattr(f"skip list: {verdict}") + ' />\n    </testcase>\n'
+        elif verdict == "stale":
+            case += '>\n      <properties>\n        <property ' \
+                'name="skip_list" value="stale" />\n      </properties>\n' \
+                '    </testcase>\n'
+        else:
+            case += ' />\n'
+
+        with self.lock:
+            if result.status == TEST_FAILED:
+                self.failures += 1
+            elif result.status == TEST_SKIPPED:
+                self.skipped += 1
+
+            self.cases.write(case)
+
+    def keyed(self, record):
+        '''Add the --matrix configuration, if any, to a JSON record'''
+        if self.config is not None:
+            record["config"] = self.config
+        return record
+
+    def close(self, missing_list=None):
+        '''Record the skip list entries not found, and write the suite'''
+
+        for name in missing_list or []:
+            self.emitter.write_json(self.keyed({
+                "suite": self.suite, "attempt": self.attempt,
+                "vm": self.target, "number": None, "name": name,
+                "location": None, "status": None, "cpu_time": None,
+                "skip_list": "missing"}))
+
+        if self.cases is None:
+            return
+
+        suite_name = self.suite if self.config is None else \
+            f"{self.config}/{self.suite}"
+        header = f'  <testsuite name={quoteattr(suite_name)} ' \
+            f'tests="{self.tests}" failures="{self.failures}" ' \
+            f'errors="0" skipped="{self.skipped}" ' \
+            f'time="{self.cpu_time:.3f}" timestamp="' + \
+            time.strftime("%Y-%m-%dT%H:%M:%S",
+                          time.localtime(self.started)) + \
+            f'" hostname={quoteattr(self.target)}>\n' \
+            '    <properties>\n' \
+            f'      <property name="attempt" value="{self.attempt}" />\n'
+        for name in missing_list or []:
+            header += '      <property name="skip_list_missing" ' \
+                f'value={quoteattr(name)} />\n'
+        header += '    </properties>\n'
+
+        self.cases.seek(0)
+        self.emitter.write_junit(header, self.cases, '  </testsuite>\n')
+        self.cases.close()
+
+
+#
+# ovs_commit()
+#
+def ovs_commit(path="./ovs"):
+    '''Return the OVS commit, with a "-dirty" suffix for local changes'''
+
+    try:
+        commit = subprocess.check_output(['git', '-C', path, 'rev-parse',
+                                          'HEAD'], encoding='utf8',
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.check_output(['git', '-C', path, 'status',
+                                         '--porcelain',
+                                         '--untracked-files=no'],
+                                        encoding='utf8',
+                                        stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+
+    return f"{commit}-dirty" if dirty else commit
+
+
+#
+# history_config()
+#
+def history_config(options):
+    '''Return the build configuration of a run, as stored in the history.
+
+    This is the --matrix configuration name, or else the sanitizers used.
+    '''
+    if options.matrix_config is not None:
+        return options.matrix_config
+
+    return "+".join(sorted(options.sanitizer)) or "none"
+
+
+#
+# history_connect()
+#
+def history_connect():
+    '''Open the test history database, and create it if needed'''
+
+    os.makedirs(os.path.dirname(HISTORY_DB), exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB, timeout=60)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            suite TEXT NOT NULL,
+            ovs_commit TEXT NOT NULL,
+            distro TEXT NOT NULL,
+            arch TEXT NOT NULL,
+            sanitizer TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            started REAL NOT NULL,
+            wall_time REAL,
+            tests INTEGER NOT NULL,
+            failures INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS results (
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            number INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            location TEXT NOT NULL,
+            status TEXT NOT NULL,
+            cpu_time REAL,
+            wall_time REAL);
+        CREATE TABLE IF NOT EXISTS retries (
+            suite TEXT NOT NULL,
+            name TEXT NOT NULL,
+            ovs_commit TEXT NOT NULL,
+            distro TEXT NOT NULL,
+            arch TEXT NOT NULL,
+            sanitizer TEXT NOT NULL,
+            started REAL NOT NULL,
+            attempts INTEGER NOT NULL,
+            passed INTEGER NOT NULL);
+        CREATE INDEX IF NOT EXISTS runs_suite ON runs(suite, ovs_commit);
+        CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+        CREATE INDEX IF NOT EXISTS results_name ON results(name);
+        CREATE INDEX IF NOT EXISTS retries_suite ON retries(suite, name);
+    ''')
+
+    #
+    # Histories from before the wall time of each test was known, stored
+    # its CPU time as the duration.
+    #
+    columns = {x[1] for x in conn.execute("PRAGMA table_info(results)")}
+    if "duration" in columns:
+        with conn:
+            conn.execute("ALTER TABLE results RENAME COLUMN duration TO "
+                         "cpu_time")
+            conn.execute("ALTER TABLE results ADD COLUMN wall_time REAL")
+
+    return conn
+
+
+#
+# record_history()
+#
+def record_history(options, test, test_log, attempt, started,
+                   wall_time=None):
+    '''Store the per-test results, CPU and wall times of a run in the
+    history.
+
+    The wall time reported by autotest in the log is used, if available. The
+    wall time of failed tests is not stored, their directory, on which it is
+    based, is kept after the test.
+    '''
+    parser = TestLogParser()
+    results = {}
+
+    try:
+        with open(f"./results/{options.vagrant_vm_name}/{test_log}", 'r',
+                  encoding="utf8", errors="ignore") as in_file:
+            for line in in_file:
+                result = parser.feed(line)
+                if result is not None:
+                    #
+                    # Keep the CPU time from the running section, for
+                    # failures also listed in the summary.
+                    #
+                    results.setdefault(result.number, result)
+    except (FileNotFoundError, PermissionError):
+        return
+
+    if test in options.selected:
+        # The wall time of a selection of tests says nothing about the suite.
+        wall_time = None
+    elif parser.suite_duration is not None:
+        wall_time = parser.suite_duration
+
+    failures = sum(1 for x in results.values() if x.status == TEST_FAILED)
+
+    with HISTORY_LOCK, closing(history_connect()) as conn, conn:
+        run_id = conn.execute(
+            "INSERT INTO runs (suite, ovs_commit, distro, arch, sanitizer, "
+            "attempt, started, wall_time, tests, failures) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (test, ovs_commit(), "ubuntu" if options.ubuntu else "fedora",
+             HOST_ARCH, history_config(options),
+             attempt, started, wall_time, len(results), failures)).lastrowid
+
+        conn.executemany(
+            "INSERT INTO results (run_id, number, name, location, status, "
+            "cpu_time, wall_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((run_id, int(x.number), x.name, x.location, x.status,
+              x.cpu_time, None if x.status == TEST_FAILED else
+              parser.wall_times.get(x.number)) for x in results.values()))
+
+
+#
+# record_retries()
+#
+def record_retries(options, test, retried):
+    '''Store the outcome of the retries of the tests that failed their first
+    run in the history. retried holds (TestResult, attempts, passed) tuples.
+    '''
+    with HISTORY_LOCK, closing(history_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT INTO retries (suite, name, ovs_commit, distro, arch, "
+            "sanitizer, started, attempts, passed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((test, result.name, ovs_commit(),
+              "ubuntu" if options.ubuntu else "fedora", HOST_ARCH,
+              history_config(options), time.time(),
+              attempts, passed) for result, attempts, passed in retried))
+
+
+#
+# quarantined_tests()
+#
+def quarantined_tests(options, test):
+    '''Return the names of the tests of a suite that are known to be flaky'''
+
+    if not os.path.exists(HISTORY_DB):
+        return set()
+
+    distro = "ubuntu" if options.ubuntu else "fedora"
+    with HISTORY_LOCK, closing(history_connect()) as conn:
+        return {x[2] for x in conn.execute(
+            QUARANTINE_QUERY, (HOST_ARCH, QUARANTINE_RETRIES,
+                               QUARANTINE_FLAKES))
+                if x[0] == test and x[1] == distro}
+
+
+#
+# suite_durations()
+#
+def suite_durations(options):
+    '''Return the expected wall time of each test suite in seconds.
+
+    This is the average of the last runs in the test history for the same
+    distribution and architecture, or a static default if there is none.
+    '''
+    durations = dict(DEFAULT_SUITE_DURATIONS)
+
+    if not os.path.exists(HISTORY_DB):
+        return durations
+
+    history = {}
+    with HISTORY_LOCK, closing(history_connect()) as conn:
+        for suite, wall_time in conn.execute(
+                "SELECT suite, wall_time FROM runs WHERE attempt = 1 AND "
+                "wall_time IS NOT NULL AND distro = ? AND arch = ? "
+                "ORDER BY started DESC",
+                ("ubuntu" if options.ubuntu else "fedora", HOST_ARCH)):
+            history.setdefault(suite, [])
+            if len(history[suite]) < HISTORY_RUNS:
+                history[suite].append(wall_time)
+
+    for suite, wall_times in history.items():
+        durations[suite] = statistics.mean(wall_times)
+
+    return durations
+
+
+#
+# test_durations()
+#
+def test_durations(options, test):
+    '''Return the average wall time of each test of a suite by test name'''
+
+    if not os.path.exists(HISTORY_DB):
+        return {}
+
+    with HISTORY_LOCK, closing(history_connect()) as conn:
+        return dict(conn.execute(
+            "SELECT t.name, AVG(t.wall_time) FROM results t "
+            "JOIN runs r ON r.id = t.run_id WHERE r.suite = ? AND "
+            "r.distro = ? AND r.arch = ? AND t.wall_time IS NOT NULL "
+            "GROUP BY t.name",
+            (test, "ubuntu" if options.ubuntu else "fedora", HOST_ARCH)))
+
+
+#
+# order_suites()
+#
+def order_suites(options):
+    '''Return the test suites to run, the longest running first'''
+
+    durations = suite_durations(options)
+    return sorted(options.run, key=lambda x: (-durations.get(x, 0), x))
+
+
+#
+# suite_testsuiteflags()
+#
+def suite_testsuiteflags(options, test, select=True):
+    '''Return the TESTSUITEFLAGS for the first run of a test suite.
+
+    Unless --testsuiteflags has a -j option, one is added to run as many tests
+    in parallel as the VM has CPUs, limited by the suite's max_jobs. Retries
+    do not use these flags, so they run serially. If only some tests of the
+    suite were selected, see select_changed_tests(), their numbers are added,
+    unless select is False, i.e. for shards, which have their own selection.
+    '''
+    testsuiteflags = options.testsuiteflags or ""
+
+    if test is not None and options.auto_jobs and \
+            not JOBS_REGEX.search(testsuiteflags):
+        jobs = options.vagrant_vm_cpus or os.cpu_count()
+        if TEST_SUITES[test].max_jobs > 0:
+            jobs = min(jobs, TEST_SUITES[test].max_jobs)
+
+        if jobs > 1:
+            testsuiteflags = f"{testsuiteflags} -j{jobs}".strip()
+
+    if select and test in options.selected:
+        testsuiteflags = f"{testsuiteflags} " \
+            f"{testsuite_ranges(options.selected[test])}".strip()
+
+    return testsuiteflags
+
+
+#
+# cached_suite()
+#
+def cached_suite(options, test):
+    '''Return the result cache key of a test suite, and its cached results.
+
+    The key covers everything that determines the outcome of the suite: the
+    key of the VM's OVS build, as stored by prepare_vm(), which includes the
+    DPDK tree, build configuration, and distribution, the VM's kernel, the
+    suite and its test script, and the TESTSUITEFLAGS and retries. The cached
+    results are None if there are none. The key is None if the cache is not
+    used.
+    '''
+    if not options.cache or options.dry_run:
+        return None, None
+
+    build = vm_build_key(options)
+    kernel = vm_kernel(options)
+    if build is None or kernel is None:
+        return None, None
+
+    key = hashlib.sha256()
+    for item in (SUITE_CACHE_VERSION, build,
+                 kernel, test, suite_testsuiteflags(options, test),
+                 str(options.retry)):
+        key.update(item.encode() + b"\0")
+
+    if TEST_SUITES[test].provisioner in VM_SCRIPTS:
+        key.update(vm_script(TEST_SUITES[test].provisioner).encode())
+
+    key = key.hexdigest()
+
+    try:
+        with open(f"{SUITE_CACHE_DIR}/{key}/result.json", 'r',
+                  encoding="utf8") as in_file:
+            return key, json.load(in_file)
+    except (FileNotFoundError, PermissionError, json.JSONDecodeError):
+        return key, None
+
+
+#
+# cache_suite_log()
+#
+def cache_suite_log(options, key, attempt, test_log):
+    '''Store the log of a test suite run in the result cache.
+
+    The results only become visible once all runs are stored, see
+    cache_suite_results(). Returns the key, or None on failure.
+    '''
+    os.makedirs(f"{SUITE_CACHE_DIR}/{key}", exist_ok=True)
+
+    try:
+        with open(f"./results/{options.vagrant_vm_name}/{test_log}",
+                  'rb') as in_file, \
+                gzip.open(f"{SUITE_CACHE_DIR}/{key}/run-{attempt}.log.gz",
+                          'wb', compresslevel=1) as out_file:
+            shutil.copyfileobj(in_file, out_file, 1024 * 1024)
+    except OSError:
+        return None
+
+    return key
+
+
+#
+# cache_suite_results()
+#
+def cache_suite_results(options, key, test, attempts):
+    '''Make the stored runs of a test suite available in the result cache'''
+
+    with open(f"{SUITE_CACHE_DIR}/{key}/result.json.tmp", 'w',
+              encoding="utf8") as out_file:
+        json.dump({"key": key, "suite": test, "attempts": attempts,
+                   "vm": options.vagrant_vm_name, "created": time.time()},
+                  out_file)
+
+    os.replace(f"{SUITE_CACHE_DIR}/{key}/result.json.tmp",
+               f"{SUITE_CACHE_DIR}/{key}/result.json")
+
+
+#
+# replay_suite_log()
+#
+def replay_suite_log(options, cached, attempt, test_log):
+    '''Restore a cached test suite log into the results directory.
+
+    Returns False if the run is not in the cache.
+    '''
+    if attempt > cached["attempts"]:
+        return False
+
+    try:
+        with gzip.open(f"{SUITE_CACHE_DIR}/{cached['key']}/"
+                       f"run-{attempt}.log.gz", 'rb') as in_file, \
+                open(f"./results/{options.vagrant_vm_name}/{test_log}",
+                     'wb') as out_file:
+            shutil.copyfileobj(in_file, out_file, 1024 * 1024)
+    except (OSError, EOFError):
+        return False
+
+    return True
+
+
+#
+# run_single_test()
+#
+def run_single_test(console, options, provision_list, skiplist_file, test_log,
+                    first_run_done=False, test=None, retry_round=None):
+    '''Run a single test case based on input parameters.
+
+    If first_run_done is set, the log of the first run is already in the
+    results directory, for example merged from shards, and only the retries
+    are run. If retry_round is set, it is called with the run number and the
+    TESTSUITEFLAGS of
+    the failed tests to run a retry, instead of running it on this VM. If test
+    is set, the results of each run are stored in the test history, and the
+    test suite logs in the result cache. If the cache has the logs of an
+    identical run, they are replayed instead of running the test suite.
+
+    Returns the failures, and the issues of the quarantined tests, as report
+    strings.
+    '''
+    current_run = 0
+    skipped_list = []
+    stale_list = []
+    missing_list = []
+    retry_list = []
+    retried = {}
+    stopped_early = False
+    vm_type = "ubuntu" if options.ubuntu else None
+    testsuiteflags = suite_testsuiteflags(options, test)
+
+    cache_key, cached = None, None
+    if test is not None:
+        cache_key, cached = cached_suite(options, test)
+        if cached is not None and not first_run_done:
+            console.log(f"[bold green]Replaying cached results of test "
+                        f"{test} on {options.vagrant_vm_name}[/]")
+        else:
+            cached = None
+
+    #
+    # Run test number of iteration until successful.
+    #
+    while current_run <= options.retry:
+        current_run += 1
+
+        started = time.time()
+        wall_time = None
+
+        recorder = None
+        if options.emitter is not None and test is not None:
+            recorder = options.emitter.suite(test, current_run,
+                                             options.vagrant_vm_name,
+                                             skiplist_file,
+                                             options.matrix_config)
+
+        if not options.dry_run and not (first_run_done and current_run == 1):
+            cleanup_result_file(test_log, target=options.vagrant_vm_name)
+
+            #
+            # Run the test suite if the cached run can not be replayed.
+            #
+            if cached is not None and not replay_suite_log(
+                    options, cached, current_run, test_log):
+                cache_key, cached = None, None
+
+            if cached is None:
+                if options.live:
+                    monitor = LiveLogMonitor(
+                        console, target=options.vagrant_vm_name,
+                        vm_type=vm_type, test_log=test_log,
+                        fail_fast=options.fail_fast, ssh=options.ssh,
+                        recorder=recorder, build_dir=options.ovs_build)
+                    monitor.start()
+
+                with TRACER.phase(f"{test or test_log} run {current_run}",
+                                  "run", vm=options.vagrant_vm_name):
+                    if retry_round is not None and current_run > 1:
+                        provisioned = retry_round(current_run,
+                                                  testsuiteflags)
+                    else:
+                        provisioned = run_suite_provisioners(
+                            console, options, provision_list, test_log,
+                            testsuiteflags)
+
+                if options.live:
+                    monitor.stop()
+                    stopped_early = monitor.stopped_suite
+
+                if not provisioned:
+                    if recorder is not None:
+                        recorder.close()
+                    return "[bold red]ERROR[/]: Failed make check!" + \
+                        failed_output(options.vagrant_vm_name), ""
+
+                wall_time = time.time() - started
+
+        (error_list, tmp_skipped_list,
+         tmp_stale_list, tmp_missing_list) = process_results(
+            test_log, target=options.vagrant_vm_name, skiplist=skiplist_file,
+            recorder=recorder)
+
+        if recorder is not None:
+            recorder.close(tmp_missing_list if current_run == 1 and
+                           test not in options.selected else None)
+
+        if error_list is None:
+            return (f"[bold red]  ERROR: Can't open file \"{test_log}\" "
+                    f"and/or \"{skiplist_file}\" for reading![/]", "")
+
+        if test is not None and options.history and not options.dry_run \
+                and cached is None:
+            record_history(options, test, test_log, current_run, started,
+                           wall_time=wall_time)
+
+        if cache_key is not None and cached is None:
+            cache_key = cache_suite_log(options, cache_key, current_run,
+                                        test_log)
+
+        #
+        # Keep track of the run in which each failed test passed, or the last
+        # run for tests that never passed.
+        #
+        failed = {x.number for x in error_list}
+        for result in retry_list:
+            retried[result.number] = (result, current_run,
+                                      result.number not in failed)
+
+        #
+        # We only need to keep the first skipped_list failures.
+        #
+        if len(skipped_list) == 0:
+            skipped_list = tmp_skipped_list
+
+        #
+        # Accumulate stale skips across all runs.
+        # Only capture missing skips on the first run, as reruns only contain
+        # a subset of tests (the failed ones), making absences meaningless.
+        # The same goes for runs of the tests impacted by a change only.
+        #
+        stale_list = list(set(stale_list) | set(tmp_stale_list))
+        if current_run == 1 and test not in options.selected:
+            missing_list = tmp_missing_list
+
+        #
+        # Break if all tests are successful, or if we stopped the test suite
+        # early, as a rerun would most likely stop again.
+        #
+        if len(error_list) == 0 or stopped_early:
+            break
+
+        #
+        # Re-run only the failed test cases
+        #
+        retry_list = error_list
+        testsuiteflags = ' '.join([x.number for x in error_list])
+
+    #
+    # Tests known to be flaky are reported separately from the failures.
+    # The quarantine is based on the history before this run.
+    #
+    quarantine = set()
+    if test is not None and options.quarantine:
+        quarantine = quarantined_tests(options, test)
+
+    if test is not None and options.history and not options.dry_run and \
+            cached is None and len(retried) > 0:
+        record_retries(options, test, retried.values())
+
+    #
+    # Only cache runs without unexpected failures, so a failure, i.e. caused
+    # by a host problem, is not replayed forever.
+    #
+    if cache_key is not None and cached is None:
+        if not stopped_early and \
+           all(x.name in quarantine for x in error_list):
+            cache_suite_results(options, cache_key, test, current_run)
+        else:
+            shutil.rmtree(f"{SUITE_CACHE_DIR}/{cache_key}",
+                          ignore_errors=True)
+
+    #
+    # Build error string
+    #
+    quarantined = ""
+    flaky_list = sorted((x for x in retried.values() if x[2]),
+                        key=lambda x: int(x[0].number))
+
+    failure_no = sum(1 for x in flaky_list if x[0].name not in quarantine)
+    if failure_no > 0:
+        failures = "[bold orange_red1]  - [WARNING] " \
             f"{failure_no} errors required a rerun![/]\n"
     else:
         failures = ""
 
-    error_list = [["FAILED"] + error for error in error_list]
-    skipped_list = [["SKIPPED"] + skip for skip in skipped_list]
+    if stopped_early:
+        failures += "[bold orange_red1]  - [WARNING] Test suite stopped " \
+            f"early after {options.fail_fast} failures![/]\n"
+
+    for issue, attempts, _ in flaky_list:
+        line = "[bold orange_red1]  - [FLAKY  ] " \
+            f"{int(issue.number):-4}. {issue.name} ({issue.location}), " \
+            f"passed on run {attempts}[/]\n"
+        if issue.name in quarantine:
+            quarantined += line
+        else:
+            failures += line
+
+    for issue in sorted(error_list + skipped_list, key=attrgetter('status')):
+        if issue.status == TEST_FAILED:
+            line = "[bold red]  - [FAILED ] " \
+                f"{int(issue.number):-4}. {issue.name} ({issue.location})[/]\n"
+            if issue.name in quarantine:
+                quarantined += line
+            else:
+                failures += line
+        else:
+            failures += "[bold dark_orange3]  - [SKIPPED] " \
+                f"{int(issue.number):-4}. {issue.name} ({issue.location})[/]\n"
+
+    for name in sorted(stale_list):
+        failures += "[bold yellow]  - [WARNING] " \
+            f"{name} passed but is listed in skip list[/]\n"
+
+    for name in sorted(missing_list):
+        failures += "[bold yellow]  - [WARNING] " \
+            f"{name} is in skip list but was not found in test results[/]\n"
+
+    return failures.rstrip('\r\n'), quarantined.rstrip('\r\n')
+
+
+#
+# run_suite()
+#
+def run_suite(console, options, test, first_run_done=False, retry_round=None):
+    '''Run the test cases of the given test suite'''
+    suite = TEST_SUITES[test]
+    with TRACER.phase(f"{test} suite", "suite", vm=options.vagrant_vm_name):
+        return run_single_test(console, options, [suite.provisioner],
+                               suite.skip_list, suite.log,
+                               first_run_done=first_run_done, test=test,
+                               retry_round=retry_round)
+
+
+#
+# list_suite_tests()
+#
+def list_suite_tests(options, test):
+    '''Return the (number, name, location) tuples of the tests in a suite.
+
+    The tests are taken from the autotest testsuite script generated in the
+    OVS source tree, or with --sync in the VM's copy of the tree. A script
+    older than the .at files of the OVS tree has different test numbers, and
+    is not used. If the script was not generated yet, the tests found in the
+    most recent log of the test suite are used. Returns an empty list if the
+    tests are unknown.
+    '''
+    suite = TEST_SUITES[test]
+    script = f"tests/{suite.log[:-len('.log')]}"
+    tree_mtime = max((os.path.getmtime(x)
+                      for x in glob.glob("./ovs/tests/*.at")), default=0)
+    output = None
+
+    try:
+        if options.sync:
+            arguments, env = vm_command(
+                target=options.vagrant_vm_name,
+                vm_type="ubuntu" if options.ubuntu else None,
+                box=options.vm_box, ssh=options.ssh,
+                command="sudo sh -c 'dir=$(mktemp -d) && cd $dir && "
+                f"stat -c %Y {VM_SOURCE_DIR}/ovs/{script} && "
+                f"sh {VM_SOURCE_DIR}/ovs/{script} --list; "
+                "status=$?; rm -rf $dir; exit $status'")
+            mtime, _, output = subprocess.check_output(
+                arguments, env=env, encoding='utf8',
+                stderr=subprocess.DEVNULL).partition("\n")
+            mtime = float(mtime)
+        else:
+            mtime = os.path.getmtime(f"./ovs/{script}")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                output = subprocess.check_output(
+                    ['sh', os.path.abspath(f"./ovs/{script}"), '--list'],
+                    cwd=tmp_dir, encoding='utf8', stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        output = None
+
+    if output is not None:
+        if int(mtime) < int(tree_mtime):
+            return []
+
+        tests = []
+        for line in output.split("\n"):
+            match = TEST_LIST_REGEX.match(line)
+            if match is not None:
+                tests.append((match.group(1), match.group(3),
+                              match.group(2)))
+
+        if len(tests) > 0:
+            return tests
+
+    logs = sorted(glob.glob(f"./results/*/{suite.log}"),
+                  key=os.path.getmtime)
+    if len(logs) == 0:
+        return []
+
+    tests = {result.number: (result.number, result.name, result.location)
+             for result in parse_test_log(logs[-1])}
+    return sorted(tests.values(), key=lambda x: int(x[0]))
+
+
+#
+# testsuite_ranges()
+#
+def testsuite_ranges(numbers):
+    '''Return test numbers as compact autotest ranges, i.e. "1-4 7 9-10"'''
+
+    ranges = []
+    for number in sorted(int(x) for x in numbers):
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+
+    return ' '.join(f"{start}-{end}" if start != end else f"{start}"
+                    for start, end in ranges)
+
+
+#
+# shard_tests()
+#
+def shard_tests(options, test, shards):
+    '''Split the tests of a suite in shards of consecutive test numbers.
+
+    The shards are sized on the test durations in the test history, so they
+    should all take about the same time. Tests without history count as an
+    average test. Returns a list of TESTSUITEFLAGS test selections, one for
+    each shard, or None if the suite's tests are unknown, or too few to shard.
+    '''
+    tests = list_suite_tests(options, test)
+    if test in options.selected:
+        tests = [x for x in tests if int(x[0]) in options.selected[test]]
+
+    if len(tests) < shards:
+        return None
+
+    durations = test_durations(options, test)
+    default = statistics.mean(durations.values()) if durations else 1.0
+    weights = [durations.get(name, default) for _, name, _ in tests]
+    total = sum(weights)
+
+    #
+    # Start a new shard each time the accumulated weight passes the next
+    # 1/shards part of the total, while leaving at least one test for each
+    # of the remaining shards.
+    #
+    selections = []
+    current = []
+    accumulated = 0
+    for index, ((number, _, _), weight) in enumerate(zip(tests, weights)):
+        current.append(number)
+        accumulated += weight
+
+        remaining_shards = shards - len(selections) - 1
+        if remaining_shards > 0 and (
+                accumulated >= total * (len(selections) + 1) / shards
+                or len(tests) - index - 1 == remaining_shards):
+            selections.append(testsuite_ranges(current))
+            current = []
+
+    selections.append(testsuite_ranges(current))
+    return selections
+
+
+#
+# run_shard()
+#
+def run_shard(console, options, test, shard, selection, retry=None):
+    '''Run a shard of a test suite, and return its log file, or None.
+
+    With retry set to the run number, the shard is a part of a retry round,
+    and its log is kept apart from the logs of the first run's shards.
+    '''
+    suite = TEST_SUITES[test]
+    testsuiteflags = f"{suite_testsuiteflags(options, test, select=False)} " \
+        f"{selection}".strip()
+    shard_log = f"./results/{options.vagrant_vm_name}/{suite.log}." + \
+        (f"retry{retry}.{shard}" if retry else f"{shard}")
+
+    cleanup_result_file(suite.log, target=options.vagrant_vm_name)
+
+    with TRACER.phase(f"{test} shard", "shard", vm=options.vagrant_vm_name,
+                      shard=shard, selection=selection):
+        if not run_suite_provisioners(console, options, [suite.provisioner],
+                                      suite.log, testsuiteflags):
+            return None
+
+    try:
+        os.replace(f"./results/{options.vagrant_vm_name}/{suite.log}",
+                   shard_log)
+    except FileNotFoundError:
+        return None
+
+    return shard_log
+
+
+#
+# merge_shard_logs()
+#
+def merge_shard_logs(options, test, shard_logs):
+    '''Concatenate the shard logs into the test suite's log'''
+
+    suite = TEST_SUITES[test]
+
+    cleanup_result_file(suite.log, target=options.vagrant_vm_name)
+    with open(f"./results/{options.vagrant_vm_name}/{suite.log}", 'wb') \
+            as out_file:
+        for shard_log in shard_logs:
+            with open(shard_log, 'rb') as in_file:
+                shutil.copyfileobj(in_file, out_file)
+
+
+#
+# changed_lines()
+#
+def changed_lines(base, path="./ovs"):
+    '''Return the files changed in a git tree since base, with their changes.
+
+    The working tree is compared, so uncommitted changes are included. For
+    each file, a list of the changed (first, last) line ranges in its current
+    version is returned. The list is empty if the lines are unknown, i.e. for
+    binary files. Returns None if git fails.
+    '''
+    try:
+        output = subprocess.check_output(['git', '-C', path, 'diff',
+                                          '--unified=0', '--no-color',
+                                          '--no-ext-diff', base, '--'],
+                                         encoding='utf8', errors="ignore",
+                                         stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+    changes = {}
+    ranges = None
+    for line in output.split("\n"):
+        if line.startswith("diff --git a/"):
+            ranges = changes.setdefault(line.split(" b/", 1)[-1], [])
+
+        elif line.startswith("+++ b/"):
+            ranges = changes.setdefault(line[6:], [])
+
+        elif line.startswith("@@ ") and ranges is not None:
+            match = HUNK_REGEX.match(line)
+            if match is not None:
+                first = int(match.group(1))
+                count = int(match.group(2) or 1)
+                ranges.append((first, first + max(count, 1) - 1))
+
+    return changes
+
+
+#
+# at_file_tests()
+#
+def at_file_tests(file, ranges):
+    '''Return the names of the tests in an autotest file the changes touch.
+
+    A test runs from its AT_SETUP to the next one. Returns None if all tests
+    in the file can be affected, i.e. when a change is before the first test,
+    where the file's macros are defined, or if the file can not be read.
+    '''
+    try:
+        with open(file, 'r', encoding="utf8", errors="ignore") as in_file:
+            setups = [(number, match.group(1))
+                      for number, match in enumerate(
+                          (AT_SETUP_REGEX.match(x) for x in in_file), 1)
+                      if match is not None]
+    except (FileNotFoundError, PermissionError, IsADirectoryError):
+        return None
+
+    if len(ranges) == 0 or len(setups) == 0 or \
+            min(x[0] for x in ranges) < setups[0][0]:
+        return None
+
+    names = set()
+    for index, (start, name) in enumerate(setups):
+        end = setups[index + 1][0] - 1 if index + 1 < len(setups) \
+            else float('inf')
+        if any(first <= end and last >= start for first, last in ranges):
+            names.add(name)
+
+    return names
+
+
+#
+# history_impacted_tests()
+#
+def history_impacted_tests(options, files, path="./ovs"):
+    '''Return the names of the tests, by suite, that started failing before
+    when any of the files changed.
+
+    For the last IMPACT_HISTORY_COMMITS tested commits of each suite, the
+    tests that failed, and did not pass on a retry, while they did not fail
+    on the previously tested commit, are linked to the files changed between
+    the two commits.
+    '''
+    if not os.path.exists(HISTORY_DB):
+        return {}
+
+    distro = "ubuntu" if options.ubuntu else "fedora"
+    commits = {}
+    failed = {}
+
+    with HISTORY_LOCK, closing(history_connect()) as conn:
+        for suite, commit in conn.execute(
+                "SELECT suite, ovs_commit FROM runs WHERE attempt = 1 AND "
+                "distro = ? AND arch = ? GROUP BY suite, ovs_commit "
+                "ORDER BY MIN(started)", (distro, HOST_ARCH)):
+            commits.setdefault(suite, []).append(commit)
+
+        for suite, commit, name in conn.execute(
+                "SELECT r.suite, r.ovs_commit, t.name FROM results t "
+                "JOIN runs r ON r.id = t.run_id WHERE r.attempt = 1 AND "
+                "r.distro = ? AND r.arch = ? AND t.status = 'failed' AND "
+                "NOT EXISTS (SELECT 1 FROM retries x WHERE "
+                "x.suite = r.suite AND x.name = t.name AND "
+                "x.ovs_commit = r.ovs_commit AND x.passed = 1)",
+                (distro, HOST_ARCH)):
+            failed.setdefault((suite, commit), set()).add(name)
+
+    impacted = {}
+    changed = {}
+    for suite, suite_commits in commits.items():
+        suite_commits = suite_commits[-IMPACT_HISTORY_COMMITS:]
+        for base, head in zip(suite_commits, suite_commits[1:]):
+            new_failures = failed.get((suite, head), set()) - \
+                failed.get((suite, base), set())
+            if len(new_failures) == 0:
+                continue
+
+            if (base, head) not in changed:
+                try:
+                    changed[(base, head)] = set(subprocess.check_output(
+                        ['git', '-C', path, 'diff', '--name-only',
+                         base.removesuffix("-dirty"),
+                         head.removesuffix("-dirty"), '--'],
+                        encoding='utf8',
+                        stderr=subprocess.DEVNULL).split())
+                except (subprocess.CalledProcessError, FileNotFoundError):
+                    changed[(base, head)] = set()
+
+            if changed[(base, head)] & files:
+                impacted.setdefault(suite, set()).update(new_failures)
+
+    return impacted
+
+
+#
+# impacted_tests()
+#
+def impacted_tests(options, changes, path="./ovs"):
+    '''Return the tests of the suites to run impacted by the changed files.
+
+    Returns a dict with, for each impacted suite, a set of test numbers, or
+    None to run all its tests, and a list with the reason for each selection.
+    If a core file changed, None and the reason are returned.
+    '''
+    tests = {x: list_suite_tests(options, x) for x in sorted(options.run)}
+    selected = {}
+    reasons = []
+
+    def select(test, numbers, reason):
+        if test not in tests or numbers is not None and len(numbers) == 0:
+            return
+
+        if numbers is None or len(tests[test]) == 0:
+            selected[test] = None
+            reasons.append(f"{test}: all tests, {reason}")
+        else:
+            if selected.get(test, set()) is not None:
+                selected[test] = selected.get(test, set()) | numbers
+            reasons.append(f"{test}: {len(numbers)} tests, {reason}")
+
+    def at_file_numbers(test, at_file, prefix=False):
+        return {int(number) for number, _, location in tests.get(test, [])
+                if (location.startswith(at_file) if prefix
+                    else location.rsplit(":", 1)[0] == at_file)}
+
+    for file, ranges in sorted(changes.items()):
+        if IMPACT_FULL_RUN_REGEX.match(file):
+            return None, [f"{file} is a core file"]
+
+        if file.startswith("tests/") and file.endswith(".at"):
+            at_file = os.path.basename(file)
+            names = at_file_tests(os.path.join(path, file), ranges)
+
+            for test in tests:
+                numbers = at_file_numbers(test, at_file)
+                matched = {int(number) for number, name, _ in tests[test]
+                           if name in (names or ()) and
+                           int(number) in numbers}
+                #
+                # Titles using macros do not match the test names, in which
+                # case all tests in the file are run.
+                #
+                if names is not None and len(matched) == len(names):
+                    numbers = matched
+
+                select(test, numbers, f"changed tests in {file}")
+            continue
+
+        for regex, targets in IMPACT_RULES:
+            if regex.search(file):
+                for test, prefix in targets.items():
+                    select(test, at_file_numbers(test, prefix, prefix=True)
+                           if prefix else None, f"{file} changed")
+                break
+        else:
+            stem = os.path.splitext(os.path.basename(file))[0]
+            stem = stem.removeprefix("test-").replace("_", "-")
+            numbers = at_file_numbers("check", f"{stem}.at")
+            select("check", numbers or None, f"{file} changed, " +
+                   (f"tested in {stem}.at" if numbers else "no .at file"))
+
+    for test, names in history_impacted_tests(options, set(changes),
+                                              path=path).items():
+        select(test, {int(number) for number, name, _ in tests.get(test, [])
+                      if name in names},
+               "failed before when the same files changed")
+
+    return selected, reasons
+
+
+#
+# select_changed_tests()
+#
+def select_changed_tests(console, options):
+    '''Only run the test suites, and tests, impacted by the OVS changes since
+    the --changed-since commit. Returns False on failure.
+    '''
+    changes = changed_lines(options.changed_since)
+    if changes is None:
+        console.print("[bold red]ERROR[/]: Failed getting the OVS changes "
+                      f"since \"{options.changed_since}\"!")
+        return False
+
+    selected, reasons = impacted_tests(options, changes)
+    if selected is None:
+        console.log(f"[bold dark_orange3]Running all tests, {reasons[0]}[/]")
+        return True
+
+    for reason in reasons:
+        console.log(f"[bold cyan]  - {reason}[/]")
+
+    for test in sorted(options.run - set(selected)):
+        console.log(f"[bold dark_orange3]Skipping test {test}, not impacted "
+                    "by the changes[/]")
+
+    options.run = set(selected)
+    options.selected = {x: y for x, y in selected.items() if y is not None}
+    return True
+
+
+#
+# suite_failed_tests()
+#
+def suite_failed_tests(options, tests):
+    '''Return the numbers of the failed tests of the given test suites.
+
+    The failures are taken from the test suite logs in the VM's results
+    directory, so after the retries. Suites without failures are left out.
+    '''
+    failed = {}
+
+    for test in tests:
+        suite = TEST_SUITES[test]
+        error_list, _, _, _ = process_results(suite.log,
+                                              target=options.vagrant_vm_name,
+                                              skiplist=suite.skip_list)
+        if error_list:
+            failed[test] = sorted({int(x.number) for x in error_list})
+
+    return failed
+
+
+#
+# collect_failed_tests()
+#
+def collect_failed_tests(options, failed):
+    '''Stream an archive with the directories of the failed tests.
+
+    Only the autotest directories of the failed tests, the test suite logs,
+    and the sanitizer reports are collected. They are compressed in the VM
+    with multi-threaded zstd, and streamed over SSH into the results
+    directory. Returns the archive, an empty string if there was nothing to
+    collect, or None on failure.
+    '''
+    target = options.vagrant_vm_name
+    config = vagrant_ssh_config(target=target,
+                                vm_type="ubuntu" if options.ubuntu else None,
+                                box=options.vm_box)
+    if config is None:
+        return None
+
+    failed_tests = " ".join(
+        f"{os.path.splitext(TEST_SUITES[test].log)[0]}:"
+        f"{','.join(str(x) for x in numbers)}"
+        for test, numbers in sorted(failed.items()))
+    archive = f"./results/{target}/failed_test_results.tar.zst"
+
+    with TRACER.phase("Collect failed tests", "collect", vm=target), \
+            open(os.path.join(VM_SCRIPTS_DIR, "get_failed_test_dir.sh"),
+                 'rb') as script, open(archive, 'wb') as out_file:
+        result = subprocess.run(
+            ['ssh', '-F', config] + SSH_OPTIONS +
+            [target, vm_script_command({"FAILED_TESTS": failed_tests,
+                                        "OVS_BUILD": options.ovs_build})],
+            stdin=script, stdout=out_file, stderr=subprocess.DEVNULL,
+            check=False)
+
+    if result.returncode != 0:
+        os.remove(archive)
+        return "" if result.returncode == 2 else None
+
+    return archive
+
+
+#
+# read_archive_member()
+#
+def read_archive_member(data, member):
+    '''Return the content of a member of an indexed results archive.
+
+    The data is the (memory mapped) ZIP archive, and the member a list of
+    its name, local header offset, compression type, compressed size, and
+    size, as stored in the index.
+    '''
+    _, offset, compress_type, compress_size, _ = member
+    name_length, extra_length = struct.unpack_from('<HH', data, offset + 26)
+    start = offset + 30 + name_length + extra_length
+    content = data[start:start + compress_size]
+
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(content, -15)
+
+    return content
+
+
+#
+# index_test_archive()
+#
+def index_test_archive(options, archive):
+    '''Convert a tar archive with test results into a seekable one.
+
+    The files are stored as separate members of a ZIP archive, and a JSON
+    index maps the test numbers of each test suite to their members' offsets,
+    together with the test's name, file:line location, and status from the
+    test suite logs. The tar archive is removed once done. Returns the index
+    file, or None on failure.
+    '''
+    target = options.vagrant_vm_name
+    zip_file = f"./results/{target}/test_results.zip"
+    index_file = f"./results/{target}/test_results.json"
+    scripts = {os.path.splitext(suite.log)[0]: test
+               for test, suite in TEST_SUITES.items()}
+
+    if archive.endswith(".zst"):
+        if shutil.which("zstd") is None:
+            return None
+
+        process = subprocess.Popen(['zstd', '-dcq', archive],
+                                   stdout=subprocess.PIPE)
+        stream = process.stdout
+    else:
+        process = None
+        stream = open(archive, 'rb')
+
+    try:
+        with stream, tarfile.open(fileobj=stream, mode='r|*') as tar, \
+                zipfile.ZipFile(zip_file, 'w',
+                                compression=zipfile.ZIP_DEFLATED,
+                                compresslevel=1) as out_zip:
+            for member in tar:
+                if not member.isfile():
+                    continue
+
+                with tar.extractfile(member) as in_file, \
+                        out_zip.open(member.name.removeprefix("./"), 'w',
+                                     force_zip64=member.size >
+                                     zipfile.ZIP64_LIMIT) as out_file:
+                    shutil.copyfileobj(in_file, out_file, 1024 * 1024)
+
+            members = out_zip.infolist()
+    except (tarfile.TarError, OSError, zlib.error):
+        members = None
+    finally:
+        if process is not None and process.wait() != 0:
+            members = None
+
+    if members is None:
+        cleanup_result_file(os.path.basename(zip_file), target=target)
+        return None
+
+    #
+    # Index the members of the test directories, and the suite logs.
+    #
+    suites = {}
+    for info in members:
+        entry = [info.filename, info.header_offset, info.compress_type,
+                 info.compress_size, info.file_size]
+        match = ARCHIVE_TEST_REGEX.search(info.filename)
+
+        if match is not None and match.group(1) in scripts:
+            suite = suites.setdefault(scripts[match.group(1)],
+                                      {"log": None, "tests": {}})
+            suite["tests"].setdefault(str(int(match.group(2))), {
+                "name": "", "location": "", "status": "",
+                "members": []})["members"].append(entry)
+
+        elif match is None and \
+                os.path.basename(info.filename)[:-4] in scripts and \
+                info.filename.endswith(".log"):
+            suite = suites.setdefault(
+                scripts[os.path.basename(info.filename)[:-4]],
+                {"log": None, "tests": {}})
+            suite["log"] = entry
+
+    #
+    # Add the test details, preferring the suite log in the archive, as it
+    # belongs to the test directories, over the one in the results directory.
+    #
+    with open(zip_file, 'rb') as in_file, \
+            mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for test, suite in suites.items():
+            results = {}
+            log = f"./results/{target}/{TEST_SUITES[test].log}"
+            if os.path.exists(log):
+                for result in parse_test_log(log):
+                    results.setdefault(result.number, result)
+
+            if suite["log"] is not None:
+                parser = TestLogParser()
+                archive_results = {}
+                for line in read_archive_member(data, suite["log"]).decode(
+                        "utf8", errors="ignore").splitlines():
+                    result = parser.feed(line)
+                    if result is not None:
+                        archive_results.setdefault(result.number, result)
+                results |= archive_results
+
+            for number, details in suite["tests"].items():
+                if number in results:
+                    details["name"] = results[number].name
+                    details["location"] = results[number].location
+                    details["status"] = results[number].status
+
+    with open(index_file, 'w', encoding="utf8") as out_file:
+        json.dump({"archive": os.path.basename(zip_file), "suites": suites},
+                  out_file)
+
+    os.remove(archive)
+    return index_file
+
+
+#
+# gather_test_directory()
+#
+def gather_test_directory(console, options, failed=None):
+    '''Get the test directory of the VM, for later review.
+
+    If failed is given, a dictionary of the failed test numbers by test
+    suite, only their directories are collected, unless --full-test-dir is
+    set. Otherwise, or if collecting them fails, the full test directory is
+    copied.
+    '''
+    if failed is not None and not options.full_test_dir:
+        console.log("[bold cyan]Start collecting failed tests from "
+                    f"{options.vagrant_vm_name}[/]")
+        archive = collect_failed_tests(options, failed)
+        if archive is not None:
+            if archive:
+                with TRACER.phase("Index test archive", "collect",
+                                  vm=options.vagrant_vm_name):
+                    archive = index_test_archive(options, archive) or archive
+
+            console.log("[bold green]Finished collecting failed tests from "
+                        f"{options.vagrant_vm_name}"
+                        f"{f' to {archive}' if archive else ''}[/]")
+            return
+
+        console.log("[bold dark_orange3]Failed collecting failed tests, "
+                    "getting the full test directory instead[/]")
+
+    console.log("[bold cyan]Start gathering test directory from "
+                f"{options.vagrant_vm_name}[/]")
+    if not run_provisioners(console, options, ["Get test directory"],
+                            quiet=True):
+        console.print("[bold red]ERROR[/]: Failed getting test directory!")
+    else:
+        with TRACER.phase("Index test archive", "collect",
+                          vm=options.vagrant_vm_name):
+            index = index_test_archive(
+                options, f"./results/{options.vagrant_vm_name}/"
+                "full_test_results.tgz")
+
+        if index is None:
+            console.print("[bold red]ERROR[/]: Failed indexing test "
+                          "directory!")
+
+    console.log("[bold green]Finished gathering test directory from "
+                f"{options.vagrant_vm_name}[/]")
+
+
+#
+# report_failures()
+#
+def report_failures(console, failures, quarantined=None):
+    '''Report all test failures, and return True if there where none.
+
+    The issues of quarantined tests are reported, but are not failures.
+    '''
+    if quarantined:
+        console.log("[bold orange_red1]=========== QUARANTINED TESTS "
+                    "===========[/]")
+
+        for test in sorted(quarantined):
+            console.log(f"[bold cyan]Quarantined tests for {test}:[/]\n" +
+                        quarantined[test])
+
+    if len(failures) > 0:
+        console.log("[bold red]============ TESTS FAILURES ============[/]")
+
+        for test in sorted(failures):
+            console.log(f"[bold cyan]Test failures for {test}:[/]\n" +
+                        failures[test])
+        return False
+
+    console.log("[bold green]============ NO FAILURES ============[/]")
+    return True
+
+
+#
+# run_suites()
+#
+def run_suites(console, options):
+    '''Run all tests in the options.run set, and return the failures, and
+    the issues of the quarantined tests, as report strings by test suite.
+    '''
+
+    failures = {}
+    quarantined = {}
+
+    for test in order_suites(options):
+        console.log(f"[bold cyan]Starting test {test}[/]")
+
+        results, quarantine = run_suite(console, options, test)
+        if len(quarantine) > 0:
+            console.log(quarantine)
+            quarantined[test] = quarantine
 
-    for issue in sorted(error_list + skipped_list, key=itemgetter(0)):
-        if issue[0] == "FAILED":
-            failures += "[bold red]  - [FAILED ] " \
-                f"{int(issue[1]):-4}. {issue[2]} ({issue[3]})[/]\n"
+        if len(results) == 0:
+            console.log(f"[bold green]Finished test {test}[/]")
         else:
-            failures += "[bold dark_orange3]  - [SKIPPED] " \
-                f"{int(issue[1]):-4}. {issue[2]} ({issue[3]})[/]\n"
+            console.log(results)
+            failures[test] = results
+            console.log(f"[bold red]Finished test {test}[/]")
 
-    for name in sorted(stale_list):
-        failures += "[bold yellow]  - [WARNING] " \
-            f"{name} passed but is listed in skip list[/]\n"
+    if len(failures) > 0:
+        #
+        # Get the failed tests' results just in case we want to review them.
+        #
+        gather_test_directory(console, options,
+                              suite_failed_tests(options, failures))
 
-    for name in sorted(missing_list):
-        failures += "[bold yellow]  - [WARNING] " \
-            f"{name} is in skip list but was not found in test results[/]\n"
+    return failures, quarantined
+
+
+#
+# run_tests()
+#
+def run_tests(console, options):
+    '''Run all tests in the options.run set, and report the failures'''
+    return report_failures(console, *run_suites(console, options))
 
-    return failures.rstrip('\r\n')
+
+#
+# SuiteShards
+#
+class SuiteShards:
+    '''Keeps track of the shards of a test suite running on a VM pool.
+
+    With retry set to the run number, the shards are the parts of a retry
+    round, which are merged by the VM that started the round, see
+    run_retry_round(). They only run on VMs with the same OVS build, build.
+    '''
+    def __init__(self, shards, retry=None, build=None):
+        self.lock = threading.Lock()
+        self.pending = shards
+        self.retry = retry
+        self.build = build
+        self.finished = threading.Event()
+        self.logs = []
+        self.failed = []
+        self.cached = None
+
+    def check_cache(self, lookup):
+        '''Check once, for all shards, if the test suite's results are cached.
+
+        Returns True if this shard has to replay the cached results of the
+        suite, False if it has to run, or None if it has to be skipped, as
+        the results are replayed by another shard.
+        '''
+        with self.lock:
+            if self.cached is None:
+                self.cached = lookup()
+                return self.cached
+
+            return None if self.cached else False
+
+    def shard_done(self, shard, shard_log):
+        '''Record a finished shard, and return True if it was the last'''
+        with self.lock:
+            if shard_log is None:
+                self.failed.append(shard)
+            else:
+                self.logs.append((shard, shard_log))
+
+            self.pending -= 1
+            if self.pending == 0:
+                self.finished.set()
+                return True
+
+            return False
+
+
+#
+# VmPool
+#
+class VmPool:
+    '''The job queue of a pool of VMs, see run_parallel_worker().
+
+    Workers wait for new jobs until all jobs are done, as running jobs can
+    queue retry jobs for the idle VMs. Retry jobs are only given to VMs with
+    the OVS build of the VM that queued them.
+    '''
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.jobs = []
+        self.outstanding = 0
+        self.idle = set()
+        self.vms = []
+        self.builds = {}
+
+    def add_vm(self, options):
+        '''Add the options of a VM that is ready to run jobs'''
+        build = vm_build_key(options)
+        with self.condition:
+            self.vms.append(options)
+            self.builds[options.vagrant_vm_name] = build
+
+    def next_job(self, target, retry_only=False):
+        '''Remove and return the first job the VM can run, or None'''
+        for job in self.jobs:
+            shard = job[1]
+            if retry_only and (shard is None or not shard[2].retry):
+                continue
+
+            if shard is None or shard[2].build is None or \
+                    shard[2].build == self.builds.get(target):
+                self.jobs.remove(job)
+                return job
+
+        return None
+
+    def put(self, job, front=False):
+        '''Queue a job, retry jobs are queued in front'''
+        with self.condition:
+            self.jobs.insert(0 if front else len(self.jobs), job)
+            self.outstanding += 1
+            self.condition.notify_all()
+
+    def get(self, target):
+        '''Wait for the next job the VM can run, and return None once all
+        jobs are done.
+        '''
+        with self.condition:
+            self.idle.add(target)
+            job = self.next_job(target)
+            while job is None and self.outstanding > 0:
+                self.condition.wait()
+                job = self.next_job(target)
+
+            self.idle.discard(target)
+            return job
+
+    def get_retry(self, target, retry_shards):
+        '''Wait for a queued retry job the VM can run, and return None once
+        the retry round of retry_shards is finished.
+        '''
+        with self.condition:
+            while not retry_shards.finished.is_set():
+                job = self.next_job(target, retry_only=True)
+                if job is not None:
+                    return job
+
+                self.condition.wait()
+
+            return None
+
+    def done(self):
+        '''Mark a job returned by get() or get_retry() as done'''
+        with self.condition:
+            self.outstanding -= 1
+            self.condition.notify_all()
+
+    def idle_vms(self, build):
+        '''Return the number of VMs with the given build waiting for a job'''
+        with self.condition:
+            return sum(self.builds.get(x) == build for x in self.idle)
 
 
 #
-# run_afxdp()
+# run_pool_shard()
 #
-def run_afxdp(console, options):
-    '''Run afxdp test cases'''
-    return run_single_test(console, options, ["Test: check-afxdp"],
-                           "skip_lists/check_afxdp.skip_list",
-                           "system-afxdp-testsuite.log")
+def run_pool_shard(console, options, test, shard):
+    '''Run a shard job of the VM pool.
+
+    Returns True if it was the last shard of the first run of a test suite,
+    in which case the caller has to merge the logs and do the retries.
+    '''
+    number, selection, suite_shards = shard
+    kind = "retry" if suite_shards.retry else "shard"
+
+    if suite_shards.retry:
+        #
+        # Retries run the failed tests only, and serially, as for a single VM.
+        #
+        options = copy.copy(options)
+        options.testsuiteflags = None
+        options.auto_jobs = False
+
+    console.log(f"[bold cyan]Starting test {test} {kind} {number} on "
+                f"{options.vagrant_vm_name}[/]")
+    shard_log = run_shard(console, options, test, number, selection,
+                          retry=suite_shards.retry)
+    console.log(f"[bold cyan]Finished test {test} {kind} {number} on "
+                f"{options.vagrant_vm_name}[/]")
+
+    return suite_shards.shard_done(number, shard_log) and \
+        not suite_shards.retry
+
+
+#
+# run_retry_round()
+#
+def run_retry_round(console, options, test, pool, current_run,
+                    testsuiteflags):
+    '''Run a retry round of a test suite, spread over the idle pool VMs.
+
+    The failed tests are split over this VM and the idle VMs with the same
+    OVS build, and the logs of the parts are merged into the test suite's
+    log. While the parts are running, this VM also runs queued retry jobs.
+    Returns True if all parts ran successfully.
+    '''
+    build = vm_build_key(options)
+    numbers = testsuiteflags.split()
+    parts = min(len(numbers), pool.idle_vms(build) + 1)
+
+    if parts <= 1:
+        return run_suite_provisioners(console, options,
+                                      [TEST_SUITES[test].provisioner],
+                                      TEST_SUITES[test].log, testsuiteflags)
+
+    console.log(f"[bold cyan]Retrying {len(numbers)} tests of {test} on "
+                f"{parts} VMs[/]")
+
+    retry_shards = SuiteShards(parts, retry=current_run, build=build)
+    for part in range(parts):
+        pool.put((test, (part + 1, " ".join(numbers[part::parts]),
+                         retry_shards)), front=True)
+
+    while True:
+        with TRACER.phase("Wait for retry parts", "wait",
+                          vm=options.vagrant_vm_name):
+            job = pool.get_retry(options.vagrant_vm_name, retry_shards)
+        if job is None:
+            break
+
+        run_pool_shard(console, options, *job)
+        pool.done()
+
+    merge_shard_logs(options, test,
+                     [log for _, log in sorted(retry_shards.logs)])
+    return len(retry_shards.failed) == 0
 
 
 #
-# run_check()
+# run_parallel_worker()
 #
-def run_check(console, options):
-    '''Run check test cases'''
-    return run_single_test(console, options, ["Test: check"],
-                           "skip_lists/check.skip_list", "testsuite.log")
+def run_parallel_worker(console, options, pool, setup_lock, failures,
+                        quarantined, failed_tests):
+    '''Prepare a pool VM, and run jobs from the pool until all are done.
+
+    A job is a (test, shard) tuple, where shard is None for a complete test
+    suite, or a (number, selection, SuiteShards) tuple. The VM running the
+    last shard of a test suite merges the shard logs, and does the retries.
+    The retries are spread over the idle VMs.
+    '''
+    target = options.vagrant_vm_name
+
+    with TRACER.phase("Wait for setup slot", "wait", vm=target):
+        setup_lock.acquire()
+
+    try:
+        with TRACER.phase("Prepare VM", "vm", vm=target):
+            prepared = prepare_vm(console, options)
+    finally:
+        setup_lock.release()
+
+    if not prepared:
+        console.log(f"[bold red]VM {target} failed, not running tests on "
+                    "it[/]")
+        return
+
+    pool.add_vm(options)
+
+    def retry_round(test):
+        return lambda run, flags: run_retry_round(console, options, test,
+                                                  pool, run, flags)
+
+    while True:
+        job = pool.get(target)
+        if job is None:
+            break
+
+        test, shard = job
+        replay = shard is not None and not shard[2].retry and \
+            shard[2].check_cache(
+                lambda: cached_suite(options, test)[1] is not None)
+
+        if replay is None:
+            pool.done()
+            continue
+
+        if shard is None or replay:
+            console.log(f"[bold cyan]Starting test {test} on {target}[/]")
+            results, quarantine = run_suite(console, options, test,
+                                            retry_round=retry_round(test))
+        else:
+            if not run_pool_shard(console, options, test, shard):
+                pool.done()
+                continue
+
+            suite_shards = shard[2]
+            merge_shard_logs(options, test,
+                             [log for _, log in sorted(suite_shards.logs)])
+            results, quarantine = run_suite(console, options, test,
+                                            first_run_done=True,
+                                            retry_round=retry_round(test))
+            if len(suite_shards.failed) > 0:
+                results = "[bold red]ERROR[/]: Failed make check for " \
+                    f"shard(s) {sorted(suite_shards.failed)}!\n" + results
+
+        if len(quarantine) > 0:
+            quarantined[test] = quarantine
+
+        if len(results) == 0:
+            console.log(f"[bold green]Finished test {test} on {target}[/]")
+        else:
+            failures[test] = results
+            failed_tests.update(suite_failed_tests(options, [test]))
+            console.log(f"[bold red]Finished test {test} on {target}[/]")
+
+        pool.done()
 
 
 #
-# run_dpdk()
+# run_parallel()
 #
-def run_dpdk(console, options):
-    '''Run dpdk test cases'''
-    return run_single_test(console, options, ["Test: check-dpdk"],
-                           "skip_lists/check_dpdk.skip_list",
-                           "system-dpdk-testsuite.log")
+def run_parallel(console, options):
+    '''Run all tests in the options.run set on a pool of VMs'''
+
+    failures = {}
+    quarantined = {}
+    failed_tests = {}
+    pool = VmPool()
+    setup_lock = threading.BoundedSemaphore(options.parallel_setup)
+
+    #
+    # Queue the jobs with the longest expected duration first, so the
+    # long running suites do not end up last on an otherwise idle pool.
+    #
+    durations = suite_durations(options)
+    queued_jobs = []
+
+    for test in options.run:
+        selections = None
+        if options.shards > 1 and not options.dry_run:
+            selections = shard_tests(options, test, options.shards)
+            if selections is None:
+                console.log(f"[bold dark_orange3]Can't shard test {test}, "
+                            "tests unknown or testsuite script out of "
+                            "date[/]")
+
+        if selections is None:
+            queued_jobs.append((durations.get(test, 0), test, None))
+            continue
+
+        suite_shards = SuiteShards(len(selections))
+        for number, selection in enumerate(selections, 1):
+            queued_jobs.append((durations.get(test, 0) / len(selections),
+                                test, (number, selection, suite_shards)))
+
+    for _, test, shard in sorted(queued_jobs, key=lambda x: (-x[0], x[1])):
+        pool.put((test, shard))
+
+    workers = []
+    for vm in range(min(options.parallel, len(pool.jobs))):
+        vm_options = copy.copy(options)
+        vm_options.vagrant_vm_name = f"{options.vagrant_vm_name}-{vm + 1}"
+        os.makedirs(f"./results/{vm_options.vagrant_vm_name}/",
+                    exist_ok=True)
+
+        worker = threading.Thread(target=run_parallel_worker,
+                                  name=vm_options.vagrant_vm_name,
+                                  args=(console, vm_options, pool,
+                                        setup_lock, failures, quarantined,
+                                        failed_tests))
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        worker.join()
+
+    #
+    # Get the failed tests' results from all VMs, as the retries of a test
+    # suite can run on other VMs than the test suite itself.
+    #
+    if len(failures) > 0:
+        for vm_options in pool.vms:
+            gather_test_directory(console, vm_options, failed_tests)
+
+    #
+    # Report tests that could not be run, as none of the VMs came up.
+    #
+    for test, _ in pool.jobs:
+        failures[test] = "[bold red]ERROR[/]: No VM available to run the " \
+            "test!"
+
+    return report_failures(console, failures, quarantined)
 
 
 #
-# run_kernel()
+# history_slowest()
 #
-def run_kernel(console, options):
-    '''Run kernel test cases'''
-    return run_single_test(console, options, ["Test: check-kernel"],
-                           "skip_lists/check_kernel.skip_list",
-                           "system-kmod-testsuite.log")
+def history_slowest(conn, options):
+    '''Return a table of the slowest tests'''
+
+    table = Table("Suite", "Test", "Name", "Runs", "Avg (s)", "Max (s)",
+                  title="Slowest tests by wall time")
+    query = "SELECT r.suite, t.number, t.name, COUNT(*), " \
+        "AVG(t.wall_time), MAX(t.wall_time) FROM results t " \
+        "JOIN runs r ON r.id = t.run_id " \
+        "WHERE t.wall_time IS NOT NULL AND (? IS NULL OR r.suite = ?) " \
+        "GROUP BY r.suite, t.name ORDER BY AVG(t.wall_time) DESC LIMIT ?"
+
+    for suite, number, name, runs, avg, maximum in conn.execute(
+            query, (options.suite, options.suite, options.limit)):
+        table.add_row(suite, str(number), name, str(runs), f"{avg:.2f}",
+                      f"{maximum:.2f}")
+
+    return table
 
 
 #
-# run_offloads()
+# history_regressions()
 #
-def run_offloads(console, options):
-    '''Run TC offload test cases'''
-    return run_single_test(console, options, ["Test: check-offloads"],
-                           "skip_lists/check_offloads.skip_list",
-                           "system-offloads-testsuite.log")
+def history_regressions(conn, options):
+    '''Return a table of tests that got slower between two commits.
+
+    If no commits are given, the two most recently tested commits are used.
+    '''
+    base, head = options.base, options.head
+    if base is None or head is None:
+        commits = [x[0] for x in conn.execute(
+            "SELECT ovs_commit FROM runs GROUP BY ovs_commit "
+            "ORDER BY MAX(started) DESC LIMIT 2")]
+        if len(commits) < 2:
+            return "Not enough commits in the history to compare!"
+
+        head = head or commits[0]
+        base = base or commits[1]
+
+    table = Table("Suite", "Name", f"{base[:12]} (s)", f"{head[:12]} (s)",
+                  "Change", title=f"Tests slower in {head[:12]} than in "
+                  f"{base[:12]} by at least {options.threshold}%")
+    query = '''
+        WITH durations AS (
+            SELECT r.suite, t.name, r.ovs_commit,
+                AVG(t.wall_time) AS duration
+            FROM results t JOIN runs r ON r.id = t.run_id
+            WHERE t.wall_time IS NOT NULL AND t.status = 'ok'
+                AND (? IS NULL OR r.suite = ?)
+            GROUP BY r.suite, t.name, r.ovs_commit)
+        SELECT b.suite, b.name, b.duration, h.duration
+        FROM durations b JOIN durations h
+            ON b.suite = h.suite AND b.name = h.name
+        WHERE b.ovs_commit LIKE ? || '%' AND h.ovs_commit LIKE ? || '%'
+            AND h.duration > b.duration * (1 + ? / 100.0)
+            AND h.duration - b.duration >= ?
+        ORDER BY h.duration - b.duration DESC LIMIT ?'''
+
+    for suite, name, base_duration, head_duration in conn.execute(
+            query, (options.suite, options.suite, base, head,
+                    options.threshold, options.min_change, options.limit)):
+        change = (head_duration - base_duration) / base_duration * 100 \
+            if base_duration else float('inf')
+        table.add_row(suite, name, f"{base_duration:.2f}",
+                      f"{head_duration:.2f}", f"+{change:.0f}%")
+
+    return table
 
 
 #
-# run_ovsdb()
+# history_trend()
 #
-def run_ovsdb(console, options):
-    '''Run ovsdb cluster test cases'''
-    return run_single_test(console, options, ["Test: check-ovsdb-cluster"],
-                           "skip_lists/check_ovsdb_cluster.skip_list",
-                           "ovsdb-cluster-testsuite.log")
+def history_trend(conn, options):
+    '''Return a table of the wall time of the most recent suite runs'''
+
+    table = Table("Suite", "Date", "OVS commit", "Distro", "Config",
+                  "Tests", "Failures", "Wall time (s)")
+    query = "SELECT suite, started, ovs_commit, distro, sanitizer, tests, " \
+        "failures, wall_time FROM runs WHERE attempt = 1 AND " \
+        "(? IS NULL OR suite = ?) ORDER BY suite, started DESC"
+
+    runs = {}
+    for row in conn.execute(query, (options.suite, options.suite)):
+        runs.setdefault(row[0], [])
+        if len(runs[row[0]]) < options.limit:
+            runs[row[0]].append(row)
+
+    for suite in sorted(runs):
+        for (_, started, commit, distro, sanitizer, tests, failures,
+             wall_time) in reversed(runs[suite]):
+            table.add_row(suite,
+                          time.strftime("%Y-%m-%d %H:%M",
+                                        time.localtime(started)),
+                          commit[:12], distro, sanitizer, str(tests),
+                          str(failures),
+                          "-" if wall_time is None else f"{wall_time:.0f}")
+
+    return table
 
 
 #
-# run_tso()
+# history_flaky()
 #
-def run_tso(console, options):
-    '''Run system TSO test cases'''
-    return run_single_test(console, options, ["Test: check-system-tso"],
-                           "skip_lists/check_system_tso.skip_list",
-                           "system-tso-testsuite.log")
+def history_flaky(conn, options):
+    '''Return a table of the tests that passed on a retry'''
+
+    quarantine = set(conn.execute(QUARANTINE_QUERY,
+                                  (HOST_ARCH, QUARANTINE_RETRIES,
+                                   QUARANTINE_FLAKES)))
+    table = Table("Suite", "Name", "Distro", "Runs", "Retried", "Flaked",
+                  "Flake rate", "Last flake", "Quarantined",
+                  title=f"Tests that passed on a retry on {HOST_ARCH}")
+    query = '''
+        SELECT q.suite, q.name, q.distro, COUNT(*), SUM(q.passed),
+            MAX(CASE WHEN q.passed THEN q.started END),
+            (SELECT COUNT(*) FROM results t JOIN runs r ON r.id = t.run_id
+             WHERE r.attempt = 1 AND r.suite = q.suite AND t.name = q.name
+                AND r.distro = q.distro AND r.arch = q.arch)
+        FROM retries q WHERE q.arch = ? AND (? IS NULL OR q.suite = ?)
+        GROUP BY q.suite, q.name, q.distro HAVING SUM(q.passed) > 0
+        ORDER BY SUM(q.passed) DESC, COUNT(*) DESC LIMIT ?'''
+
+    for suite, name, distro, retried, flaked, last, runs in conn.execute(
+            query, (HOST_ARCH, options.suite, options.suite, options.limit)):
+        table.add_row(suite, name, distro, str(runs), str(retried),
+                      str(flaked),
+                      f"{flaked / runs * 100:.1f}%" if runs else "-",
+                      time.strftime("%Y-%m-%d %H:%M", time.localtime(last)),
+                      "yes" if (suite, distro, name) in quarantine else "no")
+
+    return table
 
 
 #
-# run_userspace()
+# history_command()
 #
-def run_userspace(console, options):
-    '''Run userspace test cases'''
-    return run_single_test(console, options, ["Test: check-system-userspace"],
-                           "skip_lists/check_system_userspace.skip_list",
-                           "system-userspace-testsuite.log")
+def history_command(arguments):
+    '''Query the test history, "history --help" for details'''
+
+    parser = argparse.ArgumentParser(prog=f"{sys.argv[0]} history")
+    parser.add_argument("query",
+                        help="Report the slowest tests, the tests that got "
+                        "slower between two commits, the wall time trend "
+                        "of the test suites, or the flaky tests",
+                        choices=["slowest", "regressions", "trend", "flaky"])
+    parser.add_argument("--base",
+                        help="Base OVS commit (prefix) for regressions, "
+                        "default the second most recent commit", type=str)
+    parser.add_argument("--head",
+                        help="OVS commit (prefix) to compare against the "
+                        "base, default the most recent commit", type=str)
+    parser.add_argument("--limit",
+                        help="Maximum number of entries, default 20",
+                        type=int, default=20)
+    parser.add_argument("--min-change",
+                        help="Minimal regression in seconds, default 0.5",
+                        type=float, default=0.5)
+    parser.add_argument("--suite",
+                        help="Only report on this test suite",
+                        choices=sorted(TEST_SUITES))
+    parser.add_argument("--threshold",
+                        help="Minimal regression in percent, default 20",
+                        type=float, default=20)
+
+    options = parser.parse_args(arguments)
+    console = Console(log_path=False)
+
+    if not os.path.exists(HISTORY_DB):
+        console.print("[bold red]ERROR[/]: No test history available!")
+        return -1
+
+    with closing(history_connect()) as conn:
+        console.print(globals()[f"history_{options.query}"](conn, options))
+
+    return 0
 
 
 #
-# run_tests()
+# show_command()
 #
-def run_tests(console, options):
-    '''Run all tests in the options.run set'''
+def show_command(arguments):
+    '''Show the files of a collected test, "show --help" for details'''
+
+    parser = argparse.ArgumentParser(prog=f"{sys.argv[0]} show")
+    parser.add_argument("suite", help="Test suite of the test",
+                        choices=sorted(TEST_SUITES))
+    parser.add_argument("test", help="Test number", type=int)
+    parser.add_argument("-l", "--list",
+                        help="Only list the files of the test",
+                        action="store_true")
+    parser.add_argument("--vagrant-vm-name",
+                        help="Only show the results of this VM", type=str)
 
-    vm_type = "ubuntu" if options.ubuntu else None
-    failures = {}
+    options = parser.parse_args(arguments)
+    console = Console(log_path=False)
+    found = False
+
+    for index_file in sorted(glob.glob(
+            f"./results/{options.vagrant_vm_name or '*'}/test_results.json")):
+        with open(index_file, 'r', encoding="utf8") as in_file:
+            index = json.load(in_file)
+
+        test = index["suites"].get(options.suite, {}).get(
+            "tests", {}).get(str(options.test))
+        if test is None:
+            continue
+
+        found = True
+        details = f": {test['name']} ({test['location']}): " \
+            f"{test['status']}" if test["name"] else ""
+        console.print(f"[bold cyan]{options.suite} test {options.test}"
+                      f"{details}, from {os.path.dirname(index_file)}[/]",
+                      highlight=False)
+
+        with open(os.path.join(os.path.dirname(index_file),
+                               index["archive"]), 'rb') as in_file, \
+                mmap.mmap(in_file.fileno(), 0,
+                          access=mmap.ACCESS_READ) as data:
+            for member in test["members"]:
+                if options.list:
+                    console.print(f"  {member[0]} ({member[4]} bytes)",
+                                  highlight=False)
+                    continue
+
+                console.rule(member[0])
+                content = read_archive_member(data, member)
+                if b"\0" in content[:8192]:
+                    console.print(f"(binary file, {len(content)} bytes)")
+                else:
+                    console.print(content.decode("utf8", errors="replace"),
+                                  markup=False, highlight=False, end="")
+
+    if not found:
+        console.print(f"[bold red]ERROR[/]: Test {options.test} of "
+                      f"{options.suite} not found in the indexed results!")
+        return -1
+
+    return 0
 
-    for test in options.run:
-        console.log(f"[bold cyan]Starting test {test}[/]")
 
-        results = globals()[f"run_{test}"](console, options)
-        if results is None or len(results) == 0:
-            console.log(f"[bold green]Finished test {test}[/]")
-        else:
-            console.log(results)
-            failures[test] = results
-            console.log(f"[bold red]Finished test {test}[/]")
+#
+# ci_git()
+#
+def ci_git(path, *arguments):
+    '''Run a git command in a repository, and return its output'''
+    return subprocess.check_output(['git', '-C', path] + list(arguments),
+                                   encoding='utf8',
+                                   stderr=subprocess.STDOUT).strip()
+
+
+#
+# ci_load_state()
+#
+def ci_load_state():
+    '''Return the state of the CI daemon, the last commit seen on the
+    branch, and the queue of commits to test.
+    '''
+    try:
+        with open(f"{CI_RESULTS_DIR}/state.json", 'r',
+                  encoding="utf8") as in_file:
+            return json.load(in_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"seen": None, "queue": []}
+
+
+#
+# ci_save_state()
+#
+def ci_save_state(state):
+    '''Store the state of the CI daemon'''
+
+    os.makedirs(CI_RESULTS_DIR, exist_ok=True)
+    with open(f"{CI_RESULTS_DIR}/state.json.tmp", 'w',
+              encoding="utf8") as out_file:
+        json.dump(state, out_file, indent=2)
+
+    os.replace(f"{CI_RESULTS_DIR}/state.json.tmp",
+               f"{CI_RESULTS_DIR}/state.json")
+
+
+#
+# ci_branch_ref()
+#
+def ci_branch_ref(options):
+    '''Return the ref of the polled branch. With --fetch, this is the
+    remote-tracking branch of origin, as fetching does not move the local
+    branch.
+    '''
+    if options.fetch:
+        return f"refs/remotes/origin/{options.branch}"
+
+    return f"refs/heads/{options.branch}"
+
+
+#
+# ci_poll()
+#
+def ci_poll(console, options, state):
+    '''Queue the commits added to the options' branch since the last poll.
+
+    The first time, and when the branch was rewritten, only its last commit
+    is queued. Returns the number of queued commits, or None on failure.
+    '''
+    try:
+        if options.fetch:
+            ci_git(options.repo, "fetch", "--quiet", "origin",
+                   options.branch)
+
+        tip = ci_git(options.repo, "rev-parse", "--verify",
+                     f"{ci_branch_ref(options)}^{{commit}}")
+        if tip == state["seen"]:
+            return 0
+
+        commits = [tip]
+        if state["seen"] is not None and subprocess.run(
+                ['git', '-C', options.repo, 'merge-base', '--is-ancestor',
+                 state["seen"], tip], check=False,
+                stderr=subprocess.DEVNULL).returncode == 0:
+            commits = ci_git(options.repo, "rev-list", "--reverse",
+                             "--first-parent",
+                             f"{state['seen']}..{tip}").split()
+
+    except (subprocess.CalledProcessError, FileNotFoundError) as error:
+        console.print(f"[bold red]ERROR[/]: Failed polling {options.repo}: "
+                      f"{escape(str(getattr(error, 'output', error)))}")
+        return None
+
+    state["seen"] = tip
+    state["queue"] += commits
+    console.log(f"[bold cyan]Queued {len(commits)} new commit(s) of "
+                f"{options.branch}, {len(state['queue'])} waiting[/]")
+    return len(commits)
+
+
+#
+# ci_next_job()
+#
+def ci_next_job(options, state):
+    '''Remove the next job from the queue, and return its commits.
+
+    When more than options.max_queue commits are waiting, they are merged
+    into a single job, which tests the newest commit.
+    '''
+    queue = state["queue"]
+
+    if len(queue) > options.max_queue:
+        commits, state["queue"] = queue, []
+    else:
+        commits, state["queue"] = queue[:1], queue[1:]
+
+    return commits
+
+
+#
+# ci_checkout()
+#
+def ci_checkout(console, options, commit):
+    '''Check out a commit of the polled repository in the ./ovs directory.
+
+    Unless the repository is ./ovs itself, as for bisect, ./ovs is a clone
+    of it owned by the daemon, and is created if missing. Any local changes
+    in ./ovs are discarded. Returns False on failure.
+    '''
+    repo = os.path.realpath(options.repo)
+
+    try:
+        if not os.path.exists("./ovs"):
+            ci_git(".", "clone", "--quiet", "--no-checkout", repo, "./ovs")
+
+        if os.path.realpath("./ovs") != repo:
+            if subprocess.run(['git', '-C', './ovs', 'config', '--get',
+                               'remote.origin.url'], check=False,
+                              stdout=subprocess.PIPE, encoding='utf8',
+                              stderr=subprocess.DEVNULL).stdout.strip() \
+                    != repo:
+                console.print("[bold red]ERROR[/]: ./ovs is not a clone "
+                              f"of {escape(repo)}, move it away so the "
+                              "daemon can create one!")
+                return False
+
+            ci_git("./ovs", "fetch", "--quiet", "origin",
+                   ci_branch_ref(options))
+
+        ci_git("./ovs", "checkout", "--quiet", "--force", "--detach", commit)
+    except (subprocess.CalledProcessError, FileNotFoundError) as error:
+        console.print(f"[bold red]ERROR[/]: Failed checking out {commit}: "
+                      f"{escape(str(getattr(error, 'output', error)))}")
+        return False
+
+    #
+    # The DPDK tree is used as is, so warn if OVS expects another version.
+    #
+    try:
+        with open("./ovs/.github/workflows/build-and-test.yml", 'r',
+                  encoding="utf8") as in_file:
+            expected = re.search(r'DPDK_VER:\s*(\S+)', in_file.read())
+        with open("./dpdk/VERSION", 'r', encoding="utf8") as in_file:
+            version = in_file.read().strip()
+    except FileNotFoundError:
+        return True
+
+    if expected is not None and expected.group(1) != version:
+        console.log(f"[bold dark_orange3]OVS {commit[:12]} is tested with "
+                    f"DPDK {expected.group(1)}, but ./dpdk is {version}[/]")
+    return True
+
+
+#
+# notify_log()
+#
+def notify_log(argument, subject, body):
+    '''Append the notification to a file, default
+    results/ci/notifications.log.
+    '''
+    with open(argument or f"{CI_RESULTS_DIR}/notifications.log", 'a',
+              encoding="utf8") as out_file:
+        out_file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {subject}\n"
+                       f"{body}\n\n")
+
+    return True
+
+
+#
+# notify_command()
+#
+def notify_command(argument, subject, body):
+    '''Run a shell command with the notification as an email on stdin,
+    i.e. "msmtp --host=<SMTP_SERVER> -f <EMAIL> <EMAIL>".
+    '''
+    return subprocess.run(argument, shell=True, check=False,
+                          input=f"Subject: {subject}\n\n{body}\n",
+                          encoding='utf8').returncode == 0
+
+
+#
+# Notifiers for the CI daemon, see "daemon --notify".
+#
+NOTIFIERS = {
+    "command": notify_command,
+    "log": notify_log,
+}
+
+
+#
+# ci_run_job()
+#
+def ci_run_job(console, options, run_options, commits):
+    '''Test the last of the commits, and store the results in a new
+    directory in CI_RESULTS_DIR.
+
+    Returns True if all tests passed, False if any failed, and None if the
+    tests could not be run.
+    '''
+    commit = commits[-1]
+    started = time.time()
+    job_dir = f"{CI_RESULTS_DIR}/" \
+        f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-" \
+        f"{commit[:12]}"
+    os.makedirs(job_dir, exist_ok=True)
+
+    console.log(f"[bold cyan]Testing {commit[:12]}" +
+                (f", merged with the {len(commits) - 1} commit(s) before it"
+                 if len(commits) > 1 else "") + "[/]")
+
+    job_console = Console(log_path=False, record=True)
+    success = None
+
+    if ci_checkout(job_console, options, commit):
+        job_options = copy.copy(run_options)
+        job_options.run = set(run_options.run)
+        job_options.selected = {}
+        job_options.emitter = ResultEmitter(junit=f"{job_dir}/junit.xml",
+                                            jsonl=f"{job_dir}/results.jsonl")
+        try:
+            success = run_pipeline(job_console, job_options)
+        finally:
+            job_options.emitter.close()
+
+    #
+    # Keep the collected test results of the job's VMs.
+    #
+    targets = [run_options.vagrant_vm_name]
+    if run_options.parallel > 0:
+        targets = [f"{run_options.vagrant_vm_name}-{vm + 1}"
+                   for vm in range(run_options.parallel)]
+
+    for target in targets:
+        for name in ("test_results.zip", "test_results.json"):
+            if os.path.exists(f"./results/{target}/{name}"):
+                os.makedirs(f"{job_dir}/{target}", exist_ok=True)
+                shutil.copy2(f"./results/{target}/{name}",
+                             f"{job_dir}/{target}/{name}")
+
+    result = {True: "passed", False: "failed", None: "error"}[success]
+    with open(f"{job_dir}/summary.json", 'w', encoding="utf8") as out_file:
+        json.dump({"commit": commit, "commits": commits, "result": result,
+                   "started": started, "finished": time.time()},
+                  out_file, indent=2)
+    job_console.save_text(f"{job_dir}/console.log")
+
+    #
+    # Notify with the last lines of the job's output, like run_ci.sh.
+    #
+    try:
+        title = ci_git("./ovs", "log", "-1", "--format=%s", commit)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        title = ""
+
+    subject = f"{'Successful' if success else 'FAILED'} OVS datapath run " \
+        f"for {commit[:12]} (\"{title}\")"
+    with open(f"{job_dir}/console.log", 'r', encoding="utf8") as in_file:
+        tail = in_file.read().splitlines()[-CI_REPORT_LINES:]
+    body = f"Commits: {', '.join(x[:12] for x in commits)}\n" \
+        f"Results: {os.path.abspath(job_dir)}\n\n" + "\n".join(tail)
+
+    for name, argument in options.notify:
+        if not NOTIFIERS[name](argument, subject, body):
+            console.print(f"[bold red]ERROR[/]: Failed notifying with "
+                          f"\"{name}\"!")
+
+    console.log(f"[bold {'green' if success else 'red'}]Finished "
+                f"{commit[:12]}: {result}, see {job_dir}[/]")
+    return success
+
+
+#
+# daemon_command()
+#
+def daemon_command(arguments):
+    '''Test new commits of an OVS repository, "daemon --help" for details'''
+
+    run_arguments = []
+    if "--" in arguments:
+        run_arguments = arguments[arguments.index("--") + 1:]
+        arguments = arguments[:arguments.index("--")]
+
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} daemon",
+        epilog="Options after -- are used for the test runs, i.e. "
+        "\"-- --parallel 4 --ssh\"")
+    parser.add_argument("--branch",
+                        help="Branch to test, default main",
+                        type=str, default="main")
+    parser.add_argument("--busy-command",
+                        help="Shell command that succeeds while the host is "
+                        "busy, i.e. \"systemctl is-active --quiet ovn-ci\", "
+                        "no tests are started until it fails", type=str)
+    parser.add_argument("--fetch",
+                        help="Fetch the branch from the origin of the "
+                        "repository before each poll, and poll "
+                        "origin/BRANCH", action="store_true")
+    parser.add_argument("--max-queue",
+                        help="Merge the queued commits into a single run of "
+                        "the newest one when more are waiting, default 3",
+                        type=int, default=3)
+    parser.add_argument("--notify",
+                        help="Notify about each run, as NAME or "
+                        "NAME:ARGUMENT, i.e. \"command:msmtp -t\", can be "
+                        f"repeated, default log, choices {sorted(NOTIFIERS)}",
+                        action="append", type=str)
+    parser.add_argument("--once",
+                        help="Exit once the queue is empty, waiting for the "
+                        "host to be free if it is busy",
+                        action="store_true")
+    parser.add_argument("--poll",
+                        help="Seconds between polls, default 300",
+                        type=float, default=300)
+    parser.add_argument("--repo",
+                        help="Git repository to poll, which can not be "
+                        "./ovs, as the commits are checked out in a clone "
+                        "of it there", type=str, required=True)
+
+    options = parser.parse_args(arguments)
+    options.notify = [x.partition(":")[::2]
+                      for x in options.notify or ["log"]]
+
+    for name, _ in options.notify:
+        if name not in NOTIFIERS:
+            print(f"ERROR: Unknown notifier \"{name}\"!")
+            return -1
+
+    if options.max_queue < 1:
+        print("ERROR: --max-queue should be one or larger!")
+        return -1
+
+    if os.path.realpath(options.repo) == os.path.realpath("./ovs"):
+        print("ERROR: --repo can not be ./ovs, where the commits are "
+              "checked out!")
+        return -1
+
+    run_options = parse_arguments(run_arguments)
+    console = Console(log_path=False)
+    state = ci_load_state()
+    busy = False
+
+    console.log(f"[bold cyan]Testing new commits of {options.branch} in "
+                f"{options.repo}[/]")
+    try:
+        while True:
+            if ci_poll(console, options, state) is not None:
+                ci_save_state(state)
+
+            if state["queue"] and options.busy_command and subprocess.run(
+                    options.busy_command, shell=True, check=False,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL).returncode == 0:
+                if not busy:
+                    console.log("[bold dark_orange3]Host is busy, waiting "
+                                "before testing[/]")
+                busy = True
+
+            elif state["queue"]:
+                busy = False
+                commits = ci_next_job(options, state)
+                ci_save_state(state)
+
+                if ci_run_job(console, options, run_options,
+                              commits) is not None:
+                    #
+                    # Keep the VMs warm, they only need to build the next
+                    # commit.
+                    #
+                    run_options.clean_vagrant = False
+                    run_options.skip_provision = True
+                continue
+
+            if options.once and not state["queue"]:
+                return 0
+
+            time.sleep(options.poll)
+    except KeyboardInterrupt:
+        console.log("[bold cyan]Stopped testing new commits[/]")
+
+    return 0
+
+
+#
+# bisect_run()
+#
+def bisect_run(console, options, job_options, numbers):
+    '''Run the given test numbers of the bisected test suite once.
+
+    Returns the TestResults of the tests, or None on failure.
+    '''
+    suite = TEST_SUITES[options.suite]
+    target = job_options.vagrant_vm_name
+
+    job_options.selected = {options.suite: set(numbers)}
+    testsuiteflags = suite_testsuiteflags(job_options, options.suite)
+    cleanup_result_file(suite.log, target=target)
+
+    with TRACER.phase(f"{options.suite} run", "run", vm=target):
+        if not run_suite_provisioners(console, job_options,
+                                      [suite.provisioner], suite.log,
+                                      testsuiteflags):
+            return None
+
+    #
+    # Failed tests are listed again in the summary of the failures, with
+    # their names padded, so only their first result is used.
+    #
+    results = {}
+    try:
+        for result in parse_test_log(f"./results/{target}/{suite.log}"):
+            if int(result.number) in numbers:
+                results.setdefault(result.number, result._replace(
+                    name=result.name.strip()))
+    except FileNotFoundError:
+        return None
+
+    return list(results.values())
+
+
+#
+# bisect_commit()
+#
+def bisect_commit(console, options, run_options, commit, names):
+    '''Build a commit, and run the bisected tests on it.
+
+    The names dictionary maps the test numbers to run to their names, which
+    are None for the first commit tested, so they are taken from its log.
+    If the tests that ran have other names, the tests were renumbered, and
+    they are looked up by name in the testsuite and run again. The tests are
+    run up to options.runs times, until it is clear whether any test fails
+    at least options.min_failures times.
+
+    Returns the number of failures of each test by name, and the names of
+    the test numbers, or None if the commit could not be built or tested.
+    '''
+    if not ci_checkout(console, options, commit):
+        return None
+
+    job_options = copy.copy(run_options)
+    job_options.run = {options.suite}
+
+    with TRACER.phase("Prepare VM", "vm", vm=job_options.vagrant_vm_name):
+        if not prepare_vm(console, job_options):
+            return None
+
+    #
+    # Keep the VM warm, so the next commits only need to be built.
+    #
+    run_options.clean_vagrant = False
+    run_options.skip_provision = True
+
+    failures = {name: 0 for name in names.values() if name is not None}
+    resolved = False
+    runs = 0
+
+    while runs < options.runs:
+        most = max(failures.values(), default=0)
+        if most >= options.min_failures or \
+           most + options.runs - runs < options.min_failures:
+            break
+
+        results = bisect_run(console, options, job_options, sorted(names))
+        if results is None:
+            return None
+
+        ran = {int(result.number): result.name for result in results}
+        if any(ran.get(number) is None or name not in (None, ran[number])
+               for number, name in names.items()):
+            tests = {name: int(number) for number, name, _ in
+                     list_suite_tests(job_options, options.suite)}
+            if resolved or None in names.values() or \
+               any(name not in tests for name in names.values()):
+                console.log(f"[bold dark_orange3]Tests {sorted(names)} not "
+                            f"found in {commit[:12]}[/]")
+                return None
+
+            names = {tests[name]: name for name in names.values()}
+            resolved = True
+            continue
+
+        names = ran
+        runs += 1
+        for result in results:
+            failures.setdefault(result.name, 0)
+            if result.status == TEST_FAILED:
+                failures[result.name] += 1
+
+    return failures, names
+
+
+#
+# bisect_command()
+#
+def bisect_command(arguments):
+    '''Find the OVS commit that broke tests, "bisect --help" for details'''
+
+    run_arguments = []
+    if "--" in arguments:
+        run_arguments = arguments[arguments.index("--") + 1:]
+        arguments = arguments[:arguments.index("--")]
+
+    parser = argparse.ArgumentParser(
+        prog=f"{sys.argv[0]} bisect",
+        epilog="Options after -- are used for the test runs, i.e. "
+        "\"-- --ssh --sync\"")
+    parser.add_argument("--bad",
+                        help="OVS commit where the tests fail",
+                        type=str, required=True)
+    parser.add_argument("--good",
+                        help="OVS commit where the tests pass",
+                        type=str, required=True)
+    parser.add_argument("--min-failures",
+                        help="Failures of a test in the --runs runs that "
+                        "make a commit bad, default a majority", type=int)
+    parser.add_argument("--runs",
+                        help="Times the tests are run on each commit, "
+                        "default 3", type=int, default=3)
+    parser.add_argument("--suite",
+                        help="Test suite of the tests",
+                        choices=sorted(TEST_SUITES), required=True)
+    parser.add_argument("--tests",
+                        help="Comma separated test numbers, or ranges, in "
+                        "the bad commit, i.e. \"12,20-22\"",
+                        type=str, required=True)
+
+    options = parser.parse_args(arguments)
+    options.repo = "./ovs"
+    options.branch = None
+
+    if options.min_failures is None:
+        options.min_failures = options.runs // 2 + 1
+
+    if not 1 <= options.min_failures <= options.runs:
+        print("ERROR: --min-failures should be between one and --runs!")
+        return -1
+
+    try:
+        tests = set()
+        for item in options.tests.split(","):
+            first, _, last = item.partition("-")
+            tests.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        print(f"ERROR: Invalid test numbers \"{options.tests}\"!")
+        return -1
+
+    try:
+        if ci_git("./ovs", "status", "--porcelain", "--untracked-files=no"):
+            print("ERROR: The ovs directory has uncommitted changes!")
+            return -1
+
+        head = ci_git("./ovs", "symbolic-ref", "--quiet", "--short", "HEAD") \
+            if subprocess.run(['git', '-C', './ovs', 'symbolic-ref', '-q',
+                               'HEAD'], check=False,
+                              stdout=subprocess.DEVNULL).returncode == 0 \
+            else ci_git("./ovs", "rev-parse", "HEAD")
+        good, bad = (ci_git("./ovs", "rev-parse", "--verify",
+                            f"{x}^{{commit}}")
+                     for x in (options.good, options.bad))
+        commits = ci_git("./ovs", "rev-list", "--reverse", "--first-parent",
+                         f"{good}..{bad}").split()
+        ci_git("./ovs", "merge-base", "--is-ancestor", good, bad)
+        if len(commits) == 0:
+            raise ValueError("no commits between the good and bad commit")
+    except (ValueError, subprocess.CalledProcessError,
+            FileNotFoundError) as error:
+        print("ERROR: Invalid OVS commits: "
+              f"{getattr(error, 'output', error)}".strip())
+        return -1
+
+    run_options = parse_arguments(run_arguments)
+    console = Console(log_path=False)
+    steps = []
 
-    if len(failures) > 0:
+    def is_bad(result):
+        return max(result[0].values(), default=0) >= options.min_failures
+
+    def test(commit, names):
+        console.log(f"[bold cyan]Bisect step {len(steps) + 1}, testing "
+                    f"{commit[:12]}[/]")
+        result = bisect_commit(console, options, run_options, commit, names)
+        steps.append((commit, result))
+        return result
 
+    try:
         #
-        # Get full test results just in case we want to review them.
+        # Make sure the bad commit fails and the good one passes, before
+        # testing the commits in between.
         #
-        console.log("[bold cyan]Start gathering test directory[/]")
-        if not vagrant_provision(target=options.vagrant_vm_name,
-                                 vm_type=vm_type,
-                                 console=console, quiet=True,
-                                 cpus=options.vagrant_vm_cpus,
-                                 provision_with=["Get test directory"]):
-            console.print("[bold red]ERROR[/]: Failed getting test directory!")
-
-        console.log("[bold green]Finished gathering test directory[/]")
+        result = test(bad, dict.fromkeys(tests))
+        if result is None or not is_bad(result):
+            console.print(f"[bold red]ERROR[/]: The tests do not fail at "
+                          f"least {options.min_failures} out of "
+                          f"{options.runs} times on the bad commit!")
+            return -1
+
+        names = result[1]
+        result = test(good, names)
+        if result is None or is_bad(result):
+            console.print("[bold red]ERROR[/]: The tests do not pass on the "
+                          "good commit!")
+            return -1
 
-        console.log("[bold red]============ TESTS FAILURES ============[/]")
+        #
+        # The first bad commit is after the last good one, and at or before
+        # the first bad one. Commits that can not be tested are skipped.
+        #
+        first_good, first_bad = -1, len(commits) - 1
+        untestable = set()
+
+        while True:
+            middle = (first_good + first_bad) / 2
+            candidates = sorted((x for x in range(first_good + 1, first_bad)
+                                 if x not in untestable),
+                                key=lambda x: abs(x - middle))
+            if len(candidates) == 0:
+                break
+
+            result = test(commits[candidates[0]], names)
+            if result is None:
+                untestable.add(candidates[0])
+            elif is_bad(result):
+                first_bad = candidates[0]
+            else:
+                first_good = candidates[0]
+    finally:
+        subprocess.run(['git', '-C', './ovs', 'checkout', '--quiet',
+                        '--force', head], check=False)
+
+        table = Table(title="Bisect steps")
+        table.add_column("Commit")
+        table.add_column("Title")
+        table.add_column("Failures")
+        table.add_column("Result")
+        for commit, result in steps:
+            table.add_row(
+                commit[:12],
+                ci_git("./ovs", "log", "-1", "--format=%s", commit),
+                "\n".join(f"{name}: {count}" for name, count in
+                          result[0].items() if count > 0) if result else "",
+                "untestable" if result is None else
+                "bad" if is_bad(result) else "good")
+        console.print(table)
+
+    suspects = commits[first_good + 1:first_bad + 1]
+    if len(suspects) > 1:
+        console.log(f"[bold dark_orange3]The first bad commit is one of "
+                    f"{len(suspects)} commits, the others could not be "
+                    "tested:[/]")
+    else:
+        console.log("[bold green]The first bad commit is:[/]")
 
-        for test in sorted(failures):
-            console.log(f"[bold cyan]Test failures for {test}:[/]\n" +
-                        failures[test])
-        return False
+    for commit in suspects:
+        console.print(ci_git("./ovs", "log", "-1", "--format=%H %s", commit),
+                      highlight=False, markup=False)
 
-    console.log("[bold green]============ NO FAILURES ============[/]")
-    return True
+    return 0
 
 
 #
 # parse_arguments()
 #
-def parse_arguments():
-    '''Parse command line arguments and return options'''
+def parse_arguments(arguments=None):
+    '''Parse command line arguments, or the given ones, and return options'''
 
-    test_list = ['afxdp', 'check', 'dpdk', 'kernel', 'offloads', 'ovsdb',
-                 'tso', 'userspace']
+    test_list = sorted(TEST_SUITES)
 
     #
     # Argument parsing
@@ -615,6 +4461,10 @@ def parse_arguments():
     parser.add_argument("-b", "--skip-build",
                         help="Skip the DPDK and OVS build step",
                         action="store_true")
+    parser.add_argument("--changed-since",
+                        help="Only run the tests impacted by the changes in "
+                        "the OVS tree since this commit, i.e. origin/main",
+                        type=str, metavar="COMMIT")
     parser.add_argument("-c", "--clean-vagrant",
                         help="Start with a clean vagrant install",
                         action="store_true")
@@ -624,11 +4474,62 @@ def parse_arguments():
     parser.add_argument("-d", "--dry-run",
                         help="Run on existing log files",
                         action="store_true")
+    parser.add_argument("--fail-fast",
+                        help="Stop a test suite after this many failures, "
+                        "implies --live", type=int, default=0)
+    parser.add_argument("--force-build",
+                        help="Build DPDK and OVS, even if the previous "
+                        "build is up to date", action="store_true")
+    parser.add_argument("--full-test-dir",
+                        help="On failures, get the full test directory from "
+                        "the VM, instead of only the failed tests",
+                        action="store_true")
+    parser.add_argument("-g", "--golden-image",
+                        help="Provision and build a single VM, and clone all "
+                        "test VMs from its disk image", action="store_true")
+    parser.add_argument("--jsonl",
+                        help="Write a JSON Lines record for each test to "
+                        "this file, as soon as it is known", type=str)
+    parser.add_argument("--junit",
+                        help="Write the test results as JUnit XML to this "
+                        "file", type=str)
+    parser.add_argument("-m", "--matrix",
+                        help="Build each of these configurations "
+                        "concurrently in its own build directory of the VM, "
+                        "and run the tests on each, default None",
+                        choices=sorted(MATRIX_CONFIGS), nargs="+")
+    parser.add_argument("--no-auto-jobs",
+                        help="Do not run the tests of a suite in parallel "
+                        "inside the VM, unless requested with "
+                        "--testsuiteflags", dest="auto_jobs",
+                        action="store_false")
+    parser.add_argument("--no-cache",
+                        help="Always run the test suites, instead of "
+                        "replaying the results of an identical previous run",
+                        dest="cache", action="store_false")
+    parser.add_argument("--no-history",
+                        help="Do not store the test results in the test "
+                        "history", dest="history", action="store_false")
+    parser.add_argument("--no-quarantine",
+                        help="Report failures of tests known to be flaky as "
+                        "failures, instead of quarantining them",
+                        dest="quarantine", action="store_false")
+    parser.add_argument("-l", "--live",
+                        help="Report test results while the test suite is "
+                        "running", action="store_true")
+    parser.add_argument("-P", "--parallel",
+                        help="Run the tests on a pool of this many VMs, "
+                        "default 0 (disabled)", type=int, default=0)
+    parser.add_argument("--parallel-setup",
+                        help="Number of pool VMs that can be brought up, "
+                        "provisioned, and built concurrently, default 2",
+                        type=int, default=2)
     parser.add_argument("-p", "--skip-provision",
                         help="Skip the vagrant provision step",
                         action="store_true")
     parser.add_argument("-q", "--quiet",
-                        help="Be quiet, do not display console ouput",
+                        help="Be quiet, do not display console ouput, "
+                        "it is still written to results/<vm>/logs",
                         action="store_true")
     parser.add_argument("-r", "--run",
                         help="List of tests to run, default all",
@@ -639,9 +4540,31 @@ def parse_arguments():
     parser.add_argument("-s", "--skip",
                         help="List of tests to skip",
                         choices=test_list, default="none", nargs="+")
+    parser.add_argument("--sample",
+                        help="Sample the resource usage inside the VM every "
+                        "SAMPLE seconds, default 5, during the builds and "
+                        "test suites, and report it per phase", type=float,
+                        const=5, nargs="?")
     parser.add_argument("--sanitizer",
                         help="Build with specific sanitizer enabled",
                         choices=["ubsan", "asan"], default=[], nargs="+")
+    parser.add_argument("--shards",
+                        help="Split each test suite in this many shards, "
+                        "run on separate VMs, implies --parallel",
+                        type=int, default=1)
+    parser.add_argument("--ssh",
+                        help="Run the build and test scripts over a "
+                        "persistent SSH connection, instead of through "
+                        "vagrant provision", action="store_true")
+    parser.add_argument("--sync",
+                        help="Copy the changed files of the OVS and DPDK "
+                        "trees to the VM's local disk before building, and "
+                        "build from there instead of over sshfs",
+                        action="store_true")
+    parser.add_argument("--trace",
+                        help="Time the phases of the run, print a summary, "
+                        "and write a Chrome trace JSON file, i.e. for "
+                        "https://ui.perfetto.dev", type=str)
     parser.add_argument("--testsuiteflags",
                         help="Initial value for the TESTSUITEFLAGS, "
                         "default=None", type=str, default=None)
@@ -656,7 +4579,13 @@ def parse_arguments():
                         help="Use the Ubuntu VM instead of Fedora",
                         action="store_true")
 
-    options = parser.parse_args()
+    options = parser.parse_args(arguments)
+    options.vm_box = None
+    options.emitter = None
+    options.selected = {}
+    options.compiler = None
+    options.ovs_build = VM_OVS_BUILD
+    options.matrix_config = None
 
     #
     # Update configuration if Ubuntu is used.
@@ -687,24 +4616,459 @@ def parse_arguments():
         print("ERROR: --retry should be zero or larger!")
         sys.exit(-1)
 
+    if options.force_build and options.skip_build:
+        print("ERROR: Can't combine --force-build with --skip-build!")
+        sys.exit(-1)
+
+    if options.golden_image and (options.skip_provision or
+                                 options.skip_build):
+        print("ERROR: Can't combine --golden-image with --skip-provision or "
+              "--skip-build!")
+        sys.exit(-1)
+
+    if options.matrix and (options.sanitizer or options.golden_image or
+                           options.parallel > 0 or options.shards > 1):
+        print("ERROR: Can't combine --matrix with --sanitizer, "
+              "--golden-image, --parallel, or --shards!")
+        sys.exit(-1)
+
+    if options.parallel < 0 or options.parallel_setup < 1 \
+       or options.shards < 1:
+        print("ERROR: --parallel should be zero or larger, and "
+              "--parallel-setup and --shards one or larger!")
+        sys.exit(-1)
+
+    if options.shards > 1 and options.parallel == 0:
+        options.parallel = options.shards
+
+    if options.fail_fast < 0:
+        print("ERROR: --fail-fast should be zero or larger!")
+        sys.exit(-1)
+
+    if options.fail_fast > 0:
+        options.live = True
+
     return options
 
 
 #
-# main()
+# get_build_env()
 #
-def main():
-    '''Program main entry point'''
+def get_build_env(options):
+    '''Return the build environment variables for the selected options'''
 
-    #
-    # Parse and verify arguments
-    #
-    options = parse_arguments()
+    extra_cflags = ""
+    compiler = options.compiler or "gcc"
+
+    if "ubsan" in options.sanitizer:
+        extra_cflags += " -O1 -fno-omit-frame-pointer -fno-common " \
+            "-fsanitize=undefined"
+        compiler = "clang"
+    if "asan" in options.sanitizer:
+        extra_cflags += " -O1 -fno-omit-frame-pointer -fno-common " \
+            "-fsanitize=address"
+        compiler = "clang"
+
+    extra_cflags = extra_cflags.split()
+    extra_cflags = " ".join(sorted(set(extra_cflags),
+                                   key=extra_cflags.index))
+
+    env = {"EXTRA_CFLAGS": extra_cflags, "CC": compiler}
+
+    if options.sync:
+        env |= {"OVS_SRC": f"{VM_SOURCE_DIR}/ovs",
+                "DPDK_SRC": f"{VM_SOURCE_DIR}/dpdk"}
+
+    return env
+
+
+#
+# matrix_options()
+#
+def matrix_options(options, name):
+    '''Return a copy of the options for a configuration of the --matrix'''
+
+    compiler, sanitizer = MATRIX_CONFIGS[name]
+
+    config_options = copy.copy(options)
+    config_options.matrix = None
+    config_options.matrix_config = name
+    config_options.compiler = compiler
+    config_options.sanitizer = list(sanitizer)
+    config_options.ovs_build = f"{VM_OVS_BUILD}-{name}"
+    config_options.run = set(options.run)
+    config_options.selected = dict(options.selected)
+
+    return config_options
+
+
+#
+# matrix_build_status()
+#
+def matrix_build_status(options, name):
+    '''Return the exit code of the last build of a --matrix configuration,
+    or None if it is not known.
+    '''
+    try:
+        with open(f"./results/{options.vagrant_vm_name}/"
+                  f"ovs_build-{name}.status", 'r', encoding="utf8") as in_file:
+            return int(in_file.read())
+    except (FileNotFoundError, PermissionError, ValueError):
+        return None
+
+
+#
+# source_tree_key()
+#
+def source_tree_key(path):
+    '''Return a hash identifying the content of a source tree.
+
+    For git trees this is based on the HEAD commit, any uncommitted changes,
+    and untracked files. Other trees, like an unpacked DPDK release, are
+    identified by their file names, sizes and modification times.
+    '''
+    key = hashlib.sha256()
+
+    try:
+        key.update(subprocess.check_output(['git', '-C', path, 'rev-parse',
+                                            'HEAD'],
+                                           stderr=subprocess.DEVNULL))
+        key.update(subprocess.check_output(['git', '-C', path, 'diff',
+                                            'HEAD', '--binary'],
+                                           stderr=subprocess.DEVNULL))
+        untracked = subprocess.check_output(['git', '-C', path, 'ls-files',
+                                             '--others', '--exclude-standard',
+                                             '-z'], stderr=subprocess.DEVNULL)
+        for name in sorted(untracked.split(b'\0')):
+            if not name:
+                continue
+
+            key.update(name)
+            try:
+                with open(os.path.join(path, name.decode()), 'rb') as in_file:
+                    key.update(in_file.read())
+            except (FileNotFoundError, IsADirectoryError, PermissionError):
+                pass
+
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file = os.path.join(root, name)
+                try:
+                    stat = os.stat(file)
+                except FileNotFoundError:
+                    continue
+
+                key.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns}"
+                           .encode())
+
+    return key.hexdigest()
+
+
+#
+# build_cache_keys()
+#
+def build_cache_keys(options):
+    '''Return the keys identifying the DPDK and the OVS build.
+
+    The DPDK key covers the DPDK tree and distribution. The OVS key covers
+    the OVS tree, the build environment, and the DPDK key, as DPDK is linked
+    statically. With --matrix, there is an "ovs-<name>" key for the build of
+    each configuration instead, all sharing the DPDK build.
+    '''
+    if options.matrix:
+        keys = {}
+        for name in options.matrix:
+            config_keys = build_cache_keys(matrix_options(options, name))
+            keys["dpdk"] = config_keys["dpdk"]
+            keys[f"ovs-{name}"] = config_keys["ovs"]
+
+        return keys
+
+    distro = "ubuntu" if options.ubuntu else "fedora"
+
+    dpdk_key = hashlib.sha256()
+    dpdk_key.update(source_tree_key("./dpdk").encode())
+    dpdk_key.update(distro.encode())
+
+    ovs_key = hashlib.sha256()
+    ovs_key.update(source_tree_key("./ovs").encode())
+    ovs_key.update(dpdk_key.hexdigest().encode())
+    ovs_key.update(repr(sorted(get_build_env(options).items())).encode())
+    ovs_key.update(repr(sorted(options.sanitizer)).encode())
+    ovs_key.update(distro.encode())
+
+    return {"dpdk": dpdk_key.hexdigest(), "ovs": ovs_key.hexdigest()}
+
+
+#
+# load_build_cache()
+#
+def load_build_cache(target):
+    '''Return the build keys of the last successful build on the VM'''
+
+    try:
+        with open(f"./results/{target}/build_cache.json", 'r',
+                  encoding="utf8") as in_file:
+            return json.load(in_file)
+    except (FileNotFoundError, PermissionError, json.JSONDecodeError):
+        return {}
+
+
+#
+# vm_build_key()
+#
+def vm_build_key(options):
+    '''Return the key of the OVS build the options' tests run on, as stored
+    by prepare_vm(), or None if it is not known.
+    '''
+    build = "ovs" if options.matrix_config is None \
+        else f"ovs-{options.matrix_config}"
+
+    return load_build_cache(options.vagrant_vm_name).get(build)
+
+
+#
+# save_build_cache()
+#
+def save_build_cache(target, build_keys):
+    '''Store the build keys of the last successful build on the VM'''
+
+    os.makedirs(f"./results/{target}/", exist_ok=True)
+    with open(f"./results/{target}/build_cache.json", 'w',
+              encoding="utf8") as out_file:
+        json.dump(build_keys, out_file)
+
+
+#
+# golden_image_key()
+#
+def golden_image_key(options):
+    '''Return a hash of everything that ends up in the golden image'''
+
+    key = hashlib.sha256()
+    key.update(build_cache_keys(options)["ovs"].encode())
+
+    for file in ["Vagrantfile"] + sorted(glob.glob(f"{VM_SCRIPTS_DIR}/*")):
+        with open(file, 'rb') as in_file:
+            key.update(in_file.read())
+
+    return key.hexdigest()
+
+
+#
+# prepare_golden_image()
+#
+def prepare_golden_image(console, options):
+    '''Provision and build a VM once, and save it as a golden image box.
+
+    The box name contains a key of the OVS and DPDK trees, and the build
+    configuration. If a box with the current key exists it is re-used,
+    else a new one is created, and outdated golden boxes are removed.
+    Returns the box name, or None on failure.
+    '''
+    vm_type = "ubuntu" if options.ubuntu else None
+    prefix = f"ovs-dp-test-golden-{vm_type or 'fedora'}-"
+    box = prefix + golden_image_key(options)[:16]
+
+    installed_boxes = vagrant_box_list()
+    if box in installed_boxes:
+        console.log(f"[bold green]Using existing golden image {box}[/]")
+        return box
+
+    golden_options = copy.copy(options)
+    golden_options.vagrant_vm_name = f"{options.vagrant_vm_name}-golden"
+    golden_options.clean_vagrant = True
+    golden_options.skip_provision = False
+    golden_options.skip_build = False
+    golden_options.vm_box = None
+
+    console.log(f"[bold cyan]Start creating golden image {box}[/]")
+    with TRACER.phase("Prepare VM", "vm",
+                      vm=golden_options.vagrant_vm_name):
+        if not prepare_vm(console, golden_options):
+            return None
+
+    if not vagrant_halt(target=golden_options.vagrant_vm_name,
+                        vm_type=vm_type) \
+       or not vagrant_package(target=golden_options.vagrant_vm_name,
+                              vm_type=vm_type, box=box):
+        console.print("[bold red]ERROR[/]: Failed creating golden image!")
+        return None
+
+    vagrant_destroy(target=golden_options.vagrant_vm_name, vm_type=vm_type)
+
+    for old_box in installed_boxes:
+        if old_box.startswith(prefix):
+            vagrant_box_remove(old_box)
+
+    console.log(f"[bold green]Finished creating golden image {box}[/]")
+    return box
+
+
+#
+# use_golden_image()
+#
+def use_golden_image(console, options):
+    '''Update options, so the VMs are cloned from the golden image'''
+
+    box = prepare_golden_image(console, options)
+    if box is None:
+        return False
 
     #
-    # Use rich from here on for console output
+    # VMs are re-created as thin clones of the golden image, which already
+    # contains the provisioned OS and the DPDK and OVS builds.
     #
-    console = Console(log_path=False)
+    options.vm_box = box
+    options.clean_vagrant = True
+    options.skip_provision = True
+    options.skip_build = True
+    return True
+
+
+#
+# tree_manifest()
+#
+def tree_manifest(path, previous=None):
+    '''Return the manifest of a source tree, without its .git directory.
+
+    The manifest maps the path of each file to its size, modification time,
+    mode, and SHA-1, or symbolic link target. Files with the same size and
+    modification time as in the previous manifest keep their hash, so only
+    the changed files are read.
+    '''
+    previous = previous or {}
+    manifest = {}
+
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(x for x in dirs if x != ".git")
+        links = [x for x in dirs if os.path.islink(os.path.join(root, x))]
+
+        for name in sorted(files + links):
+            file = os.path.join(root, name)
+            name = os.path.relpath(file, path)
+            try:
+                stat = os.lstat(file)
+                if os.path.islink(file):
+                    digest = "link:" + os.readlink(file)
+                elif name in previous and \
+                        previous[name][:2] == [stat.st_size,
+                                               stat.st_mtime_ns]:
+                    digest = previous[name][3]
+                else:
+                    digest = hashlib.sha1()
+                    with open(file, 'rb') as in_file:
+                        while chunk := in_file.read(1 << 20):
+                            digest.update(chunk)
+                    digest = digest.hexdigest()
+            except (FileNotFoundError, PermissionError):
+                continue
+
+            manifest[name] = [stat.st_size, stat.st_mtime_ns,
+                              stat.st_mode & 0o7777, digest]
+
+    return manifest
+
+
+#
+# sync_source_tree()
+#
+def sync_source_tree(console, options, tree):
+    '''Copy a source tree, i.e. "ovs", to the VM's local disk.
+
+    The copy in VM_SOURCE_DIR has a manifest of the files it was last synced
+    with. Only files whose content or mode changed since are sent, in a tar
+    stream over SSH, and files removed from the tree are removed from the
+    copy. Files that only got a new modification time are left alone, so make
+    does not rebuild them. Returns False on failure.
+    '''
+    target = options.vagrant_vm_name
+    vm_type = "ubuntu" if options.ubuntu else None
+    copy = f"{VM_SOURCE_DIR}/{tree}"
+
+    with TRACER.phase(f"Sync {tree}", "sync", vm=target):
+        arguments, env = vm_command(target=target, vm_type=vm_type,
+                                    box=options.vm_box,
+                                    command=f"sudo cat {copy}/{SYNC_MANIFEST}"
+                                    " 2>/dev/null || true", ssh=options.ssh)
+        try:
+            previous = json.loads(subprocess.check_output(
+                arguments, env=env, stdin=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL) or "{}")
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return False
+        except json.JSONDecodeError:
+            previous = {}
+
+        manifest = tree_manifest(f"./{tree}", previous)
+        changed = [name for name, entry in manifest.items()
+                   if previous.get(name, [None] * 4)[2:] != entry[2:]]
+        deleted = [name for name in previous if name not in manifest]
+        size = sum(manifest[name][0] for name in changed)
+
+        console.log(f"[bold cyan]Copying {len(changed)} changed files "
+                    f"({size / 1000000:.1f} MB) of {tree} to "
+                    f"{target}:{copy}, removing {len(deleted)}[/]")
+
+        #
+        # The manifest goes last, so after a failure the files that did not
+        # make it are sent again.
+        #
+        command = f"sudo mkdir -p {copy} && sudo tar -C {copy} -xf - && " \
+            f"cd {copy} && sudo xargs -0 -r -a .sync_deleted rm -f -- && " \
+            "sudo rm -f .sync_deleted"
+        arguments, env = vm_command(target=target, vm_type=vm_type,
+                                    box=options.vm_box, command=command,
+                                    ssh=options.ssh)
+
+        def root_owned(info):
+            info.uid = info.gid = 0
+            info.uname = info.gname = "root"
+            return info
+
+        def add_data(tar, name, data):
+            info = root_owned(tarfile.TarInfo(name))
+            info.size = len(data)
+            info.mtime = time.time()
+            tar.addfile(info, io.BytesIO(data))
+
+        start = time.monotonic()
+        try:
+            with subprocess.Popen(arguments, env=env, stdin=subprocess.PIPE,
+                                  stdout=subprocess.DEVNULL,
+                                  bufsize=0) as process:
+                try:
+                    with tarfile.open(fileobj=process.stdin,
+                                      mode='w|') as tar:
+                        for name in changed:
+                            tar.add(os.path.join(tree, name), arcname=name,
+                                    recursive=False, filter=root_owned)
+                        add_data(tar, ".sync_deleted",
+                                 "".join(f"{x}\0" for x in deleted)
+                                 .encode())
+                        add_data(tar, SYNC_MANIFEST,
+                                 json.dumps(manifest).encode())
+                except OSError:
+                    process.kill()
+                process.stdin.close()
+        except FileNotFoundError:
+            return False
+
+        if process.returncode != 0:
+            return False
+
+    console.log(f"[bold green]Copied {tree} to {target} in "
+                f"{time.monotonic() - start:.1f}s[/]")
+    return True
+
+
+#
+# prepare_vm()
+#
+def prepare_vm(console, options):
+    '''Bring up, provision, and build the VM as requested by the options'''
 
     #
     # Create result directory
@@ -717,42 +5081,58 @@ def main():
     # Prepare the vagrant VM
     #
     vm_type = "ubuntu" if options.ubuntu else None
-    state = vagrant_state(target=options.vagrant_vm_name, vm_type=vm_type)
+    state = vagrant_state(target=options.vagrant_vm_name, vm_type=vm_type,
+                          box=options.vm_box)
 
     if options.clean_vagrant:
         if state != 'not_created':
-            console.log("[bold cyan]Deleting existing VM[/]")
+            console.log("[bold cyan]Deleting existing VM "
+                        f"{options.vagrant_vm_name}[/]")
             if not vagrant_destroy(target=options.vagrant_vm_name,
-                                   vm_type=vm_type):
+                                   vm_type=vm_type, box=options.vm_box):
                 console.print("[bold red]ERROR[/]: Failed destroying VM!")
-                sys.exit(-1)
+                return False
 
-            console.log("[bold green]Deleted existing VM[/]")
+            console.log("[bold green]Deleted existing VM "
+                        f"{options.vagrant_vm_name}[/]")
             state = 'not_created'
 
+    #
+    # A new VM does not have any of our previous builds.
+    #
+    if state == 'not_created':
+        save_build_cache(options.vagrant_vm_name, {})
+
     if state != 'running':
-        console.log("[bold cyan]Bringing up clean VM[/]")
+        console.log("[bold cyan]Bringing up clean VM "
+                    f"{options.vagrant_vm_name}[/]")
         vagrant_up(target=options.vagrant_vm_name, vm_type=vm_type,
-                   console=console, quiet=options.quiet,
+                   box=options.vm_box,
+                   console=vm_console(console, options), quiet=options.quiet,
                    cpus=options.vagrant_vm_cpus)
-        console.log("[bold green]Clean VM up and running[/]")
+        console.log("[bold green]Clean VM up and running "
+                    f"{options.vagrant_vm_name}[/]")
         state = 'running'
 
     #
     # Do we need to provision the VM?
     #
     if not options.skip_provision:
-        console.log("[bold cyan]Start provisioning the VM[/]")
+        console.log("[bold cyan]Start provisioning the VM "
+                    f"{options.vagrant_vm_name}[/]")
         if not vagrant_provision(target=options.vagrant_vm_name,
-                                 vm_type=vm_type,
-                                 console=console, quiet=options.quiet,
+                                 vm_type=vm_type, box=options.vm_box,
+                                 console=vm_console(console, options),
+                                 quiet=options.quiet,
                                  cpus=options.vagrant_vm_cpus,
                                  provision_with=["Linux Provisioning",
                                                  "Reboot new kernel"]):
-            console.print("[bold red]ERROR[/]: Failed provisioning!")
-            sys.exit(-1)
+            console.print("[bold red]ERROR[/]: Failed provisioning!" +
+                          failed_output(options.vagrant_vm_name))
+            return False
 
-        console.log("[bold green]Finished provisioning the VM[/]")
+        console.log("[bold green]Finished provisioning the VM "
+                    f"{options.vagrant_vm_name}[/]")
     else:
         console.log("[bold dark_orange3]Skipped provisioning[/]")
 
@@ -760,46 +5140,295 @@ def main():
     # Do we need to build DPDK and OVS?
     #
     if not options.skip_build:
-        extra_cflags = ""
-        compiler = "gcc"
-
-        if "ubsan" in options.sanitizer:
-            extra_cflags += " -O1 -fno-omit-frame-pointer -fno-common " \
-                "-fsanitize=undefined"
-            compiler = "clang"
-        if "asan" in options.sanitizer:
-            extra_cflags += " -O1 -fno-omit-frame-pointer -fno-common " \
-                "-fsanitize=address"
-            compiler = "clang"
-
-        extra_cflags = extra_cflags.split()
-        extra_cflags = " ".join(sorted(set(extra_cflags),
-                                       key=extra_cflags.index))
-
-        console.log("[bold cyan]Start building OVS-DPDK[/]")
-        if not vagrant_provision(target=options.vagrant_vm_name,
-                                 vm_type=vm_type,
-                                 console=console, quiet=options.quiet,
-                                 cpus=options.vagrant_vm_cpus,
-                                 provision_with=["Build dpdk",
-                                                 "Build Open vSwitch"],
-                                 env={"EXTRA_CFLAGS": extra_cflags,
-                                      "CC": compiler}):
-
-            console.print("[bold red]ERROR[/]: Failed building OVS-DPDK!")
-            sys.exit(-1)
+        build_keys = build_cache_keys(options)
+        build_cache = load_build_cache(options.vagrant_vm_name)
+        outdated = [build for build in build_keys
+                    if options.force_build
+                    or build_cache.get(build) != build_keys[build]]
+        provision_with = []
+        env = get_build_env(options)
+
+        if "dpdk" in outdated:
+            provision_with.append("Build dpdk")
+        if any(build.startswith("ovs") for build in outdated):
+            provision_with.append("Build Open vSwitch")
 
-        console.log("[bold green]Finished building OVS-DPDK[/]")
+        #
+        # With --matrix, only the outdated configurations are built, each
+        # reporting its own status, as one can fail while the others build.
+        #
+        matrix = [name for name in options.matrix or []
+                  if "dpdk" in outdated or f"ovs-{name}" in outdated]
+        configs = []
+        for name in matrix:
+            config_env = get_build_env(matrix_options(options, name))
+            configs.append(f"{name}|{config_env['CC']}|"
+                           f"{config_env['EXTRA_CFLAGS']}")
+            cleanup_result_file(f"ovs_build-{name}.status",
+                                target=options.vagrant_vm_name)
+        if configs:
+            env["MATRIX"] = ";".join(configs)
+
+        if len(provision_with) == 0:
+            console.log("[bold green]OVS-DPDK build on "
+                        f"{options.vagrant_vm_name} is up to date[/]")
+        else:
+            console.log(f"[bold cyan]Start {', '.join(provision_with)} on "
+                        f"{options.vagrant_vm_name}[/]")
+
+            #
+            # Forget the builds that get replaced, the others stay valid.
+            #
+            build_cache = {build: key for build, key in build_cache.items()
+                           if build not in outdated}
+            save_build_cache(options.vagrant_vm_name, build_cache)
+            for tree, provisioner in (("dpdk", "Build dpdk"),
+                                      ("ovs", "Build Open vSwitch")):
+                if options.sync and provisioner in provision_with and \
+                   not sync_source_tree(console, options, tree):
+                    console.print("[bold red]ERROR[/]: Failed copying the "
+                                  f"{tree} tree to the VM!")
+                    return False
+
+            if not run_provisioners(console, options, provision_with,
+                                    env=env):
+
+                console.print("[bold red]ERROR[/]: Failed building "
+                              "OVS-DPDK!" +
+                              failed_output(options.vagrant_vm_name))
+                return False
+
+            failed = [name for name in matrix
+                      if matrix_build_status(options, name) != 0]
+            save_build_cache(options.vagrant_vm_name, build_cache | {
+                build: key for build, key in build_keys.items()
+                if build.removeprefix("ovs-") not in failed})
+
+            if failed:
+                console.print("[bold red]ERROR[/]: Failed building OVS for "
+                              f"{', '.join(failed)}, see their prefixed "
+                              "lines in the build log!")
+            else:
+                console.log("[bold green]Finished building OVS-DPDK on "
+                            f"{options.vagrant_vm_name}[/]")
     else:
         console.log("[bold dark_orange3]Skipped building OVS-DPDK[/]")
 
+    return True
+
+
+#
+# keep_matrix_results()
+#
+def keep_matrix_results(options, name):
+    '''Move the test suite logs and the test directory archive of a --matrix
+    configuration to the results/<vm>/matrix/<name> directory.
+    '''
+    results_dir = f"./results/{options.vagrant_vm_name}"
+    config_dir = f"{results_dir}/matrix/{name}"
+    os.makedirs(config_dir, exist_ok=True)
+
+    for file in [x.log for x in TEST_SUITES.values()] + \
+            ["test_results.zip", "test_results.json",
+             "failed_test_results.tar.zst", "full_test_results.tgz"]:
+        try:
+            os.replace(f"{results_dir}/{file}", f"{config_dir}/{file}")
+        except FileNotFoundError:
+            pass
+
+
+#
+# run_matrix()
+#
+def run_matrix(console, options):
+    '''Build all --matrix configurations concurrently in a single VM, and
+    run the tests on each of them, one configuration at a time.
+
+    Returns True if all tests passed, False if any failed, or a configuration
+    failed to build, and None if the VM could not be prepared.
+    '''
+    target = options.vagrant_vm_name
+
+    with TRACER.phase("Prepare VM", "vm", vm=target):
+        prepared = prepare_vm(console, options)
+
+    if not prepared:
+        return None
+
+    build_keys = {} if options.skip_build else build_cache_keys(options)
+    build_cache = load_build_cache(target)
+    table = Table("Configuration", "Compiler", "Sanitizers", "Build",
+                  "Suites", "Failed", "Quarantined", "Time (s)",
+                  title=f"Build matrix on {target}")
+    failures = {}
+    quarantined = {}
+
+    for name in options.matrix:
+        config_options = matrix_options(options, name)
+        started = time.time()
+        row = [name, config_options.compiler,
+               ", ".join(config_options.sanitizer) or "none"]
+
+        shutil.rmtree(f"./results/{target}/matrix/{name}",
+                      ignore_errors=True)
+
+        if not options.skip_build and \
+                build_cache.get(f"ovs-{name}") != build_keys[f"ovs-{name}"]:
+            failures[f"{name}/build"] = "[bold red]  - Failed building " \
+                f"OVS in {config_options.ovs_build}![/]"
+            table.add_row(*row, "[bold red]FAILED[/]", "-", "-", "-", "-")
+            continue
+
+        console.log(f"[bold cyan]Starting tests of configuration {name}[/]")
+
+        with TRACER.phase(f"{name} configuration", "matrix", vm=target):
+            config_failures, config_quarantined = run_suites(
+                console, config_options)
+
+        keep_matrix_results(options, name)
+        failures |= {f"{name}/{test}": report
+                     for test, report in config_failures.items()}
+        quarantined |= {f"{name}/{test}": report
+                        for test, report in config_quarantined.items()}
+
+        failed = len(config_failures)
+        table.add_row(*row, "[bold green]ok[/]",
+                      str(len(config_options.run)),
+                      f"[bold red]{failed}[/]" if failed else "0",
+                      str(len(config_quarantined)),
+                      f"{time.time() - started:.0f}")
+
+        console.log(f"[bold {'red' if failed else 'green'}]Finished tests "
+                    f"of configuration {name}[/]")
+
+    console.print(table)
+    return report_failures(console, failures, quarantined)
+
+
+#
+# run_pipeline()
+#
+def run_pipeline(console, options):
+    '''Select the tests, prepare the VMs, and run the tests as requested by
+    the options.
+
+    Returns True if all tests passed, False if any failed, and None if the
+    tests could not be run.
+    '''
+
+    #
+    # Only run the tests impacted by the changes if requested.
+    #
+    if options.changed_since:
+        if not select_changed_tests(console, options):
+            return None
+
+        if len(options.run) == 0:
+            console.log("[bold green]No tests impacted by the changes[/]")
+            return True
+
+    #
+    # Create, or re-use, the golden image for the test VMs.
+    #
+    if options.golden_image:
+        with TRACER.phase("Golden image", "vm"):
+            if not use_golden_image(console, options):
+                return None
+
+    #
+    # Build and test each configuration of the matrix if requested.
+    #
+    if options.matrix:
+        return run_matrix(console, options)
+
+    #
+    # Run all tests on a pool of VMs if requested.
+    #
+    if options.parallel > 0:
+        return run_parallel(console, options)
+
+    #
+    # Prepare the vagrant VM
+    #
+    with TRACER.phase("Prepare VM", "vm", vm=options.vagrant_vm_name):
+        prepared = prepare_vm(console, options)
+
+    if not prepared:
+        return None
+
     #
     # Run tests
     #
-    if not run_tests(console, options):
+    return run_tests(console, options)
+
+
+#
+# main()
+#
+def main():
+    '''Program main entry point'''
+
+    #
+    # Run a command if requested, i.e. "history".
+    #
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+
+    #
+    # Parse and verify arguments
+    #
+    options = parse_arguments()
+
+    #
+    # Use rich from here on for console output
+    #
+    console = Console(log_path=False)
+
+    #
+    # Time the phases of the run if requested.
+    #
+    if options.trace:
+        TRACER.enabled = True
+        threading.current_thread().name = "main"
+
+    #
+    # Write machine readable test results if requested.
+    #
+    if options.junit or options.jsonl:
+        options.emitter = ResultEmitter(junit=options.junit,
+                                        jsonl=options.jsonl)
+
+    try:
+        success = run_pipeline(console, options)
+    finally:
+        if options.emitter is not None:
+            options.emitter.close()
+
+        if options.trace:
+            TRACER.write_trace(options.trace)
+            console.print(TRACER.summary())
+
+        if options.sample:
+            report_resources(console)
+
+    if success is None:
+        sys.exit(-1)
+
+    if not success:
         sys.exit(os.EX_SOFTWARE)
 
 
+#
+# Commands, used as the first argument, with their own options.
+#
+COMMANDS = {
+    "bisect": bisect_command,
+    "daemon": daemon_command,
+    "history": history_command,
+    "show": show_command,
+}
+
+
 #
 # Start main() as the default entry point...
 #
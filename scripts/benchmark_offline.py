@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+#
+# Offline benchmarks for ovs_unittests.py, no VM or network is needed.
+#
+# The benchmarks run on synthetic test suite logs, from hundreds to hundreds
+# of thousands of tests, in a temporary directory:
+#
+#   parse      process_results() on a log without a skip list.
+#   skiplist   process_results() with a cold skip list of 10% of the tests.
+#   report     Building the failure report of a suite, and printing it.
+#   run_tests  The full run_tests() orchestration on the fake vagrant from
+#              tests/fake_vagrant, including a retry round.
+#   output     Showing the output of a VM command, with a line of output per
+#              test, on the console and in its log file.
+#
+# For example:
+#
+#   ./scripts/benchmark_offline.py --scales 1000,100000 --benchmarks parse
+#
+
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from rich.console import Console
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "tests"))
+
+import ovs_unittests  # noqa: E402
+import synthetic  # noqa: E402
+
+TARGET = "benchmark"
+BENCHMARKS = ["parse", "skiplist", "report", "run_tests", "output"]
+
+
+#
+# make_options()
+#
+def make_options(*arguments):
+    '''Return the ovs_unittests.py options for the given arguments'''
+
+    argv = sys.argv
+    sys.argv = ["ovs_unittests.py", "--vagrant-vm-name", TARGET,
+                "--run", "check", "--no-history"] + list(arguments)
+    try:
+        return ovs_unittests.parse_arguments()
+    finally:
+        sys.argv = argv
+
+
+#
+# prepare_log()
+#
+def prepare_log(tests):
+    '''Write a testsuite.log, and a skip list, for the given scale'''
+
+    failed, skipped = synthetic.random_outcomes(tests)
+    os.makedirs(f"results/{TARGET}", exist_ok=True)
+
+    with open(f"results/{TARGET}/testsuite.log", 'w',
+              encoding="utf8") as out_file:
+        synthetic.write_log(out_file, range(1, tests + 1), failed=failed,
+                            skipped=skipped)
+
+    with open(ovs_unittests.TEST_SUITES["check"].skip_list, 'w',
+              encoding="utf8") as out_file:
+        synthetic.write_skip_list(out_file, range(1, tests + 1, 10))
+
+    return failed
+
+
+#
+# bench_parse()
+#
+def bench_parse(tests):
+    '''Time process_results() without a skip list'''
+
+    prepare_log(tests)
+    start = time.perf_counter()
+    ovs_unittests.process_results("testsuite.log", target=TARGET)
+    return time.perf_counter() - start
+
+
+#
+# bench_skiplist()
+#
+def bench_skiplist(tests):
+    '''Time process_results() with a skip list that is not cached yet'''
+
+    prepare_log(tests)
+    ovs_unittests.SKIP_LIST_CACHE.clear()
+    start = time.perf_counter()
+    ovs_unittests.process_results(
+        "testsuite.log", target=TARGET,
+        skiplist=ovs_unittests.TEST_SUITES["check"].skip_list)
+    return time.perf_counter() - start
+
+
+#
+# bench_report()
+#
+def bench_report(tests):
+    '''Time building and printing the failure report of an existing log'''
+
+    prepare_log(tests)
+    options = make_options("--dry-run", "--retry", "0")
+    console = Console(file=io.StringIO(), width=200, log_path=False)
+    suite = ovs_unittests.TEST_SUITES["check"]
+
+    start = time.perf_counter()
+    failures, quarantined = ovs_unittests.run_single_test(
+        console, options, [suite.provisioner], suite.skip_list, suite.log,
+        test="check")
+    ovs_unittests.report_failures(console, {"check": failures},
+                                  {"check": quarantined})
+    return time.perf_counter() - start
+
+
+#
+# bench_run_tests()
+#
+def bench_run_tests(tests):
+    '''Time run_tests() on the fake vagrant, with 1% flaky tests'''
+
+    failed, _ = synthetic.random_outcomes(tests)
+    shutil.rmtree("fake_vagrant", ignore_errors=True)
+    os.environ |= {"FAKE_VAGRANT_DIR": os.path.abspath("fake_vagrant"),
+                   "FAKE_VAGRANT_TESTS": str(tests),
+                   "FAKE_VAGRANT_FLAKY": ",".join(str(x) for x in failed)}
+    options = make_options("--retry", "1", "--skip-provision",
+                           "--skip-build", "--no-cache")
+    console = Console(file=io.StringIO(), width=200, log_path=False)
+
+    with open(ovs_unittests.TEST_SUITES["check"].skip_list, 'w',
+              encoding="utf8") as out_file:
+        out_file.write("# Empty skip list\n")
+
+    ovs_unittests.prepare_vm(console, options)
+    start = time.perf_counter()
+    ovs_unittests.run_tests(console, options)
+    return time.perf_counter() - start
+
+
+#
+# bench_output()
+#
+def bench_output(tests):
+    '''Time showing a line of command output per test on the console'''
+
+    console = Console(file=io.StringIO(), width=200, log_path=False)
+    start = time.perf_counter()
+
+    with subprocess.Popen([sys.executable, "-c",
+                           f"for i in range({tests}):\n"
+                           "    print(f'  CC lib/file-{i}.lo')"],
+                          stdout=subprocess.PIPE, encoding='utf8') as process:
+        pump = ovs_unittests.OutputPump(process, TARGET, "output")
+        pump.show(console, "Running")
+        process.wait()
+
+    return time.perf_counter() - start
+
+
+#
+# main()
+#
+def main():
+    '''Program main entry point'''
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmarks", help="Benchmarks to run, default all",
+                        choices=BENCHMARKS, default=BENCHMARKS, nargs="+")
+    parser.add_argument("--repeat", help="Runs of each benchmark, the best "
+                        "one is reported, default 3", type=int, default=3)
+    parser.add_argument("--scales", help="Comma separated numbers of tests, "
+                        "default 100,1000,10000,100000",
+                        default="100,1000,10000,100000")
+    options = parser.parse_args()
+
+    scales = [int(x) for x in options.scales.split(",")]
+    os.environ["PATH"] = os.path.join(ROOT_DIR, "tests", "fake_vagrant") + \
+        os.pathsep + os.environ["PATH"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.makedirs("skip_lists")
+
+        for benchmark in options.benchmarks:
+            function = globals()[f"bench_{benchmark}"]
+            for tests in scales:
+                duration = min(function(tests)
+                               for _ in range(options.repeat))
+                print(f"{benchmark:<10} {tests:>8} tests {duration:9.3f}s "
+                      f"{tests / duration:12.0f} tests/s")
+
+
+if __name__ == '__main__':
+    main()
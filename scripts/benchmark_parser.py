@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#
+# Simple benchmark for the ovs_unittests.py autotest log parser.
+#
+# It generates a synthetic testsuite log of the requested size, and times
+# process_results() on it while reporting the peak resident memory. For
+# example, to benchmark on a 500MB log:
+#
+#   ./scripts/benchmark_parser.py --size 500
+#
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+
+import ovs_unittests  # noqa: E402
+import synthetic  # noqa: E402
+
+
+#
+# main()
+#
+def main():
+    '''Program main entry point'''
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", help="Log size in MB, default 200",
+                        type=int, default=200)
+    parser.add_argument("--tests", help="Number of tests, default 5000",
+                        type=int, default=5000)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        target = os.path.basename(tmp_dir)
+        os.makedirs(f"./results/{target}", exist_ok=True)
+        log_file = f"./results/{target}/testsuite.log"
+
+        try:
+            with open(log_file, 'w', encoding="utf8") as out_file:
+                failed, skipped = synthetic.random_outcomes(options.tests)
+                tests = synthetic.write_log(
+                    out_file, range(1, options.tests + 1), failed=failed,
+                    skipped=skipped, size_mb=options.size)
+
+            start = time.perf_counter()
+            errors, skipped, _, _ = ovs_unittests.process_results(
+                "testsuite.log", target=target)
+            duration = time.perf_counter() - start
+        finally:
+            os.remove(log_file)
+            os.rmdir(f"./results/{target}")
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    print(f"Parsed {options.size}MB log with {tests} tests "
+          f"({len(errors)} failed, {len(skipped)} skipped) in "
+          f"{duration:.2f}s, {options.size / duration:.1f}MB/s, "
+          f"peak RSS {max_rss}MB")
+
+
+if __name__ == '__main__':
+    main()
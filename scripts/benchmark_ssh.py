@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# Simple benchmark for the ovs_unittests.py --ssh option.
+#
+# It runs a trivial command a number of times in an already running VM, once
+# through "vagrant ssh", and once over the persistent SSH connection, and
+# reports the average time per command. For example:
+#
+#   ./scripts/benchmark_ssh.py --vagrant-vm-name fedora --count 20
+#
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import ovs_unittests  # noqa: E402
+
+
+#
+# time_commands()
+#
+def time_commands(options, ssh):
+    '''Return the average time to run "true" in the VM'''
+
+    vm_type = "ubuntu" if options.ubuntu else None
+    start = time.perf_counter()
+
+    for _ in range(options.count):
+        arguments, env = ovs_unittests.vm_command(
+            target=options.vagrant_vm_name, vm_type=vm_type, command="true",
+            ssh=ssh)
+        subprocess.run(arguments, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return (time.perf_counter() - start) / options.count
+
+
+#
+# main()
+#
+def main():
+    '''Program main entry point'''
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", help="Number of commands, default 10",
+                        type=int, default=10)
+    parser.add_argument("--vagrant-vm-name",
+                        help="Name of the running VM, default fedora",
+                        default=ovs_unittests.DEFAULT_VAGRANT_TARGET)
+    parser.add_argument("-u", "--ubuntu", help="The VM runs Ubuntu",
+                        action="store_true")
+    options = parser.parse_args()
+
+    if ovs_unittests.vagrant_state(options.vagrant_vm_name) != "running":
+        print(f"ERROR: VM \"{options.vagrant_vm_name}\" is not running!")
+        sys.exit(-1)
+
+    vagrant_time = time_commands(options, ssh=False)
+    ssh_time = time_commands(options, ssh=True)
+
+    print(f"Ran {options.count} commands, vagrant ssh {vagrant_time:.2f}s, "
+          f"persistent ssh {ssh_time:.3f}s per command "
+          f"({vagrant_time / ssh_time:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
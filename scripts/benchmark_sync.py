@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Benchmark for the ovs_unittests.py --sync option.
+#
+# It builds DPDK and OVS from scratch in an already running and provisioned
+# VM, once from the sshfs mounts, and once from a local copy of the trees,
+# and reports the time of each build. ccache is disabled, so the compiler
+# reads all sources, and as DPDK is built first, OVS is configured again.
+# The builds run over SSH, and the VM is left with the build of the last
+# mode. For example:
+#
+#   ./scripts/benchmark_sync.py --vagrant-vm-name fedora
+#
+
+import argparse
+import os
+import sys
+import time
+
+from rich.console import Console
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import ovs_unittests  # noqa: E402
+
+BUILDS = {"dpdk": "Build dpdk", "ovs": "Build Open vSwitch"}
+
+
+#
+# time_builds()
+#
+def time_builds(console, options):
+    '''Return the time of each build, or None if a build failed'''
+
+    times = {}
+    env = ovs_unittests.get_build_env(options) | {"CCACHE_DISABLE": "1"}
+
+    for tree, provisioner in BUILDS.items():
+        if options.sync:
+            start = time.perf_counter()
+            if not ovs_unittests.sync_source_tree(console, options, tree):
+                return None
+            times[f"sync {tree}"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if not ovs_unittests.ssh_provision(
+                target=options.vagrant_vm_name,
+                vm_type="ubuntu" if options.ubuntu else None,
+                provision_with=[provisioner], env=env):
+            return None
+        times[f"build {tree}"] = time.perf_counter() - start
+
+    return times
+
+
+#
+# main()
+#
+def main():
+    '''Program main entry point'''
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vagrant-vm-name",
+                        help="Name of the running VM, default fedora",
+                        default=ovs_unittests.DEFAULT_VAGRANT_TARGET)
+    parser.add_argument("-u", "--ubuntu", help="The VM runs Ubuntu",
+                        action="store_true")
+    options = parser.parse_args()
+    options.sanitizer = []
+    options.vm_box = None
+    options.ssh = True
+
+    if ovs_unittests.vagrant_state(options.vagrant_vm_name) != "running":
+        print(f"ERROR: VM \"{options.vagrant_vm_name}\" is not running!")
+        sys.exit(-1)
+
+    console = Console()
+    results = {}
+    for mode, sync in (("sshfs", False), ("local", True)):
+        options.sync = sync
+        results[mode] = time_builds(console, options)
+        if results[mode] is None:
+            print(f"ERROR: Failed building from {mode}!")
+            sys.exit(-1)
+
+    #
+    # Copy the trees again, to show the cost of a sync without changes.
+    #
+    for tree in BUILDS:
+        start = time.perf_counter()
+        ovs_unittests.sync_source_tree(console, options, tree)
+        results["local"][f"unchanged sync {tree}"] = \
+            time.perf_counter() - start
+
+    #
+    # The builds bypassed the build cache, so make the next run build again.
+    #
+    ovs_unittests.save_build_cache(options.vagrant_vm_name, {})
+
+    for tree in BUILDS:
+        sshfs = results["sshfs"][f"build {tree}"]
+        local = results["local"][f"build {tree}"]
+        print(f"Build {tree}: sshfs {sshfs:.1f}s, local {local:.1f}s "
+              f"({sshfs / local:.2f}x), initial sync "
+              f"{results['local'][f'sync {tree}']:.1f}s, unchanged sync "
+              f"{results['local'][f'unchanged sync {tree}']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
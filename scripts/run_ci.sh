@@ -1,5 +1,6 @@
 #!/bin/bash
 # Simple script to checkout, build and test OVS on Fedora ARM64.
+# For continuous testing with warm VMs, see "./ovs_unittests.py daemon --help".
 
 SMTP="<SMTP_SERVER>"
 EMAIL="<EMAIL_ADDRESS>"
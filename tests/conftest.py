@@ -0,0 +1,87 @@
+#
+# Shared fixtures for the ovs_unittests.py tests. They run in a temporary
+# directory, with the fake vagrant from tests/fake_vagrant first in PATH, so
+# no VM or network access is needed.
+#
+
+import io
+import os
+import sys
+
+import pytest
+
+from rich.console import Console
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TESTS_DIR)
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+
+import ovs_unittests  # noqa: E402
+
+
+#
+# workdir()
+#
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    '''Run in an empty directory, with an empty skip list for each suite,
+    and the VM scripts and Vagrantfile of the repository.
+    '''
+    monkeypatch.chdir(tmp_path)
+    for name in ("vm_scripts", "Vagrantfile"):
+        os.symlink(os.path.join(TESTS_DIR, "..", name), name)
+
+    os.makedirs("skip_lists")
+    for suite in ovs_unittests.TEST_SUITES.values():
+        with open(suite.skip_list, 'w', encoding="utf8") as out_file:
+            out_file.write("# Empty skip list\n")
+
+    return tmp_path
+
+
+#
+# fake_vagrant()
+#
+@pytest.fixture
+def fake_vagrant(workdir, monkeypatch):
+    '''Use the fake vagrant, and return a function to configure it'''
+
+    for name in list(os.environ):
+        if name.startswith("FAKE_VAGRANT_"):
+            monkeypatch.delenv(name)
+
+    monkeypatch.setenv("PATH", os.path.join(TESTS_DIR, "fake_vagrant") +
+                       os.pathsep + os.environ["PATH"])
+    monkeypatch.setenv("FAKE_VAGRANT_DIR", str(workdir / "fake_vagrant"))
+    monkeypatch.setattr(ovs_unittests, "SSH_CONFIGS", {})
+    monkeypatch.setattr(ovs_unittests, "VM_KERNELS", {})
+
+    def configure(**settings):
+        for name, value in settings.items():
+            monkeypatch.setenv(f"FAKE_VAGRANT_{name.upper()}", str(value))
+
+    return configure
+
+
+#
+# console()
+#
+@pytest.fixture
+def console():
+    '''Return a rich console writing to a string, see console.file'''
+    return Console(file=io.StringIO(), width=200, log_path=False)
+
+
+#
+# make_options()
+#
+@pytest.fixture
+def make_options(monkeypatch):
+    '''Return a function parsing the given ovs_unittests.py arguments'''
+
+    def parse(*arguments):
+        monkeypatch.setattr(sys, "argv",
+                            ["ovs_unittests.py"] + list(arguments))
+        return ovs_unittests.parse_arguments()
+
+    return parse
@@ -0,0 +1,134 @@
+#
+# Synthetic autotest logs and skip lists, for the tests, the fake vagrant,
+# and the benchmarks. No VM is needed to generate them.
+#
+# The logs follow the layout ovs_unittests.py parses: a line per test in the
+# "Running the tests" section, a summary of the failures, and the detailed
+# failures, which can be padded with command output to the requested size.
+#
+
+import random
+
+NOISE = "./system-traffic.at:42: ovs-vsctl add-port br0 p0 -- " \
+    "set interface p0 type=internal\n"
+
+
+#
+# test_name()
+#
+def test_name(number):
+    '''Return the name of a synthetic test'''
+    return f"datapath - synthetic test {number}"
+
+
+#
+# test_location()
+#
+def test_location(number, at_file="system-traffic.at"):
+    '''Return the file:line location of a synthetic test'''
+    return f"{at_file}:{number * 10}"
+
+
+#
+# test_wall_time()
+#
+def test_wall_time(number):
+    '''Return the wall time of a synthetic test, in seconds'''
+    return float(number % 60 + 1)
+
+
+#
+# random_outcomes()
+#
+def random_outcomes(tests, failure_rate=0.01, skip_rate=0.04, seed=1):
+    '''Return a random set of failed and of skipped test numbers'''
+
+    rng = random.Random(seed)
+    failed = set()
+    skipped = set()
+
+    for number in range(1, tests + 1):
+        outcome = rng.random()
+        if outcome < failure_rate:
+            failed.add(number)
+        elif outcome < failure_rate + skip_rate:
+            skipped.add(number)
+
+    return failed, skipped
+
+
+#
+# write_log()
+#
+def write_log(out_file, numbers, failed=(), skipped=(), script="testsuite",
+              at_file="system-traffic.at", duration=65, size_mb=0):
+    '''Write an autotest alike log for the given test numbers.
+
+    The tests in failed fail, the ones in skipped are skipped, and all others
+    pass. If size_mb is set, the detailed failures section is padded with
+    command output until the log is roughly that large, as is the case for
+    verbose and ASAN runs. The wall times the test scripts append are added
+    last. Returns the number of tests written.
+    '''
+    out_file.write("## ------------------ ##\n"
+                   "## Running the tests. ##\n"
+                   "## ------------------ ##\n")
+
+    for number in numbers:
+        location = test_location(number, at_file)
+        if number in failed:
+            result = f"FAILED ({location})"
+        elif number in skipped:
+            result = f"skipped ({location})"
+        else:
+            result = f"ok     (0m0.{number % 1000:03}s 0m0.010s)"
+
+        out_file.write(f"{number}. {test_name(number)} ({location}): "
+                       f"{result}\n")
+
+    out_file.write("## ------------- ##\n"
+                   "## Test results. ##\n"
+                   "## ------------- ##\n"
+                   f"{script}: test suite duration: {duration // 3600}h "
+                   f"{duration // 60 % 60}m {duration % 60}s\n")
+
+    failures = [x for x in numbers if x in failed]
+    if failures:
+        out_file.write("## -------------------------- ##\n"
+                       "## Summary of the failures. ##\n"
+                       "## -------------------------- ##\n")
+
+        for number in failures:
+            out_file.write(f" {number}: {test_location(number, at_file)}  "
+                           f"{test_name(number)}\n")
+
+        out_file.write("## ---------------------------- ##\n"
+                       "## Detailed failed tests. ##\n"
+                       "## ---------------------------- ##\n")
+
+    target = size_mb * 1024 * 1024
+    while out_file.tell() < target:
+        out_file.write(NOISE * 1024)
+
+    out_file.write("## Test wall times. ##\n")
+    for number in numbers:
+        out_file.write(f"{number}: {test_wall_time(number):.1f}\n")
+
+    return len(numbers)
+
+
+#
+# write_skip_list()
+#
+def write_skip_list(out_file, numbers, arch=None):
+    '''Write a skip list with the names of the given test numbers.
+
+    If arch is given, the names are put in an architecture section.
+    '''
+    out_file.write("# Synthetic skip list\n")
+
+    if arch is not None:
+        out_file.write(f"[ARCH: {arch}]\n")
+
+    for number in numbers:
+        out_file.write(f"{test_name(number)}\n")
@@ -0,0 +1,78 @@
+#
+# Tests for the bisect command, on an OVS git tree and the fake vagrant, which
+# fails the tests in FAKE_VAGRANT_REGRESSION once ovs/REGRESSION exists.
+#
+
+import os
+import subprocess
+
+import pytest
+
+import ovs_unittests
+
+COMMITS = 10
+REGRESSION = 7
+
+
+#
+# ovs_commits()
+#
+@pytest.fixture
+def ovs_commits(fake_vagrant):
+    '''Create an OVS tree, with the regression added in commit REGRESSION,
+    and return the commits.
+    '''
+    os.makedirs("dpdk")
+    subprocess.run(['git', 'init', '-q', '-b', 'main', 'ovs'], check=True)
+
+    commits = []
+    for number in range(1, COMMITS + 1):
+        name = "REGRESSION" if number == REGRESSION else f"file{number}"
+        with open(f"ovs/{name}", 'w', encoding="utf8") as out_file:
+            out_file.write(f"Commit {number}\n")
+
+        subprocess.run(f"git add . && git -c user.name=test -c "
+                       f"user.email=test@example.com commit -qm 'Commit "
+                       f"{number}'", shell=True, cwd="ovs", check=True)
+        commits.append(ovs_unittests.ci_git("ovs", "rev-parse", "HEAD"))
+
+    return commits
+
+
+#
+# bisect()
+#
+def bisect(commits, *arguments):
+    '''Bisect between the first and last commit'''
+
+    return ovs_unittests.bisect_command(
+        ["--good", commits[0], "--bad", commits[-1], "--suite", "check"] +
+        list(arguments) + ["--", "--run", "check"])
+
+
+def test_bisect(ovs_commits, fake_vagrant, capsys):
+    fake_vagrant(regression="3,4")
+
+    assert bisect(ovs_commits, "--tests", "3-4,12") == 0
+
+    output = capsys.readouterr().out
+    assert output.splitlines()[-2].strip().endswith("first bad commit is:")
+    assert output.splitlines()[-1] == \
+        f"{ovs_commits[REGRESSION - 1]} Commit {REGRESSION}"
+    assert output.count("Bisect step") <= 2 + (COMMITS - 1).bit_length()
+    assert ovs_unittests.ci_git("ovs", "symbolic-ref", "HEAD") == \
+        "refs/heads/main"
+
+
+def test_bisect_not_failing(ovs_commits, fake_vagrant, capsys):
+    fake_vagrant(regression="3")
+
+    assert bisect(ovs_commits, "--tests", "5") == -1
+    assert "do not fail at least 2 out of 3 times on the bad commit" in \
+        capsys.readouterr().out
+
+
+def test_bisect_bad_arguments(ovs_commits):
+    assert bisect(ovs_commits, "--tests", "x") == -1
+    assert bisect(ovs_commits, "--tests", "3", "--min-failures", "4") == -1
+    assert bisect(ovs_commits[::-1], "--tests", "3") == -1
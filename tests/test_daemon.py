@@ -0,0 +1,141 @@
+#
+# Tests for the CI daemon, on a local OVS git repository and the fake vagrant.
+#
+
+import glob
+import json
+import os
+import subprocess
+
+import pytest
+
+import ovs_unittests
+
+
+#
+# commit()
+#
+def commit(count=1):
+    '''Add commits to the upstream repository, and return the last one'''
+
+    for _ in range(count):
+        with open("upstream/NEWS", 'a', encoding="utf8") as out_file:
+            out_file.write("Change\n")
+
+        subprocess.run("git add NEWS && git -c user.name=test "
+                       "-c user.email=test@example.com commit -qm change",
+                       shell=True, cwd="upstream", check=True)
+
+    return subprocess.check_output(['git', '-C', 'upstream', 'rev-parse',
+                                    'HEAD'], encoding='utf8').strip()
+
+
+#
+# upstream()
+#
+@pytest.fixture
+def upstream(fake_vagrant):
+    '''Create an upstream OVS repository with two commits'''
+
+    os.makedirs("upstream")
+    os.makedirs("dpdk")
+    subprocess.run(['git', 'init', '-q', '-b', 'main', 'upstream'],
+                   check=True)
+    commit(2)
+
+
+#
+# daemon()
+#
+def daemon(*arguments):
+    '''Run the daemon until its queue is empty, and return the jobs run'''
+
+    assert ovs_unittests.daemon_command(
+        ["--once", "--repo", "upstream"] + list(arguments) +
+        ["--", "--run", "check"]) == 0
+
+    jobs = []
+    for summary in sorted(glob.glob("results/ci/*/summary.json")):
+        with open(summary, encoding="utf8") as in_file:
+            jobs.append(json.load(in_file))
+
+    return jobs
+
+
+def test_daemon(upstream):
+    head = commit(0)
+    jobs = daemon()
+
+    assert [(x["commit"], x["result"]) for x in jobs] == [(head, "passed")]
+    assert subprocess.check_output(['git', '-C', 'ovs', 'rev-parse', 'HEAD'],
+                                   encoding='utf8').strip() == head
+    with open("results/ci/notifications.log", encoding="utf8") as in_file:
+        assert f"Successful OVS datapath run for {head[:12]}" in \
+            in_file.read()
+
+    #
+    # Only the new commits are tested, and merged if too many are waiting.
+    #
+    first = commit()
+    last = commit(3)
+    jobs = daemon("--max-queue", "3")
+
+    assert sorted(x["commit"] for x in jobs) == sorted([head, last])
+    assert [x["commits"] for x in jobs if x["commit"] == last] == \
+        [[first] + ovs_unittests.ci_git("upstream", "rev-list", "--reverse",
+                                        f"{first}..{last}").split()]
+    assert daemon() == jobs
+
+
+def test_daemon_failed(upstream, fake_vagrant):
+    fake_vagrant(failed=1)
+    jobs = daemon("--notify", "command:cat > mail.txt")
+
+    assert [x["result"] for x in jobs] == ["failed"]
+    with open("mail.txt", encoding="utf8") as in_file:
+        assert in_file.readline().startswith("Subject: FAILED OVS datapath "
+                                             "run for")
+    assert glob.glob("results/ci/*/fedora/test_results.zip")
+
+
+def test_daemon_busy(upstream):
+    #
+    # With --once, the daemon waits for the host to be free, here at the
+    # second poll, and tests the queued commits before exiting.
+    #
+    jobs = daemon("--busy-command", "test ! -f free && touch free",
+                  "--poll", "0")
+
+    assert [x["commit"] for x in jobs] == [commit(0)]
+    assert ovs_unittests.ci_load_state()["queue"] == []
+
+
+def test_daemon_bad_arguments(upstream):
+    assert ovs_unittests.daemon_command(["--repo", "upstream", "--notify",
+                                         "pager"]) == -1
+    assert ovs_unittests.daemon_command(["--repo", "./ovs"]) == -1
+
+
+def test_daemon_fetch(upstream):
+    #
+    # With --fetch, the origin's branch is polled, and ./ovs is a clone of
+    # the polled repository, not of its origin.
+    #
+    subprocess.run(['git', 'clone', '-q', 'upstream', 'mirror'], check=True)
+    mirrored = commit(0)
+    head = commit()
+    jobs = daemon("--repo", "mirror", "--fetch")
+
+    assert [x["commit"] for x in jobs] == [head]
+    assert ovs_unittests.ci_git("mirror", "rev-parse", "main") == mirrored
+    assert ovs_unittests.ci_git("ovs", "config", "remote.origin.url") == \
+        os.path.realpath("mirror")
+
+
+def test_daemon_foreign_ovs(upstream):
+    subprocess.run(['git', 'init', '-q', 'ovs'], check=True)
+    commit(0)
+
+    assert [x["result"] for x in daemon()] == ["error"]
+    assert subprocess.run(['git', '-C', 'ovs', 'rev-parse', '--verify',
+                           '-q', 'HEAD'], check=False).returncode != 0
@@ -0,0 +1,94 @@
+#
+# Tests for the --matrix option, building and testing multiple configurations
+# in a single VM, using the fake vagrant.
+#
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+import ovs_unittests
+import synthetic
+
+
+def test_matrix_build_env(make_options):
+    options = make_options("--matrix", "gcc", "asan-ubsan")
+
+    gcc = ovs_unittests.matrix_options(options, "gcc")
+    asan_ubsan = ovs_unittests.matrix_options(options, "asan-ubsan")
+    assert ovs_unittests.get_build_env(gcc)["CC"] == "gcc"
+    assert ovs_unittests.get_build_env(asan_ubsan) == \
+        ovs_unittests.get_build_env(make_options("--sanitizer", "asan",
+                                                 "ubsan"))
+    assert asan_ubsan.ovs_build == "/root/ovs_build-asan-ubsan"
+
+    # All configurations share the DPDK build.
+    keys = ovs_unittests.build_cache_keys(options)
+    assert set(keys) == {"dpdk", "ovs-gcc", "ovs-asan-ubsan"}
+    assert keys["ovs-gcc"] != keys["ovs-asan-ubsan"]
+    assert keys["dpdk"] == ovs_unittests.build_cache_keys(gcc)["dpdk"]
+
+
+@pytest.mark.parametrize("arguments", [("--sanitizer", "asan"),
+                                       ("--parallel", "2"),
+                                       ("--golden-image",)])
+def test_matrix_bad_arguments(make_options, arguments):
+    with pytest.raises(SystemExit):
+        make_options("--matrix", "gcc", *arguments)
+
+
+def test_matrix(fake_vagrant, console, make_options):
+    fake_vagrant(matrix_failed="asan:5")
+    options = make_options("--matrix", "gcc", "clang", "asan", "--run",
+                           "check", "--retry", "0", "--jsonl", "results.jsonl")
+    options.emitter = ovs_unittests.ResultEmitter(jsonl=options.jsonl)
+
+    assert not ovs_unittests.run_pipeline(console, options)
+    options.emitter.close()
+
+    output = console.file.getvalue()
+    assert "Test failures for asan/check:" in output
+    assert f"[FAILED ]    5. {synthetic.test_name(5)}" in output
+    assert "gcc/check" not in output and "clang/check" not in output
+    assert set(ovs_unittests.load_build_cache("fedora")) == \
+        {"dpdk", "ovs-gcc", "ovs-clang", "ovs-asan"}
+
+    # The results of each configuration are kept apart.
+    with open("results/fedora/matrix/asan/test_results.json",
+              encoding="utf8") as index:
+        tests = json.load(index)["suites"]["check"]["tests"]
+    assert tests["5"]["status"] == ovs_unittests.TEST_FAILED
+    assert tests["5"]["members"][0][0].startswith("root/ovs_build-asan/")
+
+    with open("results.jsonl", encoding="utf8") as in_file:
+        records = [json.loads(line) for line in in_file]
+    assert {x["config"] for x in records} == {"gcc", "clang", "asan"}
+    assert [x["config"] for x in records
+            if x["status"] == ovs_unittests.TEST_FAILED] == ["asan"]
+
+    with sqlite3.connect(ovs_unittests.HISTORY_DB) as conn:
+        assert {x[0] for x in conn.execute("SELECT sanitizer FROM runs")} \
+            == {"gcc", "clang", "asan"}
+
+    # Only the configurations that are not up to date are built.
+    os.remove("results/fedora/ovs_build-gcc.status")
+    options = make_options("--matrix", "gcc", "ubsan", "--run", "check", "-p")
+    assert ovs_unittests.run_pipeline(console, options)
+    assert ovs_unittests.matrix_build_status(options, "ubsan") == 0
+    assert ovs_unittests.matrix_build_status(options, "gcc") is None
+
+
+def test_matrix_build_failure(fake_vagrant, console, make_options):
+    fake_vagrant(fail="Build Open vSwitch ubsan")
+    options = make_options("--matrix", "gcc", "ubsan", "--run", "check")
+
+    assert not ovs_unittests.run_pipeline(console, options)
+
+    output = console.file.getvalue()
+    assert "Failed building OVS for ubsan" in output
+    assert "Test failures for ubsan/build:" in output
+    assert "Finished tests of configuration gcc" in output
+    assert set(ovs_unittests.load_build_cache("fedora")) == \
+        {"dpdk", "ovs-gcc"}
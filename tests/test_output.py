@@ -0,0 +1,95 @@
+#
+# Tests for the handling of the VM command output, see OutputPump.
+#
+
+import os
+import subprocess
+import sys
+
+import ovs_unittests
+
+LINES = 1000
+
+
+#
+# run_pump()
+#
+def run_pump(console, quiet=False, exit_code=0, lines=LINES):
+    '''Pump the output of a command printing lines lines'''
+
+    with subprocess.Popen([sys.executable, "-c",
+                           f"for i in range({lines}): print(f'line {{i}}')\n"
+                           f"raise SystemExit({exit_code})"],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          encoding='utf8') as process:
+        pump = ovs_unittests.OutputPump(process, "fedora", "Test: check")
+        pump.show(console, "Running", quiet=quiet)
+        process.wait()
+
+    return pump.done(process.returncode)
+
+
+def test_output_pump(workdir, console):
+    assert run_pump(console)
+    assert ovs_unittests.failed_output("fedora") == ""
+
+    with open("results/fedora/logs/test-check.log", encoding="utf8") as log:
+        assert log.read().splitlines() == [f"line {x}" for x in range(LINES)]
+
+    output = console.file.getvalue()
+    assert f"line {LINES - 1}\n" in output
+    assert output.count("line ") < LINES
+
+
+def test_output_pump_quiet(workdir, console):
+    assert not run_pump(console, quiet=True, exit_code=1)
+    assert console.file.getvalue() == ""
+    assert os.path.getsize("results/fedora/logs/test-check.log") > 0
+
+    output = ovs_unittests.failed_output("fedora")
+    assert output.startswith("\n[bold cyan]Last 50 lines of \"Test: check\"")
+    assert output.endswith(f"\n  line {LINES - 1}")
+    assert ovs_unittests.failed_output("fedora") == ""
+
+
+def test_output_pump_no_log(workdir, console):
+    #
+    # The output is still read without a log file, more than fits in the
+    # pipe, so the command does not block.
+    #
+    os.makedirs("results/fedora")
+    with open("results/fedora/logs", 'w', encoding="utf8"):
+        pass
+
+    assert not run_pump(console, quiet=True, exit_code=1, lines=LINES * 20)
+    assert ovs_unittests.failed_output("fedora").endswith(
+        f"\n  line {LINES * 20 - 1}")
+
+
+def test_failed_build_output(fake_vagrant, console, make_options):
+    fake_vagrant(fail="Build dpdk")
+    options = make_options("--skip-provision", "--force-build")
+
+    assert not ovs_unittests.prepare_vm(console, options)
+    output = console.file.getvalue()
+    assert "Failed building OVS-DPDK!\nLast 2 lines of \"Build dpdk,Build " \
+        "Open vSwitch\" on fedora" in output
+    assert "fedora: Build dpdk failed!" in output
+    assert os.path.exists("results/fedora/logs/"
+                          "build-dpdk-build-open-vswitch.log")
+
+
+def test_provisioners_traced_on_vm_track(fake_vagrant, console, make_options,
+                                         monkeypatch):
+    fake_vagrant()
+    monkeypatch.setattr(ovs_unittests, "TRACER", ovs_unittests.PhaseTracer())
+    ovs_unittests.TRACER.enabled = True
+    monkeypatch.setattr(ovs_unittests.threading.current_thread(), "name",
+                        "fedora")
+
+    assert ovs_unittests.prepare_vm(console, make_options())
+    tracks = {x[0]: x[2] for x in ovs_unittests.TRACER.events
+              if x[1] == "provision"}
+    assert tracks == {"Linux Provisioning": "fedora", "Reboot new kernel":
+                      "fedora", "Build dpdk": "fedora",
+                      "Build Open vSwitch": "fedora"}
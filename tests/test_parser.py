@@ -0,0 +1,131 @@
+#
+# Tests for the autotest log parser and the skip list handling.
+#
+
+import os
+
+import pytest
+
+import ovs_unittests
+import synthetic
+
+
+#
+# write_suite_log()
+#
+def write_suite_log(target, tests, **kwargs):
+    '''Write a synthetic testsuite.log to the results directory of target'''
+
+    os.makedirs(f"results/{target}", exist_ok=True)
+    with open(f"results/{target}/testsuite.log", 'w',
+              encoding="utf8") as out_file:
+        synthetic.write_log(out_file, range(1, tests + 1), **kwargs)
+
+
+#
+# write_skips()
+#
+def write_skips(numbers, arch=None, file="skip_lists/check.skip_list"):
+    '''Write a synthetic skip list, and return its file'''
+
+    with open(file, 'w', encoding="utf8") as out_file:
+        synthetic.write_skip_list(out_file, numbers, arch=arch)
+
+    return file
+
+
+@pytest.mark.parametrize("tests", [100, 1000, 100000])
+def test_parse_outcomes(workdir, tests):
+    failed, skipped = synthetic.random_outcomes(tests)
+    write_suite_log("vm", tests, failed=failed, skipped=skipped, size_mb=1)
+
+    results = list(ovs_unittests.parse_test_log("results/vm/testsuite.log"))
+    by_status = {}
+    for result in results:
+        by_status.setdefault(result.status, set()).add(int(result.number))
+
+    # Failures are listed twice, as test and in the summary.
+    assert len(results) == tests + len(failed)
+    assert by_status.get(ovs_unittests.TEST_FAILED, set()) == failed
+    assert by_status.get(ovs_unittests.TEST_SKIPPED, set()) == skipped
+    assert len(by_status[ovs_unittests.TEST_OK]) == \
+        tests - len(failed) - len(skipped)
+
+
+def test_parse_details(workdir):
+    write_suite_log("vm", 3, failed={2}, duration=3725)
+    parser = ovs_unittests.TestLogParser()
+
+    with open("results/vm/testsuite.log", encoding="utf8") as in_file:
+        results = [x for x in map(parser.feed, in_file) if x is not None]
+
+    assert results[0] == ovs_unittests.TestResult(
+        "1", synthetic.test_name(1), synthetic.test_location(1),
+        ovs_unittests.TEST_OK, 0.011)
+    assert results[1].status == ovs_unittests.TEST_FAILED
+    assert results[1].cpu_time is None
+    assert parser.suite_duration == 3725
+    assert parser.wall_times == {str(x): synthetic.test_wall_time(x)
+                                 for x in range(1, 4)}
+
+
+def test_process_results(workdir):
+    write_suite_log("vm", 10, failed={3, 7}, skipped={4, 5})
+    skip_list = write_skips([4, 6, 42])
+
+    errors, skipped, stale, missing = ovs_unittests.process_results(
+        "testsuite.log", target="vm", skiplist=skip_list)
+
+    assert [x.number for x in errors] == ["3", "7"]
+    assert [x.number for x in skipped] == ["5"]
+    assert stale == [synthetic.test_name(6)]
+    assert missing == [synthetic.test_name(42)]
+
+
+def test_process_results_missing_files(workdir):
+    assert ovs_unittests.process_results("testsuite.log", target="vm") == \
+        (None, None, None, None)
+
+    write_suite_log("vm", 10)
+    assert ovs_unittests.process_results(
+        "testsuite.log", target="vm",
+        skiplist="skip_lists/none.skip_list") == (None, None, None, None)
+
+
+def test_skip_list_arch(workdir):
+    file = "skip_lists/arch.skip_list"
+    with open(file, 'w', encoding="utf8") as out_file:
+        out_file.write("# Comment\n\ncommon test\n[ARCH: aarch64]\n"
+                       "arm test\n[ARCH: x86_64]\nx86 test\n")
+
+    assert list(ovs_unittests.load_skip_list(file, arch="aarch64")) == \
+        ["common test", "arm test"]
+    assert list(ovs_unittests.load_skip_list(file, arch="x86_64")) == \
+        ["common test", "x86 test"]
+
+
+def test_skip_list_cache(workdir):
+    file = write_skips([1, 2])
+    assert len(ovs_unittests.load_skip_list(file)) == 2
+
+    write_skips([1, 2, 3])
+    os.utime(file, ns=(0, os.stat(file).st_mtime_ns + 1))
+    assert len(ovs_unittests.load_skip_list(file)) == 3
+
+
+def test_live_monitor(workdir, console, monkeypatch):
+    write_suite_log("vm", 10, failed={3, 7}, skipped={5})
+    monkeypatch.setattr(ovs_unittests, "vm_command",
+                        lambda **_: (["cat", "results/vm/testsuite.log"],
+                                     None))
+
+    monitor = ovs_unittests.LiveLogMonitor(console, target="vm",
+                                           test_log="testsuite.log")
+    monitor.run()
+
+    # The failures are listed again in the summary, but only reported once.
+    output = console.file.getvalue()
+    assert monitor.failures == 2
+    assert output.count("[FAILED ]") == 2
+    assert output.count(f"3. {synthetic.test_name(3)}") == 1
+    assert output.count("[SKIPPED]") == 1
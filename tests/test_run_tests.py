@@ -0,0 +1,241 @@
+#
+# Tests for preparing the VMs and running the test suites, using the fake
+# vagrant.
+#
+
+import json
+import os
+import sqlite3
+import threading
+
+from contextlib import closing
+
+import ovs_unittests
+import synthetic
+
+
+#
+# run()
+#
+def run(console, options):
+    '''Prepare the VM and run the tests, as main() does'''
+
+    assert ovs_unittests.prepare_vm(console, options)
+    return ovs_unittests.run_tests(console, options)
+
+
+def test_prepare_vm(fake_vagrant, console, make_options):
+    fake_vagrant()
+    options = make_options("--run", "check")
+
+    assert ovs_unittests.prepare_vm(console, options)
+    assert ovs_unittests.vagrant_state(target="fedora") == "running"
+    assert set(ovs_unittests.load_build_cache("fedora")) == {"dpdk", "ovs"}
+
+    assert ovs_unittests.prepare_vm(console, make_options("-p"))
+    assert "OVS-DPDK build on fedora is up to date" in console.file.getvalue()
+
+
+def test_prepare_vm_build_failure(fake_vagrant, console, make_options):
+    fake_vagrant(fail="Build dpdk")
+
+    assert not ovs_unittests.prepare_vm(console, make_options())
+    assert "Failed building OVS-DPDK" in console.file.getvalue()
+    assert ovs_unittests.load_build_cache("fedora") == {}
+
+
+def test_run_tests_pass(fake_vagrant, console, make_options):
+    fake_vagrant(tests=50)
+
+    assert run(console, make_options("--run", "check", "kernel"))
+    assert "NO FAILURES" in console.file.getvalue()
+
+
+def test_run_tests_failure(fake_vagrant, console, make_options):
+    fake_vagrant(failed="7")
+
+    assert not run(console, make_options("--run", "check", "--retry", "1"))
+    output = console.file.getvalue()
+    assert f"[FAILED ]    7. {synthetic.test_name(7)}" in output
+    assert "errors required a rerun" not in output
+
+    with open("results/fedora/test_results.json", encoding="utf8") as index:
+        tests = json.load(index)["suites"]["check"]["tests"]
+    assert tests["7"]["status"] == ovs_unittests.TEST_FAILED
+
+
+def test_run_tests_flaky(fake_vagrant, console, make_options):
+    fake_vagrant(flaky="3")
+
+    # Tests that passed on a retry are reported, unless quarantined.
+    assert not run(console, make_options("--run", "check", "--retry", "1"))
+    assert "1 errors required a rerun" in console.file.getvalue()
+    assert f"[FLAKY  ]    3. {synthetic.test_name(3)} " \
+        f"({synthetic.test_location(3)}), passed on run 2" in \
+        console.file.getvalue()
+
+    with sqlite3.connect(ovs_unittests.HISTORY_DB) as conn:
+        assert conn.execute("SELECT name, attempts, passed FROM retries")\
+            .fetchall() == [(synthetic.test_name(3), 2, 1)]
+
+
+def test_history_times(fake_vagrant, console, make_options):
+    fake_vagrant(tests=5, failed="2")
+    options = make_options("--run", "check", "--retry", "0")
+
+    assert not run(console, options)
+    with sqlite3.connect(ovs_unittests.HISTORY_DB) as conn:
+        assert conn.execute("SELECT number, ROUND(cpu_time, 3), wall_time "
+                            "FROM results ORDER BY number").fetchall()[:3] == [
+            (1, 0.011, synthetic.test_wall_time(1)), (2, None, None),
+            (3, 0.013, synthetic.test_wall_time(3))]
+
+    # Shards are sized on the wall time.
+    assert ovs_unittests.test_durations(options, "check")[
+        synthetic.test_name(4)] == synthetic.test_wall_time(4)
+
+
+def test_history_upgrade(workdir):
+    os.makedirs("results")
+    with sqlite3.connect(ovs_unittests.HISTORY_DB) as conn:
+        conn.execute("CREATE TABLE results (run_id INTEGER NOT NULL, "
+                     "number INTEGER NOT NULL, name TEXT NOT NULL, "
+                     "location TEXT NOT NULL, status TEXT NOT NULL, "
+                     "duration REAL)")
+        conn.execute("INSERT INTO results VALUES (1, 1, 'a', 'a.at:1', "
+                     "'ok', 0.5)")
+    conn.close()
+
+    with closing(ovs_unittests.history_connect()) as conn:
+        assert conn.execute("SELECT cpu_time, wall_time FROM results")\
+            .fetchall() == [(0.5, None)]
+
+
+def test_run_tests_retries_exhausted(fake_vagrant, console, make_options):
+    fake_vagrant(flaky="3:2")
+
+    assert not run(console, make_options("--run", "check", "--retry", "1"))
+    assert "[FAILED ]    3." in console.file.getvalue()
+
+
+def test_run_tests_skipped(fake_vagrant, console, make_options):
+    fake_vagrant(skipped="5")
+
+    assert not run(console, make_options("--run", "check"))
+    assert "[SKIPPED]    5." in console.file.getvalue()
+
+    with open("skip_lists/check.skip_list", 'w', encoding="utf8") as skips:
+        synthetic.write_skip_list(skips, [5])
+
+    assert ovs_unittests.run_tests(console, make_options("--run", "check"))
+
+
+def test_run_parallel(fake_vagrant, console, make_options):
+    fake_vagrant(failed="2")
+    options = make_options("--run", "check", "ovsdb", "kernel", "--parallel",
+                           "2", "--retry", "0")
+
+    assert not ovs_unittests.run_parallel(console, options)
+    for target in ("fedora-1", "fedora-2"):
+        assert ovs_unittests.vagrant_state(target=target) == "running"
+
+    output = console.file.getvalue()
+    for test in ("check", "ovsdb", "kernel"):
+        assert f"Test failures for {test}:" in output
+
+
+def test_vm_pool_retry_builds(fake_vagrant, console, make_options):
+    pool = ovs_unittests.VmPool()
+    for target, build in (("fedora-1", "a"), ("fedora-2", "b"),
+                          ("fedora-3", "a")):
+        ovs_unittests.save_build_cache(target, {"ovs": build})
+        options = make_options("--run", "check")
+        options.vagrant_vm_name = target
+        pool.add_vm(options)
+
+    retry_shards = ovs_unittests.SuiteShards(1, retry=2, build="a")
+    pool.put(("check", (1, "5", retry_shards)), front=True)
+
+    # The VM with another build waits, instead of taking the retry job.
+    other = []
+    waiter = threading.Thread(target=lambda: other.append(
+        pool.get("fedora-2")))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    assert pool.idle_vms("a") == 0 and pool.idle_vms("b") == 1
+
+    ovs_unittests.vagrant_up(target="fedora-3")
+    test, shard = pool.get_retry("fedora-3", retry_shards)
+    assert ovs_unittests.run_pool_shard(console, options, test, shard) is \
+        False
+    pool.done()
+
+    waiter.join(5)
+    assert other == [None]
+    assert pool.get_retry("fedora-1", retry_shards) is None
+
+    # The retry parts do not overwrite the logs of the first run's shards.
+    assert retry_shards.logs == [(1, "./results/fedora-3/testsuite.log."
+                                  "retry2.1")]
+
+
+def test_result_cache(fake_vagrant, console, make_options, monkeypatch):
+    fake_vagrant(flaky="3")
+    options = make_options("--run", "check", "--retry", "1")
+
+    assert not run(console, options)
+    runs = fake_vagrant_runs()
+    report = console.file.getvalue().split("TESTS FAILURES")[-1]
+
+    # The suites use the build keys prepare_vm() stored, without hashing the
+    # source trees again.
+    build_cache_keys = ovs_unittests.build_cache_keys
+    monkeypatch.setattr(ovs_unittests, "build_cache_keys", None)
+    console.file.truncate(0)
+    assert not ovs_unittests.run_tests(console, options)
+    assert "Replaying cached results of test check" in console.file.getvalue()
+    assert console.file.getvalue().split("TESTS FAILURES")[-1] == report
+    assert fake_vagrant_runs() == runs
+    monkeypatch.setattr(ovs_unittests, "build_cache_keys", build_cache_keys)
+
+    options = make_options("--run", "check", "--retry", "1", "--no-cache")
+    assert run(console, options)
+    assert fake_vagrant_runs()["3"] == runs["3"] + 1
+
+
+def test_result_cache_failure(fake_vagrant, console, make_options):
+    fake_vagrant(failed="7")
+    options = make_options("--run", "check", "--retry", "1")
+
+    # Runs with failures are not cached, so they are run again.
+    assert not run(console, options)
+    runs = fake_vagrant_runs()
+
+    console.file.truncate(0)
+    assert not ovs_unittests.run_tests(console, options)
+    assert "Replaying cached results" not in console.file.getvalue()
+    assert fake_vagrant_runs()["7"] == runs["7"] + 2
+
+
+def test_result_cache_kernel(fake_vagrant, console, make_options):
+    fake_vagrant()
+    options = make_options("--run", "check")
+
+    assert run(console, options)
+    runs = fake_vagrant_runs()
+
+    fake_vagrant(kernel="6.2.0-fake")
+    ovs_unittests.ssh_config_invalidate("fedora")
+    assert ovs_unittests.run_tests(console, options)
+    assert fake_vagrant_runs()["1"] == runs["1"] + 1
+
+
+#
+# fake_vagrant_runs()
+#
+def fake_vagrant_runs():
+    '''Return the number of runs of each test of the check suite'''
+
+    with open("fake_vagrant/state.json", encoding="utf8") as in_file:
+        return json.load(in_file)["runs"]["testsuite"]
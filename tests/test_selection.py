@@ -0,0 +1,126 @@
+#
+# Tests for the change-impact test selection, on a small OVS git tree.
+#
+
+import os
+import subprocess
+
+import pytest
+
+import ovs_unittests
+import synthetic
+
+TESTS = 5
+
+
+#
+# write_at_file()
+#
+def write_at_file(changed=None):
+    '''Write ovs/tests/foo.at, with its tests at the synthetic locations'''
+
+    lines = ["m4_define([FOO_MACRO], [true])"]
+    for number in range(1, TESTS + 1):
+        lines += [""] * (number * 10 - len(lines) - 1)
+        lines += [f"AT_SETUP([{synthetic.test_name(number)}])",
+                  "AT_CHECK([FOO_MACRO])", "AT_CLEANUP"]
+
+    if changed is not None:
+        lines[changed - 1] += " dnl changed"
+
+    with open("ovs/tests/foo.at", 'w', encoding="utf8") as out_file:
+        out_file.write("\n".join(lines) + "\n")
+
+
+#
+# ovs_tree()
+#
+@pytest.fixture
+def ovs_tree(workdir):
+    '''Create an OVS git tree, and a check log with the tests of foo.at'''
+
+    os.makedirs("ovs/tests")
+    os.makedirs("ovs/lib")
+    write_at_file()
+    for file in ("lib/foo.c", "lib/dpif-netdev.c", "NEWS"):
+        with open(f"ovs/{file}", 'w', encoding="utf8") as out_file:
+            out_file.write("/* Original */\n")
+
+    subprocess.run("git init -q && git add . && git -c user.name=test "
+                   "-c user.email=test@example.com commit -qm base",
+                   shell=True, cwd="ovs", check=True)
+
+    os.makedirs("results/fedora")
+    with open("results/fedora/testsuite.log", 'w',
+              encoding="utf8") as out_file:
+        synthetic.write_log(out_file, range(1, TESTS + 1), at_file="foo.at")
+
+
+#
+# change()
+#
+def change(file):
+    '''Append a line to a file in the OVS tree'''
+
+    with open(f"ovs/{file}", 'a', encoding="utf8") as out_file:
+        out_file.write("/* Changed */\n")
+
+
+@pytest.mark.parametrize("line, expected", [(33, {3}), (21, {2}),
+                                            (1, {1, 2, 3, 4, 5})])
+def test_at_file_change(ovs_tree, console, make_options, line, expected):
+    write_at_file(changed=line)
+    options = make_options("--changed-since", "HEAD")
+
+    assert ovs_unittests.select_changed_tests(console, options)
+    assert options.run == {"check"}
+    assert options.selected == {"check": expected}
+    assert ovs_unittests.suite_testsuiteflags(options, "check").endswith(
+        ovs_unittests.testsuite_ranges(expected))
+
+
+def test_core_change(ovs_tree, console, make_options):
+    change("lib/dpif-netdev.c")
+    options = make_options("--changed-since", "HEAD")
+
+    assert ovs_unittests.select_changed_tests(console, options)
+    assert options.run == set(ovs_unittests.TEST_SUITES)
+    assert options.selected == {}
+
+
+def test_source_change(ovs_tree, console, make_options):
+    change("lib/foo.c")
+    change("NEWS")
+    options = make_options("--changed-since", "HEAD")
+
+    assert ovs_unittests.select_changed_tests(console, options)
+    assert options.selected == {"check": {1, 2, 3, 4, 5}}
+
+
+def test_no_impact(ovs_tree, console, make_options):
+    change("NEWS")
+    options = make_options("--changed-since", "HEAD")
+
+    assert ovs_unittests.select_changed_tests(console, options)
+    assert options.run == set()
+
+
+def test_bad_commit(ovs_tree, console, make_options):
+    options = make_options("--changed-since", "no-such-commit")
+
+    assert not ovs_unittests.select_changed_tests(console, options)
+
+
+def test_run_selected(ovs_tree, fake_vagrant, console, make_options):
+    fake_vagrant(tests=TESTS)
+    write_at_file(changed=42)
+    with open("skip_lists/check.skip_list", 'w', encoding="utf8") as skips:
+        synthetic.write_skip_list(skips, [1])
+
+    options = make_options("--changed-since", "HEAD")
+    assert ovs_unittests.select_changed_tests(console, options)
+    assert ovs_unittests.prepare_vm(console, options)
+    assert ovs_unittests.run_tests(console, options)
+
+    results = ovs_unittests.parse_test_log("results/fedora/testsuite.log")
+    assert [x.number for x in results] == ["4"]
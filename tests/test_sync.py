@@ -0,0 +1,116 @@
+#
+# Tests for copying the source trees to the VM's local disk, see --sync.
+#
+
+import os
+
+import ovs_unittests
+
+
+#
+# write_file()
+#
+def write_file(name, data):
+    '''Write a file, creating its directory if needed'''
+
+    os.makedirs(os.path.dirname(name), exist_ok=True)
+    with open(name, 'w', encoding="utf8") as out_file:
+        out_file.write(data)
+
+
+#
+# vm_copy()
+#
+def vm_copy(workdir, name=""):
+    '''Return the path of the fake VM's copy of the OVS tree'''
+    return os.path.join(workdir, "fake_vagrant", "vms", "fedora", "root",
+                        "src", "ovs", name)
+
+
+def test_tree_manifest(workdir):
+    write_file("ovs/lib/foo.c", "foo\n")
+    write_file("ovs/.git/HEAD", "ref\n")
+    os.symlink("lib/foo.c", "ovs/foo.c")
+
+    manifest = ovs_unittests.tree_manifest("ovs")
+    assert sorted(manifest) == ["foo.c", "lib/foo.c"]
+    assert manifest["foo.c"][3] == "link:lib/foo.c"
+
+    #
+    # The hash of unchanged files is not calculated again.
+    #
+    previous = {"lib/foo.c": manifest["lib/foo.c"][:3] + ["cached"]}
+    assert ovs_unittests.tree_manifest("ovs", previous)["lib/foo.c"][3] == \
+        "cached"
+
+
+def test_sync(workdir, fake_vagrant, console, make_options):
+    fake_vagrant()
+    write_file("ovs/lib/foo.c", "foo\n")
+    write_file("ovs/lib/bar.c", "bar\n")
+    write_file("ovs/NEWS", "news\n")
+    options = make_options("--sync")
+
+    assert ovs_unittests.sync_source_tree(console, options, "ovs")
+    assert "Copying 3 changed files" in console.file.getvalue()
+    with open(vm_copy(workdir, "lib/foo.c"), encoding="utf8") as in_file:
+        assert in_file.read() == "foo\n"
+
+    #
+    # Only changed files are copied, and a new modification time alone does
+    # not count as a change.
+    #
+    mtime = os.stat(vm_copy(workdir, "NEWS")).st_mtime_ns
+    write_file("ovs/lib/foo.c", "changed\n")
+    os.remove("ovs/lib/bar.c")
+    os.utime("ovs/NEWS", ns=(mtime + 10**9, mtime + 10**9))
+
+    assert ovs_unittests.sync_source_tree(console, options, "ovs")
+    assert "Copying 1 changed files (0.0 MB) of ovs to " \
+        "fedora:/root/src/ovs, removing 1" in console.file.getvalue()
+    with open(vm_copy(workdir, "lib/foo.c"), encoding="utf8") as in_file:
+        assert in_file.read() == "changed\n"
+    assert not os.path.exists(vm_copy(workdir, "lib/bar.c"))
+    assert os.stat(vm_copy(workdir, "NEWS")).st_mtime_ns == mtime
+
+    assert ovs_unittests.get_build_env(options)["OVS_SRC"] == \
+        "/root/src/ovs"
+    assert "OVS_SRC" not in ovs_unittests.get_build_env(make_options())
+
+
+def test_sync_before_build(workdir, fake_vagrant, console, make_options):
+    fake_vagrant()
+    write_file("ovs/NEWS", "news\n")
+    write_file("dpdk/VERSION", "25.11.2\n")
+    options = make_options("--sync", "--skip-provision")
+
+    assert ovs_unittests.prepare_vm(console, options)
+    assert os.path.exists(vm_copy(workdir, "NEWS"))
+
+    assert ovs_unittests.prepare_vm(console, options)
+    assert "is up to date" in console.file.getvalue()
+
+
+def test_list_suite_tests(workdir, fake_vagrant, make_options):
+    fake_vagrant()
+    script = "printf '   1: foo.at:10  %s\\n' 'First test'\n"
+    write_file("ovs/tests/foo.at", "AT_SETUP([First test])\n")
+    write_file("ovs/tests/testsuite", "exit 1\n")
+    write_file(vm_copy(workdir, "tests/testsuite"), script)
+    tests = [("1", "First test", "foo.at:10")]
+
+    #
+    # With --sync, the tests are listed by the script in the VM's copy.
+    #
+    assert ovs_unittests.list_suite_tests(make_options("--sync"),
+                                          "check") == tests
+
+    #
+    # A script older than the .at files has other test numbers.
+    #
+    write_file("ovs/tests/testsuite", script)
+    os.utime("ovs/tests/testsuite", (0, 0))
+    assert ovs_unittests.list_suite_tests(make_options(), "check") == []
+
+    os.utime("ovs/tests/foo.at", (0, 0))
+    assert ovs_unittests.list_suite_tests(make_options(), "check") == tests
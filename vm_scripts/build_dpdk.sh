@@ -0,0 +1,19 @@
+#!/bin/bash
+#
+# Script for the "Build dpdk" provisioner, see the Vagrantfile.
+#
+
+export DPDK_BUILD=~/dpdk_build/
+rm -rf $DPDK_BUILD
+mkdir -p $DPDK_BUILD
+# The DPDK tree, a local copy with the --sync option of ovs_unittests.py.
+cd ${DPDK_SRC:-/vagrant/dpdk}
+# Note that meson will use ccache automatically if it's installed.
+CC=gcc meson -Dtests=false -Dmachine=default \
+  -Denable_drivers=net/null,net/tap,net/virtio,net/pcap,net/af_xdp \
+  -Ddeveloper_mode=disabled --prefix="$DPDK_BUILD/install" "$DPDK_BUILD" \
+  2>&1 | tee BUIKD_dpdk_meson
+
+set -o pipefail
+ninja -C "$DPDK_BUILD" install 2>&1 | tee BUILD_ninja_dpdk && \
+  date +%s%N > "$DPDK_BUILD/.build_id"
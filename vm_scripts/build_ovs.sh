@@ -0,0 +1,98 @@
+#!/bin/bash
+#
+# Script for the "Build Open vSwitch" provisioner, see the Vagrantfile.
+#
+# OVS is built in OVS_BUILD, default ~/ovs_build, with CC and EXTRA_CFLAGS.
+# If MATRIX is set, see the --matrix option of ovs_unittests.py, it holds ";"
+# separated "<name>|<compiler>|<EXTRA_CFLAGS>" configurations instead. These
+# are built concurrently, each in ~/ovs_build-<name>, and the exit code of
+# each build is written to /vagrant/results/$RESULT_DIR/ovs_build-<name>.status.
+#
+
+export DPDK_BUILD=~/dpdk_build/
+# The OVS tree, a local copy with the --sync option of ovs_unittests.py.
+OVS_SRC=${OVS_SRC:-/vagrant/ovs}
+CCACHE=""
+if command -v ccache &> /dev/null; then
+  ccache --max-size=5G > /dev/null
+  CCACHE="ccache "
+fi
+
+if [ "$(uname -m)" = "aarch64" ]; then
+  ARCH_CFLAGS=""
+else
+  ARCH_CFLAGS="-msse4.2 -mpopcnt"
+fi
+
+set -o pipefail
+
+# Generate the build system in the OVS tree, if it is missing or older than
+# its sources, and remove any in-tree build. Regenerating configure makes all
+# build directories reconfigure, so this is only done when needed.
+boot_ovs() {
+  (
+    cd $OVS_SRC
+    if [ ! -f configure ] || [ -n "$(find configure.ac m4 -newer configure \
+         \( -name configure.ac -o -name '*.m4' \) 2> /dev/null)" ]; then
+      ./boot.sh
+    fi
+    [ -f Makefile ] && ./configure && make distclean
+  )
+}
+
+# Build OVS in a build directory, with a compiler and extra CFLAGS. Only do a
+# full configure and build if the build configuration, the OVS tree location,
+# or the DPDK build changed. If not, make will only rebuild what changed.
+build_ovs() {
+  local build=$1
+  local cc="$CCACHE$2"
+  local extra_cflags=$3
+  local build_config="$cc $extra_cflags $OVS_SRC $(cat $DPDK_BUILD/.build_id 2> /dev/null)"
+
+  if [ -f $build/Makefile ] && \
+     [ "$(cat $build/.build_config 2> /dev/null)" = "$build_config" ]; then
+    cd $build
+  else
+    [ -n "$SKIP_BOOT" ] || boot_ovs
+    rm -rf $build
+    mkdir -p $build
+    cd $build
+    CC="$cc" \
+    PKG_CONFIG_PATH=$DPDK_BUILD/install/lib64/pkgconfig:$DPDK_BUILD/install/lib/x86_64-linux-gnu/pkgconfig \
+    CFLAGS="-g -O2 $ARCH_CFLAGS $extra_cflags" \
+      $OVS_SRC/configure \
+        --enable-afxdp \
+        --enable-usdt-probes \
+        --enable-Werror \
+        --localstatedir=/var \
+        --prefix=/usr \
+        --sysconfdir=/etc \
+        --with-dpdk=static \
+          | tee BUILD_ovs_configure.log
+  fi
+
+  make -j $(nproc) $MAKE_LOAD | tee BUILD_ovs_make.log && \
+    echo "$build_config" > .build_config
+}
+
+if [ -z "$MATRIX" ]; then
+  build_ovs "${OVS_BUILD:-$HOME/ovs_build}" "${CC:-gcc}" "$EXTRA_CFLAGS"
+  exit
+fi
+
+# The build system is generated once, if needed, as the builds share the OVS
+# tree. The concurrent builds only start new jobs while the load allows it.
+boot_ovs
+export SKIP_BOOT=1
+export MAKE_LOAD="-l $(nproc)"
+
+IFS=';' read -ra CONFIGS <<< "$MATRIX"
+for config in "${CONFIGS[@]}"; do
+  IFS='|' read -r name cc extra_cflags <<< "$config"
+  (
+    build_ovs ~/ovs_build-$name "$cc" "$extra_cflags" 2>&1 | \
+      sed -u "s/^/[$name] /"
+    echo ${PIPESTATUS[0]} > /vagrant/results/$RESULT_DIR/ovs_build-$name.status
+  ) &
+done
+wait
@@ -0,0 +1,42 @@
+#!/bin/bash
+#
+# Script to collect the directories of the failed tests, see
+# collect_failed_tests() in ovs_unittests.py. FAILED_TESTS holds space
+# separated "<testsuite>:<number>,<number>,..." entries. The zstd compressed
+# tar archive is written to stdout. Exits with 2 if there is nothing to
+# collect.
+#
+
+set -o pipefail
+
+cd ${OVS_BUILD:-~/ovs_build}/tests || exit 1
+command -v zstd > /dev/null || exit 1
+
+files=()
+for entry in $FAILED_TESTS; do
+    suite=${entry%%:*}
+    [ -f "$suite.log" ] && files+=("$suite.log")
+
+    declare -A numbers=()
+    list=${entry#*:}
+    for number in ${list//,/ }; do
+        numbers[$number]=1
+    done
+
+    # Autotest zero pads the test directory names.
+    for dir in "$suite.dir"/[0-9]*; do
+        [ -d "$dir" ] || continue
+        [ -n "${numbers[$((10#${dir##*/}))]}" ] && files+=("$dir")
+    done
+    unset numbers
+done
+
+# Sanitizer reports outside of the test directories.
+while read -r file; do
+    files+=("$file")
+done < <(find . -path './*.dir' -prune -o \
+         \( -name 'asan.*' -o -name 'ubsan.*' \) -type f -print)
+
+[ ${#files[@]} -eq 0 ] && exit 2
+
+tar -cf - "${files[@]}" | zstd -T0 -3 -q -c
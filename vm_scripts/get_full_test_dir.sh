@@ -0,0 +1,6 @@
+#!/bin/bash
+#
+# Script for the "Get test directory" provisioner, see the Vagrantfile.
+#
+
+tar -cvzf /vagrant/results/$RESULT_DIR/full_test_results.tgz ${OVS_BUILD:-~/ovs_build}/tests/*
@@ -0,0 +1,29 @@
+#!/bin/bash
+#
+# Script to sample the resource usage of the VM, see ResourceSampler in
+# ovs_unittests.py. Every INTERVAL seconds a line of key=value pairs is
+# written to stdout, with the raw counters, until stdout is closed.
+#
+
+INTERVAL=${INTERVAL:-5}
+
+while :; do
+    cpu=$(awk '/^cpu / {print $2","$3","$4","$5","$6","$7","$8","$9}' \
+          /proc/stat)
+    mem=$(awk '/^MemTotal:/ {t=$2} /^MemAvailable:/ {a=$2}
+               /^HugePages_Total:/ {ht=$2} /^HugePages_Free:/ {hf=$2}
+               END {print "mem_total="t" mem_available="a \
+                          " huge_total="ht" huge_free="hf}' /proc/meminfo)
+    disk=$(awk '$3 ~ /^(sd[a-z]+|vd[a-z]+|xvd[a-z]+|nvme[0-9]+n[0-9]+)$/ {
+                    r+=$6; w+=$10; b+=$13 }
+                END {print "disk_read="r+0" disk_write="w+0" disk_busy="b+0}' \
+           /proc/diskstats)
+    sshfs=$(for pid in $(pgrep -x sshfs); do cat /proc/$pid/io; done |
+            awk '/^rchar:/ {r+=$2} /^wchar:/ {w+=$2}
+                 END {print "sshfs_read="r+0" sshfs_write="w+0}')
+    load=$(cut -d' ' -f1 /proc/loadavg)
+
+    echo "time=$(date +%s.%N) cpus=$(nproc) cpu=$cpu $mem $disk $sshfs" \
+         "load=$load" || exit 0
+    sleep "$INTERVAL"
+done
@@ -0,0 +1,7 @@
+#!/bin/bash
+#
+# Script for the "Test: check-afxdp" provisioner, see the Vagrantfile.
+# run_test_suite() is in test_suite_lib.sh.
+#
+
+run_test_suite system-afxdp-testsuite check-afxdp
@@ -0,0 +1,16 @@
+#!/bin/bash
+#
+# Script for the "Test: check-dpdk" provisioner, see the Vagrantfile.
+# run_test_suite() is in test_suite_lib.sh.
+#
+
+# The OVS tree the build was configured with, see build_ovs.sh.
+OVS_SRC=$(sed -n 's/^abs_top_srcdir = //p' ${OVS_BUILD:-~/ovs_build}/Makefile)
+
+echo 1024 > /sys/kernel/mm/hugepages/hugepages-2048kB/nr_hugepages
+sed -i 's|other_config:dpdk-extra=--log-level=pmd.*:error]|other_config:dpdk-extra="--log-level=pmd.*:error --block=0000:00:05.0"]|g' ${OVS_SRC:-/vagrant/ovs}/tests/system-dpdk-macros.at
+
+# Supress CryptographyDeprecationWarning warning from scapy in MFEX Configuration test.
+export PYTHONWARNINGS='ignore'
+
+run_test_suite system-dpdk-testsuite check-dpdk
@@ -0,0 +1,62 @@
+#!/bin/bash
+#
+# Functions shared by the "Test: ..." provisioner scripts, see the Vagrantfile.
+# The VM has no copy of the vm_scripts directory, so this file is prepended to
+# each of those scripts, by the Vagrantfile, and by ovs_unittests.py for its
+# --ssh option.
+#
+
+# Run a test suite in the OVS build with "make <target>", and copy its log to
+# the results directory. Returns the exit status of make, which also fails if
+# tests failed. The log is only copied if the test suite wrote a new one.
+#
+# Autotest only reports the CPU time of each test, so the wall time of each
+# test is appended to the copied log. A test is running while its directory
+# holds a log newer than the start of the suite. Autotest keeps the
+# directories of failed tests, and only empties them when running the test
+# again, so their old logs are not counted.
+run_test_suite() {
+  local suite=$1
+  local target=$2
+  local status
+  local times_pid
+
+  cd ${OVS_BUILD:-~/ovs_build}
+  export ASAN_OPTIONS='detect_leaks=1:abort_on_error=true:log_path=asan'
+
+  rm -f tests/$suite.log
+  touch tests/$suite.start
+  (
+    trap 'kill $sleep_pid 2> /dev/null; exit' TERM
+    while true; do
+      now=$EPOCHREALTIME
+      find tests/$suite.dir -mindepth 2 -maxdepth 2 -name $suite.log \
+        -newer tests/$suite.start -printf "%h $now\n" 2> /dev/null
+      sleep 0.2 &
+      sleep_pid=$!
+      wait $sleep_pid
+    done
+  ) > tests/$suite.times &
+  times_pid=$!
+
+  # No RECHECK as it overrides the previous log.
+  make $target
+  status=$?
+
+  kill $times_pid
+  wait $times_pid
+
+  if [ -f tests/$suite.log ]; then
+    cp tests/$suite.log /vagrant/results/$RESULT_DIR
+    {
+      echo "## Test wall times. ##"
+      awk '{ n = split($1, path, "/"); test = path[n] }
+           !(test in start) { start[test] = $2 } { end[test] = $2 }
+           END { for (test in start)
+                   printf "%d: %.1f\n", test, end[test] - start[test] }' \
+        tests/$suite.times
+    } >> /vagrant/results/$RESULT_DIR/$suite.log
+  fi
+
+  return $status
+}